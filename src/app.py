@@ -1,6 +1,20 @@
+# python app.py --profile-startup [--profile-output FILE] reports where the startup time
+# goes instead of running the server, so the profiler has to be set up before the imports
+import startup_profiler
+profile_options = startup_profiler.start()
+
 from dash import Dash, html, dcc, callback, Output, Input, dash_table
 import dash_bootstrap_components as dbc
 
+from callback_metrics import instrument_callbacks
+from lazy_sections import lazy_section, get_lazy_section_callbacks
+
+# sections are rendered on demand (lazy_sections), so their components
+# aren't in the initial layout the callbacks are validated against.
+# Created before the sections are imported, so the asset URLs in their
+# figures (get_asset_url) follow the app's config
+app = Dash(external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
+
 # ---------------------------------------------------------------------------- #
 #               import graph containers and callbacks from files               #
 # ---------------------------------------------------------------------------- #
@@ -10,6 +24,7 @@ from topic_graphs import (
     bar_topic_container, get_topic_bar_callbacks,
     artist_bar_topic_container, get_artist_bar_topic_callbacks,
     topic_scatter_container, get_topic_scatter_callbacks,
+    custom_topic_container, get_custom_topic_callbacks,
     topic_md_1,
     genre_hist_topic_container, get_genre_hist_topic_callbacks
     )
@@ -21,6 +36,7 @@ from example_lyrics import (
 from frequency_graphs import (
     artist_freq_dist_container, get_artist_freq_dist_callbacks,
     genre_freq_dist_container, get_genre_freq_dist_callbacks,
+    group_freq_dist_container, get_group_freq_dist_callbacks,
     freq_md_1
 )
 
@@ -98,26 +114,34 @@ from scikit_ml import (
     scikit_md_5,
     scikit_md_6, scikit_md_7,
     scikit_ex_df_3, scikit_ex_df_4,
-    scikit_md_8
+    scikit_md_8,
+    scikit_md_lyrics,
+    scikit_importance_container,
+    counts_genre_results, counts_unique_results
 )
+from prediction_service import serve_predictions
 
 
-app = Dash(external_stylesheets=[dbc.themes.BOOTSTRAP])
-
 server = app.server
 
 # ---------------------------------------------------------------------------- #
 #                                  callbacks                                  #
 # ---------------------------------------------------------------------------- #
 
+# latency / response size / error metrics of every callback registered below,
+# served at /metrics, with callbacks slower than 1s logged
+callback_metrics = instrument_callbacks(app, slow_threshold=1.0)
+
 get_topic_callbacks(app)
 get_topic_bar_callbacks(app)
 get_artist_bar_topic_callbacks(app)
 get_topic_scatter_callbacks(app)
+get_custom_topic_callbacks(app)
 get_genre_hist_topic_callbacks(app)
 
 get_artist_freq_dist_callbacks(app)
 get_genre_freq_dist_callbacks(app)
+get_group_freq_dist_callbacks(app)
 
 get_genre_metadata_callbacks(app)
 get_genre_hist_meta_callbacks(app)
@@ -134,6 +158,12 @@ get_decade_hist_topic_callbacks(app)
 get_decade_medatata_callbacks(app)
 get_decade_artist_metadata_callbacks(app)
 
+# POST /predict/genre and /predict/unique_words with the ML section models,
+# concurrent requests predicted together, stats at /predict/stats
+prediction_batchers = serve_predictions(app, {
+    'genre': counts_genre_results['train_pipeline'],
+    'unique_words': counts_unique_results['train_pipeline'],
+})
 
 
 # ---------------------------------------------------------------------------- #
@@ -169,6 +199,8 @@ topic_graph_links = dbc.Nav([
                     external_link=True),
     dbc.NavLink("Relations between topic mentions", href="#topic-scatter-graph-content",
                     external_link=True),
+    dbc.NavLink("Mentions of your own topic", href="#custom-topic-graph-content",
+                    external_link=True),
     dbc.NavLink("Artist topic mentions by year", href="#topic-graph-content",
                     external_link=True),
     dbc.NavLink("Topic mentions comparison between male and female artist", href="#topic-spine-graph-content",
@@ -195,6 +227,8 @@ word_graph_links = dbc.Nav([
                     external_link=True),
     dbc.NavLink("Words more common to one genre than others", href="#genre-freq-dist-graph-content",
                     external_link=True),
+    dbc.NavLink("Words more common to any group of songs", href="#group-freq-dist-graph-content",
+                    external_link=True),
     dbc.NavLink("Top 20 (filtered) words by genre WordCloud'", href="#genre-wordcloud-graph-content",
                     external_link=True),
     dbc.NavLink("Dynamic top words wordcloud", href="#artist-wordcloud-graph-content",
@@ -394,7 +428,8 @@ intro_items = html.Div([
     md_intro_1,
     artist_df_table,
     md_intro_2,
-    counts_df_table,
+    # the raw data preview is ~1MB of table rows
+    lazy_section('raw-data', counts_df_table),
     md_intro_3
 ])
 
@@ -405,6 +440,7 @@ topic_charts = html.Div([
     genre_hist_topic_container,
     artist_bar_topic_container, 
     topic_scatter_container, 
+    custom_topic_container,
     topic_container,
     topic_spine_container,
     topic_max_md_1,
@@ -424,6 +460,7 @@ words_charts = html.Div([
     freq_md_1,
     artist_freq_dist_container,
     genre_freq_dist_container,
+    group_freq_dist_container,
     genre_wordcloud_container,
     artist_wordcloud_container,
     ngram_artist_wordcloud_container,
@@ -482,6 +519,8 @@ scikit_items = html.Div([
     scikit_ex_df_1, scikit_ex_df_2,
     scikit_md_3, scikit_md_4,
     scikit_images_1,
+    scikit_importance_container,
+    scikit_md_lyrics,
     scikit_md_5,
     # regression
     html.H3("Regression"),
@@ -490,27 +529,35 @@ scikit_items = html.Div([
     scikit_md_8
 ])
 
+# everything below the introduction is rendered when scrolled to / linked to
 content_div = html.Div([
     intro_items, html.Hr(),
-    topic_charts, html.Hr(),
-    sentiment_charts, html.Hr(),
-    words_charts, html.Hr(),
-    meta_charts, html.Hr(),
-    corr_sne_charts, html.Hr(),
+    lazy_section('topics', topic_charts), html.Hr(),
+    lazy_section('sentiment', sentiment_charts), html.Hr(),
+    lazy_section('words', words_charts), html.Hr(),
+    lazy_section('metadata', meta_charts), html.Hr(),
+    lazy_section('correlations', corr_sne_charts), html.Hr(),
 
-    html.H1(children='Examplary / static analysis'),
-    examples_div,
+    lazy_section('examples', html.Div([
+        html.H1(children='Examplary / static analysis'),
+        examples_div,
+    ])),
 
     # about_md_1,
 
-    decade_items, html.Hr(),
+    lazy_section('decades', decade_items), html.Hr(),
 
-    scikit_items
+    lazy_section('scikit', scikit_items)
 
 ], id='page-content', style=CONTENT_STYLE)
 
+get_lazy_section_callbacks(app)
+
 app.layout = html.Div([sidebar, content_div])
 
 # app.run(debug=True)
 if __name__ == '__main__':
-    app.run_server(debug=False)
\ No newline at end of file
+    if profile_options is not None:
+        startup_profiler.finish(profile_options)
+    else:
+        app.run_server(debug=False)
\ No newline at end of file
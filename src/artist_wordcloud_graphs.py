@@ -1,17 +1,40 @@
-from dash import Dash, html, dcc, callback, Output, Input
+from dash import Dash, html, dcc, callback, Output, Input, ctx, no_update
 import dash_bootstrap_components as dbc
 
 import plotly.express as px
 from plotly.subplots import make_subplots
 import plotly.graph_objects as graph_objects
 
-from wordcloud import WordCloud
+from wordcloud_assets import wordcloud_url, add_wordcloud_image
 
 from dataframes import (
-    top_20_filtered_words_artist_df,
-    genres,
-    count_cols, word_cols
+    datasets,
+    genres
 )
+# registers the artist_top_words dataset
+import term_tables
+
+def artist_wordcloud_options(genre):
+    """Artists of the genre, as dropdown options"""
+    genre_artists = datasets.artist_top_words.entities(genre=genre)
+    options = [{"label": artist, "value": artist} for artist in genre_artists]
+    return options
+
+def artist_wordcloud_figure(artist):
+    # the artist's rows of the long top words table
+    artist_words, artist_counts = datasets.artist_top_words.fetch(artist)
+
+    artist_fig = make_subplots(rows=1, cols=2, subplot_titles = [f'{artist} wordcloud', f'{artist} bar'])
+
+    add_wordcloud_image(artist_fig, wordcloud_url('artist', artist, artist_words, artist_counts), row = 1, col = 1)
+    artist_fig.add_trace(graph_objects.Bar(x=artist_words, y=artist_counts, showlegend = False), row=1, col=2,)
+    artist_fig.update_layout(height = 1 * 400)
+    return artist_fig
+
+# initial state, rendered with the layout rather than by callbacks on load
+initial_wordcloud_genre = 'soul'
+initial_wordcloud_options = artist_wordcloud_options(initial_wordcloud_genre)
+initial_wordcloud_artist = initial_wordcloud_options[0]['value']
 
 artist_wordcloud_controls = dbc.Card(
     [
@@ -20,8 +43,8 @@ artist_wordcloud_controls = dbc.Card(
             dbc.Label("Genre"),
             dcc.Dropdown(
                 id='wordcloud-genre-selection',
-                value = 'soul',
-                options = list(top_20_filtered_words_artist_df.genre.unique())
+                value = initial_wordcloud_genre,
+                options = list(datasets.artist_top_words.info.genre.unique())
             )
             ]),
         html.Div(
@@ -30,7 +53,8 @@ artist_wordcloud_controls = dbc.Card(
             # dcc.Dropdown(df.Artist.unique(), 'Al Green', id='topic-artist-selection')
             dcc.Dropdown(
                 id='wordcloud-artist-selection-dynamic',
-                value='Al Green'
+                options = initial_wordcloud_options,
+                value = initial_wordcloud_artist
             )
             ]),
     ],
@@ -42,7 +66,8 @@ artist_wordcloud_container = dbc.Container([
     dbc.Row(
         [
             dbc.Col(artist_wordcloud_controls, md=4),
-            dbc.Col(dcc.Graph(id='artist-wordcloud-graph-content'), md=8),
+            dbc.Col(dcc.Graph(id='artist-wordcloud-graph-content',
+                              figure=artist_wordcloud_figure(initial_wordcloud_artist)), md=8),
         ],
         align="center",
     ),
@@ -52,50 +77,23 @@ artist_wordcloud_container = dbc.Container([
 ], fluid=True)
 
 def get_artist_wordcloud_callbacks(app):
+    # one callback for the genre -> artist options -> artist -> graph chain,
+    # a genre change selects its first artist and redraws in the same round trip
     @app.callback(
         [
+            Output('wordcloud-artist-selection-dynamic', 'options'),
+            Output('wordcloud-artist-selection-dynamic', 'value'),
             Output('artist-wordcloud-graph-content', 'figure'),
         ],
         [
             Input('wordcloud-genre-selection', 'value'),
             Input('wordcloud-artist-selection-dynamic', 'value'),
-        ]
+        ],
+        prevent_initial_call=True
     )
     def update_artist_wordcloud_graph(genre, artist):
-        artist_df = top_20_filtered_words_artist_df[top_20_filtered_words_artist_df['Artist'] == artist]
-        # create wordcloud and bar graph
-        artist_words = [artist_df[word].values[0] for word in word_cols]
-        artist_counts = [artist_df[count].values[0] for count in count_cols]
-
-        d = {}
-        for word, count in zip(artist_words, artist_counts):
-            d[word] = count
-
-        wordcloud = WordCloud(background_color = "white", width=800, height=400)
-        wordcloud.generate_from_frequencies(frequencies=d)
-
-        artist_fig = make_subplots(rows=1, cols=2, subplot_titles = [f'{artist} wordcloud', f'{artist} bar'])
-
-        artist_fig.add_trace(graph_objects.Image(z=wordcloud), row = 1, col = 1)
-        artist_fig.add_trace(graph_objects.Bar(x=artist_words, y=artist_counts, showlegend = False), row=1, col=2,)
-        artist_fig.update_layout(height = 1 * 400)
-
-        return [artist_fig,]
-
-    # ========= set available artist options based on chosen genre =========
-    @app.callback(
-        Output('wordcloud-artist-selection-dynamic', 'options'),
-        Input('wordcloud-genre-selection', 'value')
-    )
-    def set_dynamic_artist_options(genre):
-        genre_artists = list(top_20_filtered_words_artist_df[top_20_filtered_words_artist_df['genre'] == genre]['Artist'].unique())
-        options = [{"label": artist, "value": artist} for artist in genre_artists]
-        return options
-
-    # ======= choose from available dynamic options =========
-    @app.callback(
-        Output('wordcloud-artist-selection-dynamic', 'value'),
-        Input('wordcloud-artist-selection-dynamic', 'options')
-    )
-    def set_dynamic_artist_value(options):
-        return options[0]['value']
\ No newline at end of file
+        if ctx.triggered_id == 'wordcloud-genre-selection':
+            options = artist_wordcloud_options(genre)
+            artist = options[0]['value']
+            return [options, artist, artist_wordcloud_figure(artist)]
+        return [no_update, no_update, artist_wordcloud_figure(artist)]
@@ -0,0 +1,64 @@
+// Loads the lazy page sections (see lazy_sections.py) when they scroll near
+// the viewport, or when a link to something inside them is followed
+(function () {
+    var observer = new IntersectionObserver(function (entries) {
+        entries.forEach(function (entry) {
+            if (entry.isIntersecting) {
+                loadSection(entry.target);
+            }
+        });
+    }, {rootMargin: '200px'});
+
+    function loadSection(placeholder) {
+        if (placeholder.dataset.lazyRequested) {
+            return;
+        }
+        placeholder.dataset.lazyRequested = 'true';
+        observer.unobserve(placeholder);
+        var button = document.getElementById('lazy-section-load-' + placeholder.dataset.lazySection);
+        if (button) {
+            button.click();
+        }
+    }
+
+    // scroll to the anchor in the url once it's on the page, loading its section first
+    function showAnchor() {
+        var anchor = decodeURIComponent(window.location.hash.slice(1));
+        if (!anchor) {
+            return;
+        }
+        var target = document.getElementById(anchor);
+        if (target) {
+            target.scrollIntoView();
+            return;
+        }
+        document.querySelectorAll('[data-lazy-section]').forEach(function (placeholder) {
+            if (placeholder.dataset.lazyAnchors.split(' ').indexOf(anchor) !== -1) {
+                pendingAnchor = anchor;
+                loadSection(placeholder);
+            }
+        });
+    }
+
+    var pendingAnchor = null;
+
+    // the layout is rendered after this script runs, and sections are filled in later,
+    // so watch the page for new placeholders and for the pending anchor appearing
+    new MutationObserver(function () {
+        var added = document.querySelectorAll('[data-lazy-section]:not([data-lazy-observed])');
+        added.forEach(function (placeholder) {
+            placeholder.dataset.lazyObserved = 'true';
+            observer.observe(placeholder);
+        });
+        if (added.length) {
+            // the page was opened with a link into a section
+            showAnchor();
+        }
+        if (pendingAnchor && document.getElementById(pendingAnchor)) {
+            document.getElementById(pendingAnchor).scrollIntoView();
+            pendingAnchor = null;
+        }
+    }).observe(document.documentElement, {childList: true, subtree: true});
+
+    window.addEventListener('hashchange', showAnchor);
+})();
@@ -0,0 +1,711 @@
+"""
+Benchmarks for the app's data and callback paths, run from the src folder:
+
+    python benchmarks.py startup [--repeat N]
+    python benchmarks.py memory
+    python benchmarks.py freq-dist [--repeat N]
+    python benchmarks.py wordcloud [--repeat N]
+    python benchmarks.py groups [--rows N ...] [--repeat N]
+    python benchmarks.py histogram [--rows N ...] [--repeat N]
+    python benchmarks.py topic-counts [--rows N ...] [--topics N] [--chunk-size N]
+    python benchmarks.py topic-query [--rows N ...] [--repeat N]
+    python benchmarks.py ngrams [--rows N ...] [--chunk-tokens N]
+    python benchmarks.py term-fetch [--repeat N]
+    python benchmarks.py cv [--folds N] [--jobs N]
+    python benchmarks.py search [--candidates N]
+    python benchmarks.py predict [--clients N ...] [--requests N] [--rows N]
+    python benchmarks.py lyrics-classifier [--rows N ...] [--chunk-size N]
+    python benchmarks.py features [--repeat N]
+    python benchmarks.py importance [--jobs N ...] [--repeats N]
+"""
+import argparse
+import multiprocessing
+import os
+import time
+
+import data_cache
+from startup_profiler import rss_mb
+
+
+def timed(func, repeat):
+    """Best wall time of func() over repeat runs, in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_startup(args):
+    """Compare reading every data table from csv vs from the parquet cache"""
+    tables = [table for table in data_cache.CACHED_TABLES
+              if os.path.exists(os.path.join(data_cache.DATA_DIR, table))]
+    data_cache.build_cache(tables)
+
+    print(f'{"table":<55}{"csv [ms]":>10}{"parquet [ms]":>14}')
+    csv_total = parquet_total = 0
+    for table in tables:
+        csv_path = os.path.join(data_cache.DATA_DIR, table)
+        index_col = data_cache.CACHED_TABLES[table]
+        csv_time = timed(lambda: data_cache.read_csv_typed(csv_path, index_col=index_col),
+                         args.repeat)
+        parquet_time = timed(lambda: data_cache.read_table(csv_path), args.repeat)
+        csv_total += csv_time
+        parquet_total += parquet_time
+        print(f'{table:<55}{csv_time * 1000:>10.1f}{parquet_time * 1000:>14.1f}')
+    print(f'{"total":<55}{csv_total * 1000:>10.1f}{parquet_total * 1000:>14.1f}')
+
+
+def loaded_rss_mb(load_projected):
+    """RSS growth of a fresh process loading the projected datasets, whole or projected"""
+    from dataframes import datasets
+    before = rss_mb()
+    frames = []
+    for name in datasets.projected_names():
+        csv_path, index_col = datasets.source(name)
+        if not os.path.exists(csv_path):
+            continue
+        columns = datasets.projected_columns(name) if load_projected else None
+        frames.append(data_cache.read_table(csv_path, index_col=index_col, columns=columns))
+    return rss_mb() - before
+
+
+def benchmark_memory(args):
+    """Memory of the song-level datasets loaded whole vs with the view column manifests"""
+    from dataframes import datasets, memory_size
+
+    print(f'{"dataset":<20}{"columns":>12}{"whole [MB]":>14}{"projected [MB]":>16}')
+    whole_total = projected_total = 0
+    for name in datasets.projected_names():
+        csv_path, index_col = datasets.source(name)
+        if not os.path.exists(csv_path):
+            print(f'{name:<20} skipped, {csv_path} not found')
+            continue
+        columns = datasets.projected_columns(name)
+        whole = data_cache.read_table(csv_path, index_col=index_col)
+        projected = data_cache.read_table(csv_path, index_col=index_col, columns=columns)
+        whole_mb = memory_size(whole) / 2**20
+        projected_mb = memory_size(projected) / 2**20
+        whole_total += whole_mb
+        projected_total += projected_mb
+        print(f'{name:<20}{f"{len(columns)}/{whole.shape[1]}":>12}'
+              f'{whole_mb:>14.2f}{projected_mb:>16.2f}')
+    print(f'{"total":<20}{"":>12}{whole_total:>14.2f}{projected_total:>16.2f}')
+
+    # measured in separate processes, so the two runs don't share allocations
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        whole_rss = pool.apply(loaded_rss_mb, (False,))
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        projected_rss = pool.apply(loaded_rss_mb, (True,))
+    print(f'worker RSS growth: whole {whole_rss:.1f} MB, projected {projected_rss:.1f} MB')
+
+
+def legacy_top_words(df, entity_col, entity, k=20):
+    """The frequency comparison callbacks' data step before the comparison index"""
+    import ast
+    from itertools import islice
+    comp_dict = df[df[entity_col] == entity]['sorted_comparison_dict'].values[0]
+    comp_dict = ast.literal_eval(comp_dict)
+    comp_dict_no_unique = {k: v for k, v in comp_dict.items() if v != 1000}
+    top = list(islice(comp_dict_no_unique.items(), k))
+    return [word for word, _ in top], [ratio for _, ratio in top]
+
+
+def benchmark_freq_dist(args):
+    """Latency of the words-more-common-to callbacks, parsing dicts vs the comparison index"""
+    import plotly.graph_objects as graph_objects
+
+    import comparison_index
+    from dataframes import datasets
+
+    def callback(top_words, entities):
+        fig = graph_objects.Figure()
+        for entity in entities:
+            words, ratios = top_words(entity)
+            fig.add_trace(graph_objects.Bar(x=words, y=ratios, name=entity))
+        return fig
+
+    print(f'{"kind":<8}{"entities":>10}{"parse dict [ms]":>18}{"index [ms]":>13}')
+    for kind, (dataset, entity_col) in comparison_index.INDEX_SOURCES.items():
+        csv_path, _ = datasets.source(dataset)
+        if not os.path.exists(csv_path):
+            print(f'{kind:<8} skipped, {csv_path} not found')
+            continue
+        df = datasets[dataset]
+        index = comparison_index.load_index(kind)
+        entities = list(index.entities)[:3]
+
+        for entity in entities:
+            legacy_words, legacy_ratios = legacy_top_words(df, entity_col, entity)
+            words, ratios = index.top(entity)
+            assert list(words) == legacy_words and list(ratios) == legacy_ratios, entity
+
+        legacy_time = timed(lambda: callback(
+            lambda entity: legacy_top_words(df, entity_col, entity), entities), args.repeat)
+        index_time = timed(lambda: callback(index.top, entities), args.repeat)
+        print(f'{kind:<8}{len(entities):>10}{legacy_time * 1000:>18.1f}{index_time * 1000:>13.1f}')
+
+
+def benchmark_wordcloud(args):
+    """Wordcloud render time uncached vs from the disk cache vs from the in-memory LRU"""
+    import tempfile
+
+    import wordcloud_cache
+    from dataframes import datasets, count_cols, word_cols
+
+    words_df = datasets.top_20_filtered_words_artist
+    frequencies = [dict(zip(row[word_cols], row[count_cols]))
+                   for _, row in words_df.head(args.repeat).iterrows()]
+
+    with tempfile.TemporaryDirectory() as directory:
+        writer = wordcloud_cache.WordcloudCache(directory=directory)
+        # a fresh cache over the same directory, like another worker
+        reader = wordcloud_cache.WordcloudCache(directory=directory)
+        render_time = timed(lambda: [writer.render(d) for d in frequencies], 1)
+        disk_time = timed(lambda: [reader.render(d) for d in frequencies], 1)
+        memory_time = timed(lambda: [reader.render(d) for d in frequencies], 1)
+
+    print(f'{"path":<10}{"per wordcloud [ms]":>20}')
+    for path, total in (('render', render_time), ('disk', disk_time), ('memory', memory_time)):
+        print(f'{path:<10}{total / len(frequencies) * 1000:>20.2f}')
+
+
+def benchmark_groups(args):
+    """Filtering the song table by genre / artist with boolean scans vs the group index"""
+    import pandas as pd
+
+    import group_index
+    from dataframes import datasets
+
+    counts_df = datasets.counts
+    genres = list(counts_df['genre'].cat.categories[:2])
+    artists = list(counts_df[counts_df['genre'].isin(genres)]['Artist'].unique()[:3])
+
+    print(f'{"rows":>10}{"step":>16}{"scan [ms]":>12}{"index [ms]":>12}{"build [ms]":>12}')
+    for rows in args.rows:
+        # the song table repeated up to the given size
+        repeats = -(-rows // len(counts_df))
+        df = pd.concat([counts_df] * repeats, ignore_index=True).head(rows)
+        build_time = timed(lambda: group_index.GroupIndex.from_frame(
+            df, ['genre', 'Artist'], hierarchy=[('genre', 'Artist')]), 1)
+        index = group_index.GroupIndex.from_frame(df, ['genre', 'Artist'],
+                                                  hierarchy=[('genre', 'Artist')])
+
+        def scan_topic():
+            genre_df = df[df['genre'].isin(genres)]
+            return genre_df[genre_df['Artist'].isin(artists)]
+
+        def scan_options():
+            return [artist for genre in genres
+                    for artist in df[df['genre'] == genre]['Artist'].unique()]
+
+        steps = {
+            'topic graph': (scan_topic, lambda: index.take(df, genre=genres, Artist=artists)),
+            'genre hist': (lambda: df[df['genre'] == genres[0]],
+                           lambda: index.take(df, genre=genres[0])),
+            'artist options': (scan_options,
+                               lambda: index.child_values('genre', 'Artist', genres)),
+        }
+        for step, (scan, indexed) in steps.items():
+            scanned, taken = scan(), indexed()
+            if isinstance(scanned, pd.DataFrame):
+                assert scanned.index.equals(taken.index), step
+            else:
+                assert list(scanned) == list(taken), step
+            print(f'{rows:>10}{step:>16}{timed(scan, args.repeat) * 1000:>12.2f}'
+                  f'{timed(indexed, args.repeat) * 1000:>12.2f}{build_time * 1000:>12.1f}')
+
+
+def benchmark_histogram(args):
+    """Payload and latency of the genre histogram callback, px.histogram vs server-side bins"""
+    import pandas as pd
+    import plotly.express as px
+
+    import group_index
+    import histograms
+    from dataframes import datasets
+
+    counts_df = datasets.counts
+    genre = counts_df['genre'].cat.categories[0]
+    column, nbins = 'manual_love_count', 10
+
+    print(f'{"rows":>10}{"px [KB]":>10}{"binned [KB]":>13}{"px [ms]":>10}'
+          f'{"binned [ms]":>13}{"cold [ms]":>11}')
+    for rows in args.rows:
+        repeats = -(-rows // len(counts_df))
+        df = pd.concat([counts_df] * repeats, ignore_index=True).head(rows)
+        groups = group_index.GroupIndex.from_frame(df, ['genre'])
+
+        def legacy():
+            genre_df = df[df['genre'] == genre]
+            return px.histogram(genre_df, x=column, nbins=nbins).to_json()
+
+        def binned(group_histograms):
+            edges, counts = group_histograms.histogram(column, genre, nbins)
+            return histograms.histogram_figure(edges, counts).to_json()
+
+        # the first histogram of a column / genre sorts its values
+        cold_time = timed(lambda: binned(histograms.GroupHistograms(df, groups, 'genre')), 1)
+        group_histograms = histograms.GroupHistograms(df, groups, 'genre')
+        legacy_json, binned_json = legacy(), binned(group_histograms)
+        print(f'{rows:>10}{len(legacy_json) / 1024:>10.1f}{len(binned_json) / 1024:>13.1f}'
+              f'{timed(legacy, args.repeat) * 1000:>10.1f}'
+              f'{timed(lambda: binned(group_histograms), args.repeat) * 1000:>13.1f}'
+              f'{cold_time * 1000:>11.1f}')
+
+
+def benchmark_topic_counts(args):
+    """Songs per second of topic counting, per-song word loops vs the sparse product"""
+    import numpy as np
+
+    import topic_counts
+    from dataframes import datasets
+    from lyrics_store import stores
+
+    # the example lexicon standing in for each topic
+    example_words = topic_counts.EXAMPLE_LEXICONS['love']
+    lexicons = {f'topic{topic}': example_words for topic in range(args.topics)}
+    lexicon_words = {topic: set(words) for topic, words in lexicons.items()}
+    song_ids = stores['counts'].song_ids()
+    lyrics = stores['counts'].get_many(song_ids)
+
+    # the recounted word totals have to match the table
+    counter = topic_counts.TopicCounter(lexicons)
+    counted = counter.count_texts(lyrics, index=song_ids)
+    table = datasets.counts.loc[song_ids]
+    for column in ('unique_words', 'total_words'):
+        assert np.array_equal(counted[column].to_numpy(), table[column].to_numpy()), column
+
+    def loop(texts):
+        return [[sum(word in words for word in text.split()) for words in lexicon_words.values()]
+                for text in texts]
+
+    def chunked(texts):
+        chunks = ((texts[start:start + args.chunk_size], None)
+                  for start in range(0, len(texts), args.chunk_size))
+        for _ in counter.stream(chunks):
+            pass
+
+    print(f'{"songs":>10}{"loop [songs/s]":>16}{"sparse [songs/s]":>18}{"chunk tokens [MB]":>19}')
+    for rows in args.rows:
+        texts = (lyrics * -(-rows // len(lyrics)))[:rows]
+        loop_time = timed(lambda: loop(texts), 1)
+        sparse_time = timed(lambda: chunked(texts), 1)
+        token_ids, offsets, _ = topic_counts.tokenize(texts[:args.chunk_size])
+        chunk_mb = (token_ids.nbytes + offsets.nbytes) / 2**20
+        print(f'{rows:>10}{rows / loop_time:>16,.0f}{rows / sparse_time:>18,.0f}{chunk_mb:>19.1f}')
+
+
+def benchmark_topic_query(args):
+    """Latency of a typed topic query, column scan of the count matrix vs posting lists"""
+    import numpy as np
+    import pandas as pd
+    from scipy import sparse
+
+    import topic_index
+    from dataframes import datasets
+
+    corpus = datasets.lyrics_corpus
+    words = topic_index.parse_words('cars, truck, drive, love')
+    word_ids = [corpus.word_ids[word] for word in words]
+
+    print(f'{"songs":>10}{"by":>8}{"scan [ms]":>12}{"index [ms]":>12}{"build [s]":>11}')
+    for rows in args.rows:
+        # the corpus repeated up to the given size
+        repeats = -(-rows // corpus.counts.shape[0])
+        counts = sparse.vstack([corpus.counts] * repeats).tocsr()[:rows]
+        meta = pd.concat([corpus.meta] * repeats, ignore_index=True).head(rows)
+        song_words = np.tile(np.diff(corpus.offsets), repeats)[:rows]
+
+        def build():
+            postings = counts.tocsc()
+            postings.sort_indices()
+            return topic_index.TopicIndex(corpus.vocab, postings.indptr, postings.indices,
+                                          postings.data, meta, song_words)
+
+        build_time = timed(build, 1)
+        index = build()
+        for by in ('genre', 'Artist'):
+            def scan():
+                word_counts = counts[:, word_ids].toarray()
+                return pd.DataFrame(word_counts, columns=words).groupby(
+                    meta[by].to_numpy(), observed=True).sum()
+
+            scanned, queried = scan(), index.query(words, by)
+            assert np.array_equal(scanned.to_numpy(), queried.loc[scanned.index, words].to_numpy())
+            print(f'{rows:>10}{by:>8}{timed(scan, args.repeat) * 1000:>12.2f}'
+                  f'{timed(lambda: index.query(words, by), args.repeat) * 1000:>12.2f}'
+                  f'{build_time:>11.2f}')
+
+
+def benchmark_ngrams(args):
+    """Top artist n-grams, Counter over each artist's lyrics vs chunked rolling hashes"""
+    from collections import Counter
+    from types import SimpleNamespace
+
+    import numpy as np
+    import pandas as pd
+
+    import ngrams
+    from dataframes import datasets
+
+    corpus = datasets.lyrics_corpus
+
+    def counter_top(sample):
+        tops = {}
+        for artist, songs in sample.meta.groupby('Artist', observed=True).indices.items():
+            words = np.concatenate([sample.vocab[sample.token_ids[sample.offsets[song]:
+                                                                  sample.offsets[song + 1]]]
+                                    for song in songs]).tolist()
+            for n in range(2, ngrams.MAX_N + 1):
+                tops[artist, n] = Counter(zip(*[words[shift:] for shift in range(n)])) \
+                    .most_common(ngrams.TOP_K)
+        return tops
+
+    print(f'{"songs":>10}{"counter [songs/s]":>19}{"chunked [songs/s]":>19}{"RSS growth [MB]":>17}')
+    for rows in args.rows:
+        # the corpus repeated up to the given size, each copy a new set of artists
+        repeats = -(-rows // len(corpus.meta))
+        lengths = np.tile(np.diff(corpus.offsets), repeats)[:rows]
+        meta = pd.concat([corpus.meta.assign(Artist=corpus.meta['Artist'].astype(str) + f' {copy}')
+                          for copy in range(repeats)], ignore_index=True).head(rows)
+        sample = SimpleNamespace(
+            meta=meta, vocab=corpus.vocab,
+            token_ids=np.tile(corpus.token_ids, repeats)[:lengths.sum()],
+            offsets=np.concatenate([[0], np.cumsum(lengths)]))
+
+        before = rss_mb()
+        start = time.perf_counter()
+        ngrams.top_ngrams(sample, 'Artist', chunk_tokens=args.chunk_tokens, across_songs=True)
+        chunked_time = time.perf_counter() - start
+        rss_growth = rss_mb() - before
+        counter_time = timed(lambda: counter_top(sample), 1) if rows <= 10_000 else float('nan')
+        print(f'{rows:>10}{rows / counter_time:>19,.0f}{rows / chunked_time:>19,.0f}'
+              f'{rss_growth:>17.1f}')
+
+
+def legacy_terms(df, entity_col, entity, gram_cols, count_cols):
+    """An entity's words and counts as the wordcloud callbacks read them from the wide tables"""
+    entity_df = df[df[entity_col] == entity]
+    return ([entity_df[word].values[0] for word in gram_cols],
+            [entity_df[count].values[0] for count in count_cols])
+
+
+def benchmark_term_fetch(args):
+    """Data fetch of the artist top words / n-gram callbacks, wide tables vs long term tables"""
+    import term_tables
+    from dataframes import datasets
+
+    # (wide dataset, long dataset, lengths of the terms)
+    sources = {
+        'words': ('top_20_filtered_words_artist', 'artist_top_words', [1]),
+        'ngrams': ('artist_ngrams', 'artist_ngram_terms', term_tables.NGRAM_LENS),
+    }
+    print(f'{"kind":<8}{"artists":>9}{"wide [ms]":>12}{"long [ms]":>12}')
+    for kind, (wide_name, long_name, lens) in sources.items():
+        wide = datasets[wide_name]
+        terms = datasets[long_name]
+        columns = term_tables.word_columns() if kind == 'words' else term_tables.ngram_columns()
+        by_n = {n: ([gram for m, _, gram, _ in columns if m == n],
+                    [count for m, _, _, count in columns if m == n]) for n in lens}
+        artists = list(terms.info.index)
+
+        def fetch_wide():
+            for artist in artists:
+                for gram_cols, count_cols in by_n.values():
+                    legacy_terms(wide, 'Artist', artist, gram_cols, count_cols)
+
+        def fetch_long():
+            for artist in artists:
+                for n in lens:
+                    terms.fetch(artist, n)
+
+        for artist in artists:
+            for n, (gram_cols, count_cols) in by_n.items():
+                grams, counts = terms.fetch(artist, n)
+                assert (list(grams), list(counts)) == legacy_terms(wide, 'Artist', artist,
+                                                                   gram_cols, count_cols), artist
+
+        wide_time = timed(fetch_wide, args.repeat) / len(artists)
+        long_time = timed(fetch_long, args.repeat) / len(artists)
+        print(f'{kind:<8}{len(artists):>9}{wide_time * 1000:>12.3f}{long_time * 1000:>12.3f}')
+
+
+def benchmark_cv(args):
+    """k-fold cross-validation of the ML section models, folds fitted serially vs in parallel"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.svm import SVC
+    from xgboost.sklearn import XGBRegressor
+
+    from model_evaluation import RANDOM_STATE, cross_validate_target
+    from scikit_ml import classif_counts_df
+
+    models = {
+        'SVC': (SVC(), 'genre', 'class'),
+        'KNN': (KNeighborsClassifier(), 'genre', 'class'),
+        'RandomForest': (RandomForestClassifier(random_state=RANDOM_STATE), 'genre', 'class'),
+        'XGBRegressor': (XGBRegressor(random_state=RANDOM_STATE), 'unique_words', 'regr'),
+    }
+    print(f'{classif_counts_df.shape[0]} songs, {args.folds} folds, {multiprocessing.cpu_count()} cpus')
+    print(f'{"model":<14}{"metric":>22}{"serial [s]":>12}{"parallel [s]":>14}{"cached [ms]":>13}')
+    for name, (model, target_col, task) in models.items():
+        def evaluate(n_jobs, cache=False):
+            return cross_validate_target(classif_counts_df, target_col, model, n_splits=args.folds,
+                                         task=task, n_jobs=n_jobs, cache=cache)
+
+        serial_time = timed(lambda: evaluate(1), 1)
+        parallel_time = timed(lambda: evaluate(args.jobs), 1)
+        scores = evaluate(args.jobs, cache=True)
+        cached_time = timed(lambda: evaluate(args.jobs, cache=True), 3)
+        metric = scores['mean'].index[0]
+        score = f'{metric} {scores["mean"][metric]:.3f} ± {scores["std"][metric]:.3f}'
+        print(f'{name:<14}{score:>22}{serial_time:>12.2f}{parallel_time:>14.2f}'
+              f'{cached_time * 1000:>13.1f}')
+
+
+def benchmark_search(args):
+    """Scoring search candidates, refitting the preprocessing pipeline vs the shared feature matrix"""
+    from sklearn.base import clone
+    from sklearn.model_selection import cross_val_score
+
+    import model_search
+    from feature_store import frame_matrix
+    from model_evaluation import build_pipeline, fold_splits, N_SPLITS, RANDOM_STATE
+    from scikit_ml import classif_counts_df
+
+    print(f'{"model":<22}{"candidates":>12}{"pipeline [s]":>14}{"shared [s]":>12}')
+    for name, (target_col, task, model, space) in model_search.SEARCH_SPACES.items():
+        y = classif_counts_df[target_col].to_numpy()
+        X = classif_counts_df.drop([target_col], axis=1)
+        splits = fold_splits(X, y, N_SPLITS, task, RANDOM_STATE)
+        scoring = model_search.SCORING[task]
+        candidates = model_search.candidates(space, args.candidates)
+
+        def refit_pipeline():
+            return [cross_val_score(build_pipeline(X, clone(model).set_params(**params)), X, y,
+                                    cv=splits, scoring=scoring).mean()
+                    for params in candidates]
+
+        def shared_matrix():
+            features_path = frame_matrix(classif_counts_df, target_col, name).path
+            return [model_search.score_candidate(features_path, y, model, params, splits, scoring,
+                                                 len(y), RANDOM_STATE)[0]
+                    for params in candidates]
+
+        pipeline_time = timed(refit_pipeline, 1)
+        shared_time = timed(shared_matrix, 1)
+        print(f'{name:<22}{len(candidates):>12}{pipeline_time:>14.2f}{shared_time:>12.2f}')
+
+
+def benchmark_predict(args):
+    """Concurrent prediction requests, one predict call each vs micro-batched"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    import prediction_service
+    from scikit_ml import counts_genre_results
+
+    pipeline = counts_genre_results['train_pipeline']
+    numerical_cols, categorical_cols = prediction_service.pipeline_columns(pipeline)
+    records = counts_genre_results['X_valid'].head(args.rows).to_dict('records')
+
+    def run(clients, predict):
+        def client(_):
+            for _ in range(args.requests):
+                predict(prediction_service.rows_frame(records, numerical_cols, categorical_cols))
+        with ThreadPoolExecutor(clients) as pool:
+            list(pool.map(client, range(clients)))
+
+    print(f'{args.rows} rows per request, {args.requests} requests per client')
+    print(f'{"clients":>8}{"direct [req/s]":>16}{"batched [req/s]":>17}{"requests/batch":>16}'
+          f'{"p95 [ms]":>10}')
+    for clients in args.clients:
+        batcher = prediction_service.MicroBatcher(pipeline.predict)
+        total = clients * args.requests
+        direct_time = timed(lambda: run(clients, pipeline.predict), 1)
+        batched_time = timed(lambda: run(clients, batcher.submit), 1)
+        stats = batcher.stats()
+        print(f'{clients:>8}{total / direct_time:>16,.0f}{total / batched_time:>17,.0f}'
+              f'{stats["requests_per_batch"]["mean"]:>16.1f}{stats["latency_ms"]["p95"]:>10.1f}')
+
+
+def benchmark_lyrics_classifier(args):
+    """Streaming training of the lyrics genre classifier, throughput and memory growth"""
+    import numpy as np
+
+    import lyrics_classifier
+    from dataframes import datasets
+
+    targets = datasets.counts['genre'].dropna()
+    classes = np.unique(targets.to_numpy())
+    print(f'{"songs":>10}{"songs/s":>10}{"RSS growth [MB]":>17}')
+    for rows in args.rows:
+        # the table's songs streamed over and over up to the given number
+        positions = np.arange(rows) % len(targets)
+        chunks = lyrics_classifier.lyrics_chunks(
+            'counts', targets.index.to_numpy()[positions].tolist(),
+            targets.to_numpy()[positions], args.chunk_size)
+        model = lyrics_classifier.lyrics_model()
+        vectorizer = lyrics_classifier.lyrics_vectorizer()
+        before = rss_mb()
+        start = time.perf_counter()
+        lyrics_classifier.fit_stream(model, vectorizer, chunks, classes)
+        train_time = time.perf_counter() - start
+        print(f'{rows:>10}{rows / train_time:>10,.0f}{rss_mb() - before:>17.1f}')
+
+
+def benchmark_features(args):
+    """Design matrix of each ml column set, fitting the preprocessor vs mapping the stored one"""
+    import feature_store
+    from model_evaluation import build_pipeline
+
+    print(f'{"column set":<34}{"target":>12}{"shape":>12}{"encode [ms]":>13}{"load [ms]":>11}')
+    for column_set, (_, _, target) in feature_store.COLUMN_SETS.items():
+        df = feature_store.column_set_frame(column_set)
+        X = df.drop([target], axis=1) if target is not None else df
+
+        def encode():
+            return build_pipeline(X, 'passthrough').named_steps['preprocessor'].fit_transform(X)
+
+        matrix = feature_store.design_matrix(column_set)
+        encode_time = timed(encode, args.repeat)
+        load_time = timed(lambda: feature_store.design_matrix(column_set), args.repeat)
+        shape = 'x'.join(map(str, matrix.X.shape))
+        print(f'{column_set:<34}{str(target):>12}{shape:>12}{encode_time * 1000:>13.1f}'
+              f'{load_time * 1000:>11.1f}')
+
+
+def benchmark_importance(args):
+    """Feature importance report of the genre classifier on 1..N processes, and from its cache"""
+    import feature_importance
+    from scikit_ml import counts_genre_results
+
+    def report(n_jobs, cache):
+        return feature_importance.importance_report(
+            counts_genre_results['train_pipeline'], counts_genre_results['X_valid'],
+            counts_genre_results['y_valid'], n_repeats=args.repeats, n_jobs=n_jobs, cache=cache)
+
+    n_columns = counts_genre_results['X_valid'].shape[1]
+    print(f'{n_columns} columns, {args.repeats} shuffles each, {multiprocessing.cpu_count()} cpus')
+    print(f'{"jobs":>6}{"computed [s]":>14}')
+    for n_jobs in args.jobs:
+        print(f'{n_jobs:>6}{timed(lambda: report(n_jobs, False), 1):>14.2f}')
+    report(-1, True)
+    print(f'cached: {timed(lambda: report(-1, True), 3) * 1000:.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    startup_parser = subparsers.add_parser('startup',
+                                           help='csv vs parquet load time of data tables')
+    startup_parser.add_argument('--repeat', type=int, default=5)
+    startup_parser.set_defaults(func=benchmark_startup)
+
+    memory_parser = subparsers.add_parser('memory',
+                                          help='memory of song-level datasets, whole vs projected')
+    memory_parser.set_defaults(func=benchmark_memory)
+
+    freq_dist_parser = subparsers.add_parser('freq-dist',
+                                             help='frequency comparison callback latency')
+    freq_dist_parser.add_argument('--repeat', type=int, default=5)
+    freq_dist_parser.set_defaults(func=benchmark_freq_dist)
+
+    wordcloud_parser = subparsers.add_parser('wordcloud',
+                                             help='wordcloud render time, uncached vs cached')
+    wordcloud_parser.add_argument('--repeat', type=int, default=10,
+                                  help='number of artist wordclouds rendered')
+    wordcloud_parser.set_defaults(func=benchmark_wordcloud)
+
+    groups_parser = subparsers.add_parser('groups',
+                                          help='genre / artist filtering, scans vs group index')
+    groups_parser.add_argument('--rows', type=int, nargs='+', default=[800, 100_000, 1_000_000],
+                               help='sizes of the song table, repeated up to them')
+    groups_parser.add_argument('--repeat', type=int, default=5)
+    groups_parser.set_defaults(func=benchmark_groups)
+
+    histogram_parser = subparsers.add_parser('histogram',
+                                             help='histogram payload / latency, px vs server-side bins')
+    histogram_parser.add_argument('--rows', type=int, nargs='+', default=[800, 100_000, 1_000_000],
+                                  help='sizes of the song table, repeated up to them')
+    histogram_parser.add_argument('--repeat', type=int, default=5)
+    histogram_parser.set_defaults(func=benchmark_histogram)
+
+    topic_counts_parser = subparsers.add_parser(
+        'topic-counts', help='topic counting throughput, per-song loops vs sparse product')
+    topic_counts_parser.add_argument('--rows', type=int, nargs='+', default=[800, 100_000],
+                                     help='numbers of songs, the lyrics repeated up to them')
+    topic_counts_parser.add_argument('--topics', type=int, default=9,
+                                     help='number of topics counted')
+    topic_counts_parser.add_argument('--chunk-size', type=int, default=5000)
+    topic_counts_parser.set_defaults(func=benchmark_topic_counts)
+
+    topic_query_parser = subparsers.add_parser(
+        'topic-query', help='custom topic query latency, matrix scan vs inverted index')
+    topic_query_parser.add_argument('--rows', type=int, nargs='+', default=[2_000, 100_000, 1_000_000],
+                                    help='numbers of songs, the corpus repeated up to them')
+    topic_query_parser.add_argument('--repeat', type=int, default=5)
+    topic_query_parser.set_defaults(func=benchmark_topic_query)
+
+    ngrams_parser = subparsers.add_parser(
+        'ngrams', help='top n-grams per artist, Counter vs chunked rolling hashes')
+    ngrams_parser.add_argument('--rows', type=int, nargs='+', default=[2_000, 20_000, 100_000],
+                               help='numbers of songs, the corpus repeated up to them '
+                                    '(Counter only run up to 10k)')
+    ngrams_parser.add_argument('--chunk-tokens', type=int, default=2_000_000)
+    ngrams_parser.set_defaults(func=benchmark_ngrams)
+
+    term_fetch_parser = subparsers.add_parser(
+        'term-fetch', help='artist top words / n-grams fetch, wide tables vs long term tables')
+    term_fetch_parser.add_argument('--repeat', type=int, default=5)
+    term_fetch_parser.set_defaults(func=benchmark_term_fetch)
+
+    cv_parser = subparsers.add_parser(
+        'cv', help='k-fold cross-validation of the ML models, serial vs parallel folds')
+    cv_parser.add_argument('--folds', type=int, default=5)
+    cv_parser.add_argument('--jobs', type=int, default=-1,
+                           help='worker processes of the parallel run, -1 for one per cpu')
+    cv_parser.set_defaults(func=benchmark_cv)
+
+    search_parser = subparsers.add_parser(
+        'search', help='search candidate scoring, refitting the pipeline vs a shared feature matrix')
+    search_parser.add_argument('--candidates', type=int, default=10)
+    search_parser.set_defaults(func=benchmark_search)
+
+    predict_parser = subparsers.add_parser(
+        'predict', help='concurrent prediction requests, direct vs micro-batched')
+    predict_parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32],
+                                help='concurrent client threads')
+    predict_parser.add_argument('--requests', type=int, default=50, help='requests per client')
+    predict_parser.add_argument('--rows', type=int, default=4, help='rows per request')
+    predict_parser.set_defaults(func=benchmark_predict)
+
+    lyrics_classifier_parser = subparsers.add_parser(
+        'lyrics-classifier', help='streaming lyrics classifier training throughput and memory')
+    lyrics_classifier_parser.add_argument('--rows', type=int, nargs='+',
+                                          default=[10_000, 50_000, 200_000],
+                                          help='numbers of songs, the table streamed up to them')
+    lyrics_classifier_parser.add_argument('--chunk-size', type=int, default=500)
+    lyrics_classifier_parser.set_defaults(func=benchmark_lyrics_classifier)
+
+    features_parser = subparsers.add_parser(
+        'features', help='design matrices of the ml column sets, encoded vs loaded from the store')
+    features_parser.add_argument('--repeat', type=int, default=5)
+    features_parser.set_defaults(func=benchmark_features)
+
+    importance_parser = subparsers.add_parser(
+        'importance', help='permutation importance and partial dependence, by worker processes')
+    importance_parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2, 4])
+    importance_parser.add_argument('--repeats', type=int, default=10)
+    importance_parser.set_defaults(func=benchmark_importance)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+Offline build steps for the app, run from the src folder:
+
+    python build.py data-cache [--force]
+    python build.py comparison-index
+    python build.py lyrics-corpus
+    python build.py wordcloud-assets [--processes N]
+    python build.py models [--force]
+    python build.py figures [--force]
+    python build.py topic-counts --lexicons FILE [--tables NAME ...] [--chunk-size N]
+    python build.py ngrams [--by COLUMNS ...] [--max-n N] [--top-k K] [--store TABLE]
+                           [--across-songs] [--wide]
+    python build.py search [--models NAME ...] [--method {random,halving}] [--candidates N]
+                           [--jobs N]
+    python build.py features [--sets NAME ...]
+    python build.py importance [--repeats N] [--jobs N]
+"""
+import argparse
+
+import pandas as pd
+
+import comparison_index
+import data_cache
+import feature_importance
+import feature_store
+import figure_snapshots
+import lyrics_corpus
+import lyrics_store
+import topic_index
+import model_artifacts
+import model_search
+import ngrams
+import topic_counts
+import wordcloud_assets
+
+
+def build_data_cache(args):
+    written = data_cache.build_cache(force=args.force)
+    print(f'wrote {len(written)} parquet files to {data_cache.CACHE_DIR}')
+    lyrics_store.build_stores()
+    print(f'wrote song lyrics stores to {lyrics_store.LYRICS_DIR}')
+
+
+def build_comparison_index(args):
+    for kind in comparison_index.INDEX_SOURCES:
+        comparison_index.build_index(kind)
+        print(f'wrote {comparison_index.index_path(kind)}')
+
+
+def build_lyrics_corpus(args):
+    corpus = lyrics_corpus.build_corpus()
+    corpus.save()
+    topic_index.TopicIndex.from_corpus(corpus).save()
+    print(f'wrote {corpus.counts.shape[0]} songs x {corpus.counts.shape[1]} words '
+          f'and their posting lists to {lyrics_corpus.CORPUS_DIR}')
+
+
+def build_wordcloud_assets(args):
+    manifest = wordcloud_assets.build_assets(processes=args.processes)
+    total = sum(len(names) for names in manifest.values())
+    print(f'wrote {total} wordclouds and {wordcloud_assets.MANIFEST_PATH}')
+
+
+def build_models(args):
+    if args.force:
+        model_artifacts.remove_artifacts()
+    # importing the ml section loads its models, training the missing / stale ones
+    import scikit_ml
+    for name, artifact in model_artifacts.artifact_metrics().items():
+        metrics = {key: value for key, value in artifact['metrics'].items()
+                   if key in ('acc', 'mae', 'r2')}
+        print(f'{name}: {metrics}, trained {artifact["trained_at"]} '
+              f'in {artifact["train_time_s"]:.2f}s')
+
+
+def build_figures(args):
+    paths = figure_snapshots.build_snapshots(force=args.force)
+    print(f'wrote {len(paths)} figure snapshots to {figure_snapshots.SNAPSHOT_DIR}')
+
+
+def build_topic_counts(args):
+    lexicons = topic_counts.load_lexicons(args.lexicons)
+    for dataset in args.tables:
+        path, n_songs = topic_counts.write_table_counts(dataset, lexicons,
+                                                        chunk_size=args.chunk_size)
+        print(f'wrote the topic counts of {n_songs} songs to {path}')
+        # the percents rounded as in the table, whatever the lexicons
+        for column, share in topic_counts.percent_agreement(dataset).items():
+            print(f'  {column}: rounding matches the table for {share:.1%} of songs')
+        recounted = pd.read_csv(path, index_col=0)
+        for column, share in topic_counts.table_agreement(dataset, recounted).items():
+            print(f'  {column}: recount equals the table for {share:.1%} of songs')
+
+
+def build_ngrams(args):
+    for by in args.by:
+        paths = ngrams.build_ngrams(by.split(','), max_n=args.max_n, k=args.top_k,
+                                    chunk_tokens=args.chunk_tokens, store=args.store,
+                                    across_songs=args.across_songs, wide=args.wide)
+        print(f'wrote the top {args.top_k} 2..{args.max_n}-grams by {by} to {", ".join(paths)}')
+
+
+def build_search(args):
+    # the tables the ml section trains on
+    from scikit_ml import classif_counts_df
+    for name in args.models:
+        leaderboard, path = model_search.run_search(
+            classif_counts_df, name, method=args.method, n_candidates=args.candidates,
+            n_jobs=args.jobs)
+        print(f'{name} leaderboard in {path}, best:')
+        print(leaderboard.head(5).to_string(index=False))
+
+
+def build_features(args):
+    for column_set in args.sets:
+        matrix = feature_store.design_matrix(column_set)
+        print(f'{column_set}: {matrix.X.shape[0]} rows x {matrix.X.shape[1]} features '
+              f'in {matrix.path}')
+
+
+def build_importance(args):
+    from scikit_ml import counts_genre_results
+    importance, _ = feature_importance.importance_report(
+        counts_genre_results['train_pipeline'], counts_genre_results['X_valid'],
+        counts_genre_results['y_valid'], n_repeats=args.repeats, n_jobs=args.jobs)
+    print(f'permutation importance of the counts_genre columns, {args.repeats} shuffles each, '
+          f'cached in {feature_importance.IMPORTANCE_DIR}:')
+    print(importance.to_string(index=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='step', required=True)
+
+    data_cache_parser = subparsers.add_parser('data-cache',
+                                              help='write the parquet cache of data/*.csv and the lyrics stores')
+    data_cache_parser.add_argument('--force', action='store_true',
+                                   help='rebuild files which are still fresh')
+    data_cache_parser.set_defaults(func=build_data_cache)
+
+    comparison_index_parser = subparsers.add_parser(
+        'comparison-index', help='parse the word frequency comparison dicts into arrays')
+    comparison_index_parser.set_defaults(func=build_comparison_index)
+
+    lyrics_corpus_parser = subparsers.add_parser(
+        'lyrics-corpus', help='tokenize all lyrics into the sparse song x word count matrix and its inverted index')
+    lyrics_corpus_parser.set_defaults(func=build_lyrics_corpus)
+
+    wordcloud_assets_parser = subparsers.add_parser(
+        'wordcloud-assets', help='render every wordcloud into assets/wordclouds')
+    wordcloud_assets_parser.add_argument('--processes', type=int, default=None,
+                                         help='worker processes (default: one per cpu)')
+    wordcloud_assets_parser.set_defaults(func=build_wordcloud_assets)
+
+    models_parser = subparsers.add_parser(
+        'models', help='train the ml section models into models/, if their data changed')
+    models_parser.add_argument('--force', action='store_true',
+                               help='retrain even if the saved models are up to date')
+    models_parser.set_defaults(func=build_models)
+
+    figures_parser = subparsers.add_parser(
+        'figures', help='save the static figures as json snapshots, if their data changed')
+    figures_parser.add_argument('--force', action='store_true',
+                                help='rebuild the snapshots which are still up to date')
+    figures_parser.set_defaults(func=build_figures)
+
+    topic_counts_parser = subparsers.add_parser(
+        'topic-counts', help='recount the manual_*_count topic columns of the song tables')
+    topic_counts_parser.add_argument('--lexicons', required=True,
+                                     help='json file of {topic: [words]}, one per topic column')
+    topic_counts_parser.add_argument('--tables', nargs='+', default=list(topic_counts.TOPIC_TABLES),
+                                     choices=list(topic_counts.TOPIC_TABLES))
+    topic_counts_parser.add_argument('--chunk-size', type=int, default=topic_counts.CHUNK_SIZE,
+                                     help='songs tokenized and counted at a time')
+    topic_counts_parser.set_defaults(func=build_topic_counts)
+
+    ngrams_parser = subparsers.add_parser(
+        'ngrams', help='count the top n-grams of every artist / genre / decade')
+    ngrams_parser.add_argument('--by', nargs='+', default=['Artist', 'genre', 'decade'],
+                               help='song metadata columns to group by, comma-separated for several')
+    ngrams_parser.add_argument('--max-n', type=int, default=ngrams.MAX_N)
+    ngrams_parser.add_argument('--top-k', type=int, default=ngrams.TOP_K)
+    ngrams_parser.add_argument('--chunk-tokens', type=int, default=ngrams.CHUNK_TOKENS,
+                               help='tokens counted at a time')
+    ngrams_parser.add_argument('--store', choices=['counts', 'decade_counts'],
+                               help='only the songs of one song table (artist_ngrams.csv is of counts)')
+    ngrams_parser.add_argument('--across-songs', action='store_true',
+                               help='join the songs of a group, as artist_ngrams.csv was made')
+    ngrams_parser.add_argument('--wide', action='store_true',
+                               help='also write the table in the layout of artist_ngrams.csv')
+    ngrams_parser.set_defaults(func=build_ngrams)
+
+    search_parser = subparsers.add_parser(
+        'search', help='search the hyperparameters of the ml section models, resuming earlier runs')
+    search_parser.add_argument('--models', nargs='+', default=list(model_search.SEARCH_SPACES),
+                               choices=list(model_search.SEARCH_SPACES))
+    search_parser.add_argument('--method', choices=['random', 'halving'], default='halving')
+    search_parser.add_argument('--candidates', type=int, default=27)
+    search_parser.add_argument('--jobs', type=int, default=-1,
+                               help='worker processes (default: one per cpu)')
+    search_parser.set_defaults(func=build_search)
+
+    features_parser = subparsers.add_parser(
+        'features', help='encode the design matrices of the ml column sets into models/features')
+    features_parser.add_argument('--sets', nargs='+', default=list(feature_store.COLUMN_SETS),
+                                 choices=list(feature_store.COLUMN_SETS))
+    features_parser.set_defaults(func=build_features)
+
+    importance_parser = subparsers.add_parser(
+        'importance', help='permutation importance and partial dependence of the genre classifier columns')
+    importance_parser.add_argument('--repeats', type=int, default=feature_importance.N_REPEATS,
+                                   help='shuffles of each column')
+    importance_parser.add_argument('--jobs', type=int, default=-1,
+                                   help='worker processes (default: one per cpu)')
+    importance_parser.set_defaults(func=build_importance)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
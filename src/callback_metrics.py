@@ -0,0 +1,151 @@
+"""
+Latency, response size and error metrics of every Dash callback
+
+instrument_callbacks(app) wraps app.callback, so each callback registered
+afterwards (by the get_*_callbacks functions) is timed, by function name
+and output (function names alone aren't unique).
+The size of each callback's response is taken from the actual HTTP
+response, so the figure JSON isn't serialized twice. The metrics are served
+in the Prometheus text format at /metrics of app.server, and callbacks
+slower than slow_threshold seconds are logged.
+
+Each worker process keeps its own metrics.
+"""
+import bisect
+import logging
+import threading
+import time
+from functools import wraps
+
+from flask import Response, has_request_context, request
+from dash.exceptions import PreventUpdate
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+SIZE_BUCKETS = [1e3, 1e4, 1e5, 1e6, 1e7]
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values, like a Prometheus histogram"""
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip([*self.buckets, '+Inf'], self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+def request_output():
+    """Output id of the callback request being handled"""
+    if not has_request_context():
+        return ''
+    return (request.get_json(silent=True) or {}).get('output', '')
+
+
+def metric_labels(key):
+    name, output = key
+    return f'callback="{name}",output="{output}"'
+
+
+class CallbackMetrics:
+    """Per callback latency and response size histograms and error counts"""
+    def __init__(self, slow_threshold=None):
+        self.slow_threshold = slow_threshold
+        self.latency = {}
+        self.response_size = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def observe_latency(self, key, seconds, failed=False):
+        """Record a callback run, key being (function name, output id)"""
+        with self._lock:
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            if failed:
+                self.errors[key] = self.errors.get(key, 0) + 1
+            else:
+                self.errors.setdefault(key, 0)
+        if self.slow_threshold is not None and seconds > self.slow_threshold:
+            logger.warning('slow callback %s -> %s: %.3fs', *key, seconds)
+
+    def observe_response_size(self, key, size):
+        with self._lock:
+            self.response_size.setdefault(key, Histogram(SIZE_BUCKETS)).observe(size)
+
+    def timed(self, func):
+        """Wrap a callback function, recording its latency and errors"""
+        @wraps(func)
+        def timed_callback(*args, **kwargs):
+            start = time.perf_counter()
+            failed = False
+            try:
+                return func(*args, **kwargs)
+            except PreventUpdate:
+                raise
+            except Exception:
+                failed = True
+                raise
+            finally:
+                self.observe_latency((func.__name__, request_output()),
+                                     time.perf_counter() - start, failed)
+        return timed_callback
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            lines.append('# HELP dash_callback_duration_seconds Callback function run time')
+            lines.append('# TYPE dash_callback_duration_seconds histogram')
+            for key, histogram in sorted(self.latency.items()):
+                lines.extend(histogram.lines('dash_callback_duration_seconds', metric_labels(key)))
+            lines.append('# HELP dash_callback_response_bytes Size of the callback response body')
+            lines.append('# TYPE dash_callback_response_bytes histogram')
+            for key, histogram in sorted(self.response_size.items()):
+                lines.extend(histogram.lines('dash_callback_response_bytes', metric_labels(key)))
+            lines.append('# HELP dash_callback_errors_total Callbacks which raised an exception')
+            lines.append('# TYPE dash_callback_errors_total counter')
+            for key, count in sorted(self.errors.items()):
+                lines.append(f'dash_callback_errors_total{{{metric_labels(key)}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def instrument_callbacks(app, slow_threshold=None, metrics_path='/metrics'):
+    """
+    Record the metrics of every callback registered on app from now on,
+    and serve them at metrics_path. Returns the CallbackMetrics
+    """
+    metrics = CallbackMetrics(slow_threshold)
+    register = app.callback
+
+    @wraps(register)
+    def callback(*args, **kwargs):
+        decorator = register(*args, **kwargs)
+        return lambda func: decorator(metrics.timed(func))
+
+    app.callback = callback
+
+    @app.server.after_request
+    def record_response_size(response):
+        if request.path.endswith('/_dash-update-component') and not response.direct_passthrough:
+            output = request_output()
+            registered = app.callback_map.get(output)
+            if registered is not None:
+                metrics.observe_response_size((registered['callback'].__name__, output),
+                                              response.calculate_content_length() or 0)
+        return response
+
+    app.server.add_url_rule(metrics_path, 'callback_metrics',
+                            lambda: Response(metrics.prometheus_text(),
+                                             mimetype='text/plain; version=0.0.4'))
+    return metrics
@@ -0,0 +1,147 @@
+"""
+Pre-parsed "words more common to artist / genre than others" comparisons
+
+The frequency comparison tables hold each entity's comparison as the repr
+of a {word: log ratio} dict, sorted by ratio, with words never used by others
+given a ratio of 1000. Parsing those strings on every callback is slow, so
+they are parsed once into a shared vocabulary and flat per-entity arrays,
+cached in data/cache/ next to the parquet tables
+"""
+import ast
+import os
+
+import numpy as np
+
+from data_cache import CACHE_DIR, read_table
+from dataframes import datasets
+
+# ratio given to words which only the entity itself uses
+UNIQUE_RATIO = 1000
+
+# dataset and entity column the index of each kind is built from
+INDEX_SOURCES = {
+    'artist': ('artist_freq_dist', 'Artist'),
+    'genre': ('genre_freq_dist', 'genre'),
+}
+
+
+class ComparisonIndex:
+    """
+    Comparison of every entity's words vs all the others.
+
+    The words of entity e are word_ids[offsets[e]:offsets[e + 1]], ordered
+    so that the common_counts[e] words also used by others come first,
+    sorted by descending ratio, followed by the words unique to e
+    (is_unique flag set, ratio not meaningful)
+    """
+    def __init__(self, entities, vocab, offsets, common_counts, word_ids, ratios, is_unique):
+        self.entities = entities
+        self.vocab = vocab
+        self.offsets = offsets
+        self.common_counts = common_counts
+        self.word_ids = word_ids
+        self.ratios = ratios
+        self.is_unique = is_unique
+        self.positions = {entity: position for position, entity in enumerate(entities.tolist())}
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.entities, self.vocab, self.offsets,
+                                              self.common_counts, self.word_ids,
+                                              self.ratios, self.is_unique))
+
+    def top(self, entity, k=20):
+        """The k words (also used by others) most specific to the entity, with their ratios"""
+        position = self.positions[entity]
+        start = self.offsets[position]
+        end = start + min(k, self.common_counts[position])
+        return self.vocab[self.word_ids[start:end]], self.ratios[start:end]
+
+    def unique_words(self, entity):
+        """Words only the entity uses"""
+        position = self.positions[entity]
+        start = self.offsets[position] + self.common_counts[position]
+        return self.vocab[self.word_ids[start:self.offsets[position + 1]]]
+
+    @classmethod
+    def from_frame(cls, df, entity_col, dict_col='sorted_comparison_dict'):
+        """Parse the comparison dict of every row of a frequency comparison table"""
+        vocab_ids = {}
+        entities = []
+        offsets = [0]
+        common_counts = []
+        word_ids = []
+        ratios = []
+        is_unique = []
+        for entity, comparison in zip(df[entity_col], df[dict_col]):
+            comparison = ast.literal_eval(comparison)
+            ids = np.array([vocab_ids.setdefault(word, len(vocab_ids)) for word in comparison],
+                           dtype=np.int32)
+            values = np.fromiter(comparison.values(), dtype=np.float64, count=len(comparison))
+            unique = values == UNIQUE_RATIO
+            # stable sort keeps the table's own order between equal ratios
+            order = np.argsort(-values[~unique], kind='stable')
+
+            entities.append(entity)
+            common_counts.append(len(order))
+            word_ids.extend([ids[~unique][order], ids[unique]])
+            ratios.extend([values[~unique][order], values[unique]])
+            is_unique.extend([np.zeros(len(order), dtype=bool), np.ones(unique.sum(), dtype=bool)])
+            offsets.append(offsets[-1] + len(comparison))
+
+        return cls(
+            entities=np.array(entities, dtype=str),
+            vocab=np.array(list(vocab_ids), dtype=str),
+            offsets=np.array(offsets, dtype=np.int64),
+            common_counts=np.array(common_counts, dtype=np.int64),
+            word_ids=np.concatenate(word_ids) if word_ids else np.zeros(0, dtype=np.int32),
+            ratios=np.concatenate(ratios) if ratios else np.zeros(0),
+            is_unique=np.concatenate(is_unique) if is_unique else np.zeros(0, dtype=bool),
+        )
+
+    def save(self, path):
+        np.savez(path, entities=self.entities, vocab=self.vocab, offsets=self.offsets,
+                 common_counts=self.common_counts, word_ids=self.word_ids,
+                 ratios=self.ratios, is_unique=self.is_unique)
+
+    @classmethod
+    def load(cls, path):
+        arrays = np.load(path, allow_pickle=False)
+        return cls(**{name: arrays[name] for name in arrays.files})
+
+
+def index_path(kind):
+    return os.path.join(CACHE_DIR, f'comparison_index_{kind}.npz')
+
+
+def index_is_fresh(kind):
+    """True if the saved index exists and is newer than its source table"""
+    path = index_path(kind)
+    if not os.path.exists(path):
+        return False
+    csv_path, _ = datasets.source(INDEX_SOURCES[kind][0])
+    return not os.path.exists(csv_path) or os.path.getmtime(path) >= os.path.getmtime(csv_path)
+
+
+def build_index(kind):
+    """Parse the comparison table of the given kind and save its index"""
+    dataset, entity_col = INDEX_SOURCES[kind]
+    # read directly rather than through the registry, the table isn't needed afterwards
+    csv_path, index_col = datasets.source(dataset)
+    df = read_table(csv_path, index_col=index_col, columns=[entity_col, 'sorted_comparison_dict'])
+    index = ComparisonIndex.from_frame(df, entity_col)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    index.save(index_path(kind))
+    return index
+
+
+def load_index(kind):
+    """The saved index of the given kind, built first if missing or stale"""
+    if index_is_fresh(kind):
+        return ComparisonIndex.load(index_path(kind))
+    return build_index(kind)
+
+
+for index_kind in INDEX_SOURCES:
+    datasets.register(f'{index_kind}_comparison_index',
+                      lambda kind=index_kind: load_index(kind))
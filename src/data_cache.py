@@ -0,0 +1,135 @@
+"""
+Columnar (parquet) cache of the csv files in data/
+
+Parsing the csvs which hold full song lyrics is the bulk of the app startup time,
+so every table can be written once to a typed parquet file in data/cache/,
+which read_table will prefer whenever it is newer than the csv it was built from
+"""
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+DATA_DIR = '../data'
+CACHE_DIR = '../data/cache'
+
+# low-cardinality string columns, stored as categories in both read paths
+CATEGORICAL_COLS = ['genre', 'Artist', 'gender', 'decade']
+
+# every table the app reads, with the index_col it is read with
+CACHED_TABLES = {
+    'combined_count.csv': 0,
+    'top_20_filtered_words_by_genre.csv': None,
+    'top_20_filtered_words_by_artist.csv': None,
+    'artist_ngrams.csv': 0,
+    'genre_ngrams.csv': 0,
+    'genre_mean_df.csv': 0,
+    'genre_sum_df.csv': 0,
+    'combined_artists_mean.csv': 0,
+    'combined_artists_sum.csv': 0,
+    'freq_dist_comparisons_raw.csv': 0,
+    'genre_freq_dist_comparisons_raw.csv': 0,
+    'genre_sentiment_counts.csv': 0,
+    'artist_sentiment_counts.csv': 0,
+    'artist_df.csv': 0,
+    'artist_lyrics_embeddings.csv': None,
+    'topic_max_df.csv': 0,
+    'decade_dataframes/decades_counts.csv': 0,
+    'decade_dataframes/decade_groupby_sum.csv': 0,
+    'decade_dataframes/decade_groupby_mean.csv': 0,
+    'decade_dataframes/artist_groupby_sum.csv': 0,
+    'decade_dataframes/artist_groupby_mean.csv': 0,
+    'decade_dataframes/top_20_filtered_words_by_decade.csv': 0,
+}
+
+
+def cache_path(csv_path):
+    """Path of the parquet file caching the given csv"""
+    relative = os.path.relpath(csv_path, DATA_DIR)
+    return os.path.join(CACHE_DIR, os.path.splitext(relative)[0] + '.parquet')
+
+
+def cache_is_fresh(csv_path):
+    """True if the parquet cache exists and is not older than the csv"""
+    parquet_path = cache_path(csv_path)
+    if not PARQUET_AVAILABLE or not os.path.exists(parquet_path):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    return os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+
+
+def set_categories(df):
+    """Turn the CATEGORICAL_COLS present in df into categories, in place"""
+    for col in CATEGORICAL_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def read_csv_typed(csv_path, index_col=None, columns=None):
+    """
+    Read a csv with the same dtypes the parquet cache would give,
+    optionally parsing only the given columns (plus the index)
+    """
+    if columns is None:
+        return set_categories(pd.read_csv(csv_path, index_col=index_col))
+
+    usecols = list(columns)
+    if index_col is not None:
+        # index_col is positional in the file, usecols needs its name
+        index_col = pd.read_csv(csv_path, nrows=0).columns[index_col]
+        usecols.append(index_col)
+    return set_categories(pd.read_csv(csv_path, index_col=index_col, usecols=usecols))
+
+
+def read_table(csv_path, index_col=None, columns=None):
+    """
+    Read one of the data tables, from its parquet cache if it's up to date,
+    otherwise falling back to parsing the csv.
+    If columns are given, only those (and the index) are read
+    """
+    if cache_is_fresh(csv_path):
+        return pd.read_parquet(cache_path(csv_path),
+                               columns=None if columns is None else list(columns))
+    return read_csv_typed(csv_path, index_col=index_col, columns=columns)
+
+
+def table_columns(csv_path, index_col=None):
+    """Column names of a table (without its index), read from the file header only"""
+    if cache_is_fresh(csv_path):
+        schema = pq.read_schema(cache_path(csv_path))
+        index_names = [col for col in schema.pandas_metadata['index_columns']
+                       if isinstance(col, str)]
+        return [name for name in schema.names if name not in index_names]
+    return list(pd.read_csv(csv_path, nrows=0, index_col=index_col).columns)
+
+
+def build_cache(tables=None, force=False):
+    """
+    Write the parquet cache for every table in CACHED_TABLES (or the given
+    subset of its keys), skipping the ones that are still fresh unless forced.
+    Returns the list of written parquet paths
+    """
+    if not PARQUET_AVAILABLE:
+        raise ImportError('building the data cache requires pyarrow')
+
+    written = []
+    for table in tables or CACHED_TABLES:
+        csv_path = os.path.join(DATA_DIR, table)
+        if not os.path.exists(csv_path):
+            print(f'skipping {csv_path}, file not found')
+            continue
+        if not force and cache_is_fresh(csv_path):
+            continue
+        parquet_path = cache_path(csv_path)
+        os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+        df = read_csv_typed(csv_path, index_col=CACHED_TABLES[table])
+        df.to_parquet(parquet_path)
+        written.append(parquet_path)
+    return written
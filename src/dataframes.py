@@ -1,42 +1,211 @@
 """
 Import dataframe, define lists of columns / available artist, genres
 etc to be used in visualizations and dash options
+
+Datasets are loaded lazily - each one is read the first time it's accessed
+through the registry (datasets.counts, datasets['decade_counts']) and kept
+for later use, so a page only pays for the frames it actually touches.
+The old module-level names (counts_df, decade_counts_df, ...) still work
+and load their dataset on access.
+
+The big song-level tables are projected - only the columns declared
+in VIEW_COLUMNS by the views using them are read. Song lyrics are never
+part of them, they're fetched per song from lyrics_store when needed.
 """
+import sys
+import threading
+import time
 
 import pandas as pd
 
+from data_cache import read_table, table_columns
+
+# marker for "every column except TEXT_COLUMNS" in a column manifest
+ALL_COLUMNS = '*'
+
+# long text columns, only ever read per song through lyrics_store
+TEXT_COLUMNS = ['Song Lyrics', 'Artist Image']
+
+
+class DatasetRegistry:
+    """
+    Named datasets, loaded and memoized on first access,
+    with the load time and memory of each one recorded
+    """
+    def __init__(self):
+        self._loaders = {}
+        self._sources = {}
+        self._projections = {}
+        self._readers = {}
+        self._loaded = {}
+        self._stats = {}
+        self._required = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, loader):
+        """Register a function returning the dataset, called on first access"""
+        self._loaders[name] = loader
+
+    def register_table(self, name, csv_path, index_col=None, postprocess=None,
+                       projected=False):
+        """
+        Register one of the data tables, optionally transformed after reading.
+        A projected table only has the columns declared with require() read
+        """
+        def read(columns=None):
+            df = read_table(csv_path, index_col=index_col, columns=columns)
+            if postprocess is not None:
+                df = postprocess(df)
+            return df
+
+        def columns():
+            required = self._required[name]
+            return [col for col in table_columns(csv_path, index_col=index_col)
+                    if col in required or (ALL_COLUMNS in required and col not in TEXT_COLUMNS)]
+
+        self._sources[name] = (csv_path, index_col)
+        if projected:
+            self._required.setdefault(name, set())
+            self._projections[name] = columns
+            self._readers[name] = read
+            self.register(name, lambda: read(columns()))
+        else:
+            self.register(name, read)
+
+    def source(self, name):
+        """(csv_path, index_col) of a registered table"""
+        return self._sources[name]
+
+    def projected_names(self):
+        return list(self._projections)
+
+    def projected_columns(self, name):
+        """Columns a projected table is loaded with, in file order"""
+        return self._projections[name]()
+
+    def require(self, name, columns):
+        """
+        Declare the columns of a projected dataset some view reads.
+        If the dataset was already loaded without them, they are read and added
+        """
+        if name not in self._required:
+            return
+        columns = set([columns] if columns == ALL_COLUMNS else columns)
+        with self._lock:
+            self._required[name] |= columns
+            if name in self._loaded:
+                if ALL_COLUMNS in columns:
+                    self._unload(name)
+                    return
+                missing = [col for col in columns if col not in self._loaded[name].columns]
+                if missing:
+                    extra = self._readers[name](missing)
+                    self._loaded[name] = pd.concat([self._loaded[name], extra], axis=1)
+                    self._stats[name]['memory_mb'] = memory_size(self._loaded[name]) / 2**20
+
+    def read_full(self, name):
+        """
+        Every column of a projected table, TEXT_COLUMNS included, read apart
+        from the dataset and not kept - for the few views showing the raw table
+        """
+        return self._readers[name]()
+
+    def _unload(self, name):
+        self._loaded.pop(name, None)
+        self._stats.pop(name, None)
+
+    def names(self):
+        return list(self._loaders)
+
+    def is_loaded(self, name):
+        return name in self._loaded
+
+    def __getitem__(self, name):
+        if name in self._loaded:
+            return self._loaded[name]
+        if name not in self._loaders:
+            raise KeyError(f'unknown dataset: {name}')
+        with self._lock:
+            if name not in self._loaded:
+                start = time.perf_counter()
+                data = self._loaders[name]()
+                self._stats[name] = {
+                    'load_time_s': time.perf_counter() - start,
+                    'memory_mb': memory_size(data) / 2**20,
+                }
+                self._loaded[name] = data
+        return self._loaded[name]
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name not in self._loaders:
+            raise AttributeError(name)
+        return self[name]
+
+    def load_stats(self):
+        """Load time and memory of every dataset loaded so far, heaviest first"""
+        stats = pd.DataFrame.from_dict(self._stats, orient='index',
+                                       columns=['load_time_s', 'memory_mb'])
+        return stats.sort_values('memory_mb', ascending=False)
+
+
+def memory_size(data):
+    """Deep memory usage of a dataset in bytes"""
+    if isinstance(data, pd.DataFrame):
+        return int(data.memory_usage(deep=True).sum())
+    if isinstance(data, pd.Series):
+        return int(data.memory_usage(deep=True))
+    if hasattr(data, 'nbytes'):
+        return int(data.nbytes)
+    return sys.getsizeof(data)
+
+
+datasets = DatasetRegistry()
+
 # general df with counts of metadata, topics, POS, emotions etc
-counts_df = pd.read_csv('../data/combined_count.csv', index_col=0)
+datasets.register_table('counts', '../data/combined_count.csv', index_col=0, projected=True)
 
 # dfs with top 20 words by artist and genre, with
 # stopwords and some popular words filtered out
-top_20_filtered_words_genre_df = pd.read_csv('../data/top_20_filtered_words_by_genre.csv')
-top_20_filtered_words_artist_df = pd.read_csv('../data/top_20_filtered_words_by_artist.csv')
+datasets.register_table('top_20_filtered_words_genre', '../data/top_20_filtered_words_by_genre.csv')
+datasets.register_table('top_20_filtered_words_artist', '../data/top_20_filtered_words_by_artist.csv')
 
 # dfs with ngram counts
-artist_ngrams_df = pd.read_csv('../data/artist_ngrams.csv', index_col=0)
-genre_ngrams_df = pd.read_csv('../data/genre_ngrams.csv', index_col=0)
+datasets.register_table('artist_ngrams', '../data/artist_ngrams.csv', index_col=0)
+datasets.register_table('genre_ngrams', '../data/genre_ngrams.csv', index_col=0)
 
 # mean and sum group stats by genre
-genre_mean_df = pd.read_csv('../data/genre_mean_df.csv', index_col = 0)
-genre_sum_df = pd.read_csv('../data/genre_sum_df.csv', index_col = 0)
+datasets.register_table('genre_mean', '../data/genre_mean_df.csv', index_col = 0)
+datasets.register_table('genre_sum', '../data/genre_sum_df.csv', index_col = 0)
 
 # mean and sum group stats by artist
-artist_mean_df = pd.read_csv('../data/combined_artists_mean.csv', index_col = 0)
-artist_sum_df = pd.read_csv('../data/combined_artists_sum.csv', index_col = 0)
+datasets.register_table('artist_mean', '../data/combined_artists_mean.csv', index_col = 0)
+datasets.register_table('artist_sum', '../data/combined_artists_sum.csv', index_col = 0)
 
 # frequency counts vs other for genre and artists
-artist_freq_dist_df = pd.read_csv('../data/freq_dist_comparisons_raw.csv', index_col=0)
-genre_freq_dist_df = pd.read_csv('../data/genre_freq_dist_comparisons_raw.csv', index_col=0)
+datasets.register_table('artist_freq_dist', '../data/freq_dist_comparisons_raw.csv', index_col=0,
+                        projected=True)
+datasets.register_table('genre_freq_dist', '../data/genre_freq_dist_comparisons_raw.csv', index_col=0,
+                        projected=True)
 
 # sentiments for artist and genres
-genre_sentiment_counts_df = pd.read_csv('../data/genre_sentiment_counts.csv', index_col = 0)
-artist_sentiment_counts_df = pd.read_csv('../data/artist_sentiment_counts.csv', index_col = 0)
+datasets.register_table('genre_sentiment_counts', '../data/genre_sentiment_counts.csv', index_col = 0)
+datasets.register_table('artist_sentiment_counts', '../data/artist_sentiment_counts.csv', index_col = 0)
+
+# artists with genre and gender
+datasets.register_table('artist_info', '../data/artist_df.csv', index_col=0)
+
+# embeddings
+datasets.register_table('tsne', '../data/artist_lyrics_embeddings.csv')
+
+# songs with highest topic counts
+datasets.register_table('topic_max', '../data/topic_max_df.csv', index_col=0)
 
 
 # options
-artists = list(counts_df.Artist.unique())
-genres = list(counts_df.genre.unique())
+# artist_df is the (genre, Artist, gender) drop_duplicates of counts_df,
+# so this gives the same order as counts_df.Artist.unique() at a fraction of the cost
+artists = list(datasets.artist_info.Artist.unique())
+genres = list(datasets.artist_info.genre.unique())
 
 topics = [
  'manual_love_count',
@@ -65,28 +234,24 @@ for ind in range(n):
     word_cols.append(f'word{ind}')
     count_cols.append(f'word{ind}_count')
 
-# artists with genre and gender
-artist_df = pd.read_csv('../data/artist_df.csv', index_col=0)
-
-# embeddings
-tsne_df = pd.read_csv('../data/artist_lyrics_embeddings.csv')
-
-
-# songs with highest topic counts
-topic_max_df = pd.read_csv('../data/topic_max_df.csv', index_col=0)
-
 
 # ---------------------------------------------------------------------------- #
 #                           rap decades analysis                               #
 # ---------------------------------------------------------------------------- #
 
-decade_counts_df = pd.read_csv('../data/decade_dataframes/decades_counts.csv', index_col=0)
-decade_sum_df = pd.read_csv('../data/decade_dataframes/decade_groupby_sum.csv',index_col=0)
-decade_mean_df = pd.read_csv('../data/decade_dataframes/decade_groupby_mean.csv',index_col=0)
-decade_artist_sum_df = pd.read_csv('../data/decade_dataframes/artist_groupby_sum.csv',index_col=0)
-decade_artist_mean_df = pd.read_csv('../data/decade_dataframes/artist_groupby_mean.csv',index_col=0)
-top_20_words_by_decade_df = pd.read_csv(
-    '../data/decade_dataframes/top_20_filtered_words_by_decade.csv' ,index_col=0)
+def add_decade_column(df):
+    df['decade'] = df.index
+    return df
+
+datasets.register_table('decade_counts', '../data/decade_dataframes/decades_counts.csv', index_col=0,
+                        projected=True)
+datasets.register_table('decade_sum', '../data/decade_dataframes/decade_groupby_sum.csv',index_col=0)
+datasets.register_table('decade_mean', '../data/decade_dataframes/decade_groupby_mean.csv',index_col=0)
+datasets.register_table('decade_artist_sum', '../data/decade_dataframes/artist_groupby_sum.csv',index_col=0)
+datasets.register_table('decade_artist_mean', '../data/decade_dataframes/artist_groupby_mean.csv',index_col=0)
+datasets.register_table('top_20_words_by_decade',
+    '../data/decade_dataframes/top_20_filtered_words_by_decade.csv', index_col=0,
+    postprocess=add_decade_column)
 
 decade_topics = [ 'manual_love_count',
                  'manual_swears_count',
@@ -99,4 +264,79 @@ decade_topics = [ 'manual_love_count',
                  'manual_yes_count',
                  'manual_no_count' ]
 
-top_20_words_by_decade_df['decade'] = top_20_words_by_decade_df.index
\ No newline at end of file
+
+# ---------------------------------------------------------------------------- #
+#                               column manifests                               #
+# ---------------------------------------------------------------------------- #
+
+# columns of the projected datasets read by each view,
+# only their union is ever loaded
+VIEW_COLUMNS = {
+    'topic_graphs': {
+        'counts': ['Artist', 'genre', 'Year', *topics],
+    },
+    'metadata_graphs': {
+        'counts': ['genre', 'Year', *meta_columns],
+    },
+    'static_graphs': {
+        'counts': ['Year', 'Month', 'Day', 'Pageviews', *meta_columns, *topics],
+    },
+    'frequency_graphs': {
+        'artist_freq_dist': ['Artist', 'sorted_comparison_dict'],
+        'genre_freq_dist': ['genre', 'sorted_comparison_dict'],
+    },
+    'example_lyrics': {
+        'counts': ['Artist', 'Song Title', 'genre', 'gender', *topics],
+    },
+    'scikit_ml': {
+        'counts': ['Artist', 'Song Title', 'Year', 'Pageviews', *meta_columns,
+                   'gender', 'genre', *topics, 'sentiment', 'emotion'],
+    },
+    'decades_analysis': {
+        'decade_counts': ['decade', 'Year', 'Month', 'Day', 'Pageviews',
+                          *meta_columns, *decade_topics],
+    },
+    'extra_df_creator': {
+        'counts': ['genre', 'Artist', 'gender'],
+    },
+}
+
+for view_manifest in VIEW_COLUMNS.values():
+    for dataset_name, dataset_columns in view_manifest.items():
+        datasets.require(dataset_name, dataset_columns)
+
+
+# ---------------------------------------------------------------------------- #
+#                    module-level names of the old eager loader                #
+# ---------------------------------------------------------------------------- #
+
+LEGACY_NAMES = {
+    'counts_df': 'counts',
+    'top_20_filtered_words_genre_df': 'top_20_filtered_words_genre',
+    'top_20_filtered_words_artist_df': 'top_20_filtered_words_artist',
+    'artist_ngrams_df': 'artist_ngrams',
+    'genre_ngrams_df': 'genre_ngrams',
+    'genre_mean_df': 'genre_mean',
+    'genre_sum_df': 'genre_sum',
+    'artist_mean_df': 'artist_mean',
+    'artist_sum_df': 'artist_sum',
+    'artist_freq_dist_df': 'artist_freq_dist',
+    'genre_freq_dist_df': 'genre_freq_dist',
+    'genre_sentiment_counts_df': 'genre_sentiment_counts',
+    'artist_sentiment_counts_df': 'artist_sentiment_counts',
+    'artist_df': 'artist_info',
+    'tsne_df': 'tsne',
+    'topic_max_df': 'topic_max',
+    'decade_counts_df': 'decade_counts',
+    'decade_sum_df': 'decade_sum',
+    'decade_mean_df': 'decade_mean',
+    'decade_artist_sum_df': 'decade_artist_sum',
+    'decade_artist_mean_df': 'decade_artist_mean',
+    'top_20_words_by_decade_df': 'top_20_words_by_decade',
+}
+
+
+def __getattr__(name):
+    if name in LEGACY_NAMES:
+        return datasets[LEGACY_NAMES[name]]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
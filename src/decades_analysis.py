@@ -5,17 +5,16 @@ import plotly.express as px
 from plotly.subplots import make_subplots
 import plotly.graph_objects as graph_objects
 
-from wordcloud import WordCloud
+from wordcloud_assets import wordcloud_url, add_wordcloud_image
+from startup_profiler import profiled_block
+from figure_snapshots import figure_snapshot
 
 from dataframes import (
+    datasets,
     decade_counts_df,
-    decade_sum_df,
-    decade_mean_df,
-    decade_artist_sum_df,
-    decade_artist_mean_df,
-    top_20_words_by_decade_df,
     decade_topics
 )
+from histograms import histogram_figure
 
 # ---------------------------------------------------------------------------- #
 #                            Topic counts by decade                            #
@@ -56,6 +55,7 @@ def get_decade_bar_topic_callbacks(app):
         ]
     )
     def update_decade_bar_topic_graph(topics):
+        decade_sum_df = datasets.decade_sum
         bar_fig = graph_objects.Figure()
         # in case there is only one selected topic - turn input into a list:
         topics_list = [topic for topic in topics]
@@ -122,8 +122,8 @@ def get_decade_hist_topic_callbacks(app):
         ]
     )
     def update_decade_hist_topic_graph(topic, decade, nbins):
-        decade_df = decade_counts_df[decade_counts_df['decade'] == decade]
-        hist_fig = px.histogram(decade_df, x=topic, nbins=nbins)
+        edges, counts = datasets.decade_counts_histograms.histogram(topic, decade, nbins)
+        hist_fig = histogram_figure(edges, counts)
         return [hist_fig,]
 
 # ---------------------------------------------------------------------------- #
@@ -168,6 +168,7 @@ def get_decade_medatata_callbacks(app):
         ]
     )
     def update_decade_metadata_graph(meta_col):
+        decade_mean_df = datasets.decade_mean
         meta_fig = px.bar(decade_mean_df, x=decade_mean_df.index, y=decade_mean_df[meta_col])
         return [meta_fig,]
     
@@ -212,6 +213,7 @@ def get_decade_artist_metadata_callbacks(app):
         ]
     )
     def update_decade_artist_metadata_graph(meta_col):
+        decade_artist_mean_df = datasets.decade_artist_mean
         meta_fig = px.bar(decade_artist_mean_df, x=decade_artist_mean_df['Artist'],
                         y=decade_artist_mean_df[meta_col])
         return [meta_fig,]
@@ -225,19 +227,24 @@ import plotly.io as pio
 to_corr = ['Year', 'Month', 'Day', 'Pageviews', *meta_columns, *decade_topics]
 pio.templates.default = "plotly_white"
 
-decade_corr = decade_counts_df[to_corr].corr()
+def build_decade_corr_fig():
+    decade_corr = datasets.decade_counts[to_corr].corr()
 
-decade_corr_map = graph_objects.Heatmap(
-    z = decade_corr,
-    x=decade_corr.columns,
-    y=decade_corr.columns,
-    colorscale=px.colors.diverging.RdBu,
-    zmin=-1,
-    zmax=1,
-)
+    decade_corr_map = graph_objects.Heatmap(
+        z = decade_corr,
+        x=decade_corr.columns,
+        y=decade_corr.columns,
+        colorscale=px.colors.diverging.RdBu,
+        zmin=-1,
+        zmax=1,
+    )
 
-decade_corr_fig = graph_objects.Figure()
-decade_corr_fig.add_trace(decade_corr_map)
+    decade_corr_fig = graph_objects.Figure()
+    decade_corr_fig.add_trace(decade_corr_map)
+    return decade_corr_fig
+
+with profiled_block('decades_analysis: correlation matrix'):
+    decade_corr_fig = figure_snapshot('decade_corr', ['decade_counts'], build_decade_corr_fig)
 # fig.show()
 
 decade_corr_container = dbc.Container([
@@ -251,9 +258,6 @@ decade_corr_container = dbc.Container([
 #                       top 20 words by decade wordclouds                      #
 # ---------------------------------------------------------------------------- #
 
-# setup
-decades = top_20_words_by_decade_df['decade'].unique()
-
 # column access names
 count_cols = []
 word_cols = []
@@ -262,39 +266,42 @@ for ind in range(n):
     word_cols.append(f'word{ind}')
     count_cols.append(f'word{ind}_count')
 
-decade_wordclouds = []
-decade_bars = []
+def build_decade_wordclouds_fig():
+    top_20_words_by_decade_df = datasets.top_20_words_by_decade
+    decades = top_20_words_by_decade_df['decade'].unique()
 
-for decade in decades:
-    decade_df = top_20_words_by_decade_df[top_20_words_by_decade_df['decade'] == decade]
-    decade_words = [decade_df[word].values[0] for word in word_cols]
-    decade_counts = [decade_df[count].values[0] for count in count_cols]
+    decade_wordclouds = []
+    decade_bars = []
 
-    decade_item = {
-        'decade': decade,
-        'words': decade_words,
-        'counts': decade_counts
-    }
+    for decade in decades:
+        decade_df = top_20_words_by_decade_df[top_20_words_by_decade_df['decade'] == decade]
+        decade_words = [decade_df[word].values[0] for word in word_cols]
+        decade_counts = [decade_df[count].values[0] for count in count_cols]
 
-    decade_bars.append(decade_item)
-    
-    d = {}
-    for word, count in zip(decade_words, decade_counts):
-        d[word] = count
+        decade_item = {
+            'decade': decade,
+            'words': decade_words,
+            'counts': decade_counts
+        }
+
+        decade_bars.append(decade_item)
+
+        decade_wordclouds.append(wordcloud_url('decade', decade, decade_words, decade_counts))
 
-    wordcloud = WordCloud(background_color = "white", width=800, height=400)
-    wordcloud.generate_from_frequencies(frequencies=d)
-    decade_wordclouds.append(wordcloud)
+    decade_titles = ['1980s', '1980s', '1990s', '1990s', '2000s', '2000s', '2010s', '2010s', '2020s', '2020s']
 
-decade_titles = ['1980s', '1980s', '1990s', '1990s', '2000s', '2000s', '2010s', '2010s', '2020s', '2020s']
+    decade_wordclouds_fig = make_subplots(rows=5, cols=2, subplot_titles = decade_titles)
 
-decade_wordclouds_fig = make_subplots(rows=5, cols=2, subplot_titles = decade_titles)
+    for i, decade in enumerate(decades):
+        add_wordcloud_image(decade_wordclouds_fig, decade_wordclouds[i], row = i+1, col = 1)
+        decade_wordclouds_fig.add_trace(graph_objects.Bar(x=decade_bars[i]['words'], y=decade_bars[i]['counts'],
+                                                          showlegend = False), row=i+1, col=2,)
+    decade_wordclouds_fig.update_layout(height = 5 * 400)
+    return decade_wordclouds_fig
 
-for i, decade in enumerate(decades):
-    decade_wordclouds_fig.add_trace(graph_objects.Image(z=decade_wordclouds[i]), row = i+1, col = 1)
-    decade_wordclouds_fig.add_trace(graph_objects.Bar(x=decade_bars[i]['words'], y=decade_bars[i]['counts'],
-                                                      showlegend = False), row=i+1, col=2,)
-decade_wordclouds_fig.update_layout(height = 5 * 400)
+with profiled_block('decades_analysis: decade wordclouds'):
+    decade_wordclouds_fig = figure_snapshot(
+        'decade_wordclouds', ['top_20_words_by_decade'], build_decade_wordclouds_fig)
 
 decade_wordcloud_container = dbc.Container([
     html.H3(children = 'Top 20 (filtered) words by decade wordclouds', style={'textAlign': 'center'}),
@@ -8,6 +8,7 @@ import dash_bootstrap_components as dbc
 from dataframes import (
     counts_df, topics
 )
+from lyrics_store import song_lyrics
 
 # columns of interest
 topic_max_cols = ['Artist', 'Song Title', 'Song Lyrics', 'genre', 'gender']
@@ -19,11 +20,13 @@ for topic in topics:
     topic_max_row = counts_df[counts_df[topic] == topic_max]
     # topic_max_row_df = pd.DataFrame([topic_max_row])
     
-    topic_max_row = topic_max_row[[*topic_max_cols]]
+    # lyrics are added for the chosen songs only, after the loop
+    topic_max_row = topic_max_row[[col for col in topic_max_cols if col != 'Song Lyrics']]
     topic_max_row['topic'] = topic
     
     topic_max_df = pd.concat([topic_max_df, topic_max_row], axis=0)
 
+topic_max_df['Song Lyrics'] = song_lyrics('counts', topic_max_df.index)
 topic_max_df.reset_index(drop=True, inplace=True)
 
 # print(topic_max_df)
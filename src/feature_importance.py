@@ -0,0 +1,145 @@
+"""
+Permutation importance and partial dependence of the ML section models
+
+Which of the engineered columns (manual_*_count, unique_words,
+writer_count, Pageviews ...) does the genre SVC actually rely on?
+column_report() answers it for one input column of a fitted pipeline:
+
+- permutation importance: the drop of the validation score when the
+  column's values are shuffled between the songs, n_repeats times
+- partial dependence: the model's mean decision value for each class when
+  every song is given the same value of the column, over a grid of values
+  (quantiles of a numerical column, or the categories)
+
+Each column costs n_repeats + 1 predicts over the validation rows and one
+over grid size times as many rows, so importance_report() runs the columns
+on a joblib process pool and saves each one's result to
+models/importance/{key}-{column}.json, key being a hash of the fitted
+pipeline, the validation rows and the settings. Only the columns never
+reported are computed again.
+"""
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.metrics import get_scorer
+
+from model_artifacts import MODELS_DIR, data_fingerprint
+from model_evaluation import RANDOM_STATE
+from startup_profiler import profiled_block
+
+IMPORTANCE_DIR = os.path.join(MODELS_DIR, 'importance')
+N_REPEATS = 10
+GRID_RESOLUTION = 20
+
+
+def column_grid(values, grid_resolution=GRID_RESOLUTION):
+    """Values a column is set to for its partial dependence, all of them if few"""
+    if values.dtype == object or isinstance(values.dtype, pd.CategoricalDtype):
+        return np.sort(values.astype(str).unique())
+    unique = np.unique(values.to_numpy())
+    if len(unique) <= grid_resolution:
+        return unique
+    # 'nearest' keeps values (and the dtype) the column actually has
+    return np.unique(np.quantile(values.to_numpy(), np.linspace(0.05, 0.95, grid_resolution),
+                                 method='nearest'))
+
+
+def decision_values(pipeline, X):
+    """Per class scores of the pipeline's model, (n rows, n classes)"""
+    if hasattr(pipeline, 'decision_function'):
+        values = pipeline.decision_function(X)
+    else:
+        values = pipeline.predict(X)
+    return values.reshape(len(X), -1)
+
+
+def column_report(pipeline, X, y, column, scoring, n_repeats, grid_resolution, random_state):
+    """
+    {'importances': score drop of each shuffle, 'grid': column values,
+     'average': mean decision value of each class at each grid value}
+    """
+    scorer = get_scorer(scoring)
+    baseline = scorer(pipeline, X, y)
+    # seeded by the column's position, so a column's shuffles don't depend on which others ran
+    rng = np.random.default_rng([random_state, X.columns.get_loc(column)])
+    shuffled = X.copy()
+    importances = []
+    for _ in range(n_repeats):
+        shuffled[column] = rng.permutation(X[column].to_numpy())
+        importances.append(baseline - scorer(pipeline, shuffled, y))
+
+    grid = column_grid(X[column], grid_resolution)
+    gridded = pd.concat([X] * len(grid), ignore_index=True)
+    gridded[column] = np.repeat(grid, len(X))
+    average = decision_values(pipeline, gridded).reshape(len(grid), len(X), -1).mean(axis=1)
+    return {'importances': [float(value) for value in importances],
+            'grid': [value.item() if isinstance(value, np.generic) else value for value in grid],
+            'average': average.T.tolist()}
+
+
+def report_key(pipeline, X, y, scoring='accuracy', n_repeats=N_REPEATS,
+               grid_resolution=GRID_RESOLUTION, random_state=RANDOM_STATE):
+    """Hash of the fitted pipeline, its validation rows and the report settings"""
+    params = {'pipeline': joblib.hash(pipeline), 'scoring': scoring, 'n_repeats': n_repeats,
+              'grid_resolution': grid_resolution, 'random_state': random_state}
+    return data_fingerprint(X.assign(_target=y), params)[:16]
+
+
+def report_path(key, column):
+    return os.path.join(IMPORTANCE_DIR, f'{key}-{column}.json')
+
+
+def load_column(key, column):
+    """Saved report of a column, None if never computed"""
+    try:
+        with open(report_path(key, column)) as report_file:
+            return json.load(report_file)
+    except (OSError, ValueError):
+        return None
+
+
+def save_column(key, column, report):
+    os.makedirs(IMPORTANCE_DIR, exist_ok=True)
+    tmp_path = f'{report_path(key, column)}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as report_file:
+        json.dump(report, report_file)
+    os.replace(tmp_path, report_path(key, column))
+
+
+def importance_report(pipeline, X, y, scoring='accuracy', columns=None, n_repeats=N_REPEATS,
+                      grid_resolution=GRID_RESOLUTION, n_jobs=-1, random_state=RANDOM_STATE,
+                      cache=True):
+    """
+    Permutation importance and partial dependence of each of the columns (by
+    default all) of X, the validation rows of the fitted pipeline. The
+    columns not cached yet are computed on n_jobs processes.
+
+    Returns (DataFrame of each column's importance mean and std, most
+    important first, {column: report as column_report returns})
+    """
+    columns = list(X.columns) if columns is None else columns
+    key = report_key(pipeline, X, y, scoring, n_repeats, grid_resolution, random_state)
+
+    reports = {column: load_column(key, column) if cache else None for column in columns}
+    missing = [column for column, report in reports.items() if report is None]
+    if missing:
+        with profiled_block(f'feature importance of {len(missing)} columns'):
+            results = Parallel(n_jobs=n_jobs)(
+                delayed(column_report)(pipeline, X, y, column, scoring, n_repeats,
+                                       grid_resolution, random_state)
+                for column in missing)
+        for column, report in zip(missing, results):
+            reports[column] = report
+            if cache:
+                save_column(key, column, report)
+
+    importance = pd.DataFrame({
+        'column': columns,
+        'importance_mean': [np.mean(reports[column]['importances']) for column in columns],
+        'importance_std': [np.std(reports[column]['importances']) for column in columns],
+    }).sort_values('importance_mean', ascending=False, ignore_index=True)
+    return importance, reports
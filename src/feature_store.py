@@ -0,0 +1,165 @@
+"""
+Scaled / one-hot-encoded design matrices of the ML column sets
+
+Every experiment on the song tables starts the same way: take a set of
+columns of counts_df (or decade_counts_df), drop the rows with NaNs and fit
+model_evaluation's StandardScaler / OneHotEncoder preprocessor on them.
+design_matrix(column_set) does that once per set and target and saves
+
+    models/features/{column set}-{target}-{key}.npy     the dense float64 X
+    models/features/{column set}-{target}-{key}.joblib  y, the row index and
+                                                         the feature names
+    models/features/{column set}-{target}-{key}-preprocessor.joblib
+
+key being a hash of the rows, the columns and the encoding, so a set is
+encoded again only when its data changes. X is opened with mmap_mode='r':
+loading it copies nothing, and processes mapping the same file share its
+pages read-only. The fitted preprocessor is only unpickled if used, to
+encode new rows.
+
+The preprocessor is fitted on all the rows, so the matrices are meant for
+comparing models and features, not for their final validation scores.
+"""
+import os
+
+import joblib
+import numpy as np
+from scipy import sparse
+
+from dataframes import datasets
+from model_artifacts import MODELS_DIR, data_fingerprint
+from model_evaluation import build_pipeline
+
+FEATURES_DIR = os.path.join(MODELS_DIR, 'features')
+# part of the keys, change it with the preprocessor of model_evaluation.build_pipeline
+ENCODING = 'StandardScaler numerical, OneHotEncoder(handle_unknown=ignore) categorical'
+
+counts_classif_cols = ['Year',
+                       'Pageviews', 'featured_count', 'producer_count', 'writer_count',
+                       'gender', 'genre', 'unique_words', 'total_words',
+                       'manual_love_count',
+                       'manual_money_count', 'manual_violence_count', 'manual_drugs_count',
+                       'manual_gendered_count', 'manual_sadness_count', 'manual_joy_count',
+                       'manual_yes_count', 'manual_no_count',
+                       'sentiment', 'emotion'
+                       ]
+counts_classif_cols_no_gender = [col for col in counts_classif_cols if col != 'gender']
+counts_classif_cols_no_genre = [col for col in counts_classif_cols if col != 'genre']
+counts_classif_cols_no_sentiment = [col for col in counts_classif_cols if col != 'sentiment']
+counts_classif_cols_no_emotion = [col for col in counts_classif_cols if col != 'emotion']
+
+decades_classif_cols = ['Year',
+                        'Pageviews', 'featured_count', 'producer_count', 'writer_count',
+                        'unique_words', 'total_words',
+                        'manual_love_count', 'manual_swears_count',
+                        'manual_money_count', 'manual_violence_count', 'manual_drugs_count',
+                        'manual_gendered_count', 'manual_sadness_count', 'manual_joy_count',
+                        'manual_yes_count', 'manual_no_count',
+                        'decade', 'sentiment'
+                        ]
+
+# name -> (dataset, feature columns, the target they are meant to predict or None)
+COLUMN_SETS = {
+    'counts_classif_cols': ('counts', counts_classif_cols, None),
+    'counts_classif_cols_no_gender': ('counts', counts_classif_cols_no_gender, 'gender'),
+    'counts_classif_cols_no_genre': ('counts', counts_classif_cols_no_genre, 'genre'),
+    'counts_classif_cols_no_sentiment': ('counts', counts_classif_cols_no_sentiment, 'sentiment'),
+    'counts_classif_cols_no_emotion': ('counts', counts_classif_cols_no_emotion, 'emotion'),
+    'decades_classif_cols': ('decade_counts', decades_classif_cols, 'decade'),
+}
+
+for dataset, columns, target in COLUMN_SETS.values():
+    datasets.require(dataset, [*columns, *([target] if target else [])])
+
+
+class DesignMatrix:
+    """
+    X - the encoded feature columns, a read-only memory map of path
+    y - the target values, None without a target
+    index - row labels (song ids) of the rows
+    feature_names - names of the X columns
+    preprocessor - the fitted ColumnTransformer, to encode new rows the same way
+    """
+    def __init__(self, path, y, index, feature_names, preprocessor=None):
+        self.path = path
+        self.X = np.load(path, mmap_mode='r')
+        self.y = y
+        self.index = index
+        self.feature_names = feature_names
+        self._preprocessor = preprocessor
+
+    @property
+    def preprocessor(self):
+        if self._preprocessor is None:
+            self._preprocessor = joblib.load(companion_path(self.path, '-preprocessor.joblib'))
+        return self._preprocessor
+
+
+def column_set_frame(column_set, target=None):
+    """The column set's columns (and target's) of its dataset, without the rows with NaNs"""
+    dataset, columns, default_target = COLUMN_SETS[column_set]
+    target = target or default_target
+    if target is not None and target not in columns:
+        columns = [*columns, target]
+    return datasets[dataset][columns].dropna()
+
+
+def write_array(path, array):
+    """np.save through a temporary file, so readers never open a partial matrix"""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as array_file:
+        np.save(array_file, array)
+    os.replace(tmp_path, path)
+
+
+def matrix_path(name, target, key):
+    return os.path.join(FEATURES_DIR, f'{name}-{target or "all"}-{key}.npy')
+
+
+def companion_path(path, suffix):
+    """Path of the metadata / preprocessor file of the matrix at path"""
+    return path[:-len('.npy')] + suffix
+
+
+def dump_file(value, path):
+    """joblib.dump through a temporary file"""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    joblib.dump(value, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def frame_matrix(df, target=None, name='frame'):
+    """
+    DesignMatrix of the columns of df (without NaNs) other than target,
+    encoded and saved the first time
+    """
+    key = data_fingerprint(df, {'target': target, 'encoding': ENCODING})[:16]
+    path = matrix_path(name, target, key)
+    meta_path = companion_path(path, '.joblib')
+    # the metadata is written last, so its presence means the matrix is complete
+    if os.path.exists(meta_path):
+        meta = joblib.load(meta_path)
+        return DesignMatrix(path, meta['y'], meta['index'], meta['feature_names'])
+
+    X = df.drop([target], axis=1) if target is not None else df
+    preprocessor = build_pipeline(X, 'passthrough').named_steps['preprocessor']
+    features = preprocessor.fit_transform(X)
+    if sparse.issparse(features):
+        features = features.toarray()
+    os.makedirs(FEATURES_DIR, exist_ok=True)
+    write_array(path, np.ascontiguousarray(features, dtype=np.float64))
+    dump_file(preprocessor, companion_path(path, '-preprocessor.joblib'))
+    meta = {'y': df[target].to_numpy() if target is not None else None,
+            'index': df.index.to_numpy(),
+            'feature_names': list(preprocessor.get_feature_names_out())}
+    dump_file(meta, meta_path)
+    return DesignMatrix(path, meta['y'], meta['index'], meta['feature_names'], preprocessor)
+
+
+def design_matrix(column_set, target=None):
+    """
+    DesignMatrix of a COLUMN_SETS set predicting target (by default the set's
+    own), its other columns encoded once and loaded from models/features after
+    """
+    target = target or COLUMN_SETS[column_set][2]
+    return frame_matrix(column_set_frame(column_set, target), target, column_set)
@@ -0,0 +1,190 @@
+"""
+JSON snapshots of the static figures built at import
+
+The static sections (correlation matrices, spine charts, wordcloud
+subplots, t-SNE scatter) used to be rebuilt with pandas and Plotly on every
+process start. Each one is now built by a function, whose result is saved
+to data/cache/figures/{name}-{key}.json, key being a hash of the data files
+the figure is made from, the source of the function's module, what the
+function reads from its globals (the source of the functions it calls, the
+value of column lists and other plain values) and the Plotly version.
+Later starts load the JSON as a plain dict, which dcc.Graph takes as is,
+so neither the data nor a go.Figure is ever built. A snapshot whose
+wordcloud images are missing from assets/ is rebuilt.
+
+Snapshots can be written ahead of time by `python build.py figures`.
+"""
+import hashlib
+import inspect
+import json
+import os
+
+import plotly
+
+from data_cache import cache_path
+from dataframes import datasets
+from startup_profiler import profiled_block
+from wordcloud_assets import asset_file, asset_url
+
+SNAPSHOT_DIR = '../data/cache/figures'
+
+# snapshot name -> (data file paths, build function, extra inputs), filled in by figure_snapshot
+snapshots = {}
+
+# path -> ((size, mtime), digest), so each file is hashed once per process
+_file_digests = {}
+
+
+def data_path(dataset):
+    """Data file a registered table is read from, the parquet cache if the csv is missing"""
+    csv_path, _ = datasets.source(dataset)
+    if os.path.exists(csv_path):
+        return csv_path
+    return cache_path(csv_path)
+
+
+def file_digest(path):
+    stat = os.stat(path)
+    version = (stat.st_size, stat.st_mtime_ns)
+    cached = _file_digests.get(path)
+    if cached is None or cached[0] != version:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as data_file:
+            for chunk in iter(lambda: data_file.read(2**20), b''):
+                digest.update(chunk)
+        cached = _file_digests[path] = (version, digest.hexdigest())
+    return cached[1]
+
+
+# the app's own modules, the only ones whose functions build_inputs follows
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def is_plain(value):
+    """True for numbers, strings and containers of them - values hashed by their repr"""
+    if isinstance(value, (str, int, float, bool, type(None))):
+        return True
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return all(is_plain(item) for item in value)
+    if isinstance(value, dict):
+        return all(is_plain(key) and is_plain(item) for key, item in value.items())
+    return False
+
+
+def code_names(code):
+    """Global (and attribute) names a code object and the ones nested in it use"""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= code_names(const)
+    return names
+
+
+def build_inputs(build, seen=None):
+    """
+    Source of the function and of the app's functions it calls, recursively,
+    and the repr of the plain values it reads from its globals, by name.
+    Private (underscored) globals are caches, not inputs
+    """
+    seen = set() if seen is None else seen
+    seen.add(build)
+    inputs = [inspect.getsource(build)]
+    for name in sorted(code_names(build.__code__)):
+        value = build.__globals__.get(name)
+        if name.startswith('_') or value is None:
+            continue
+        if inspect.isfunction(value):
+            if value not in seen and os.path.dirname(inspect.getfile(value)) == SOURCE_DIR:
+                inputs.extend(build_inputs(value, seen))
+        elif is_plain(value):
+            if isinstance(value, (set, frozenset)):
+                value = sorted(value, key=repr)
+            inputs.append(f'{name}={value!r}')
+    return inputs
+
+
+def snapshot_key(paths, build, inputs=None):
+    """
+    Hash of the input files' contents, the build function's module and
+    inputs, the Plotly version, the URL prefix of the wordcloud images and
+    the extra inputs (json-able, e.g. the fingerprint of a model it shows)
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(path.encode('utf-8'))
+        digest.update(file_digest(path).encode('utf-8'))
+    digest.update(inspect.getsource(inspect.getmodule(build)).encode('utf-8'))
+    for build_input in build_inputs(build):
+        digest.update(build_input.encode('utf-8'))
+    digest.update(plotly.__version__.encode('utf-8'))
+    digest.update(asset_url('').encode('utf-8'))
+    digest.update(json.dumps(inputs, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def snapshot_path(name, key):
+    return os.path.join(SNAPSHOT_DIR, f'{name}-{key}.json')
+
+
+def assets_exist(figure):
+    """True if every local image (the wordclouds) a figure shows is on disk"""
+    images = figure.get('layout', {}).get('images', [])
+    paths = [asset_file(image.get('source', '')) for image in images]
+    return all(os.path.exists(path) for path in paths if path is not None)
+
+
+def write_snapshot(name, key, fig):
+    """Save a figure, removing the older snapshots of the same name"""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = snapshot_path(name, key)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as snapshot_file:
+        snapshot_file.write(fig.to_json())
+    os.replace(tmp_path, path)
+    for file_name in os.listdir(SNAPSHOT_DIR):
+        if file_name.startswith(f'{name}-') and file_name.endswith('.json') \
+                and file_name != os.path.basename(path):
+            os.remove(os.path.join(SNAPSHOT_DIR, file_name))
+
+
+def load_snapshot(name, key):
+    """The saved figure dict, or None if there's no usable snapshot"""
+    try:
+        with open(snapshot_path(name, key)) as snapshot_file:
+            figure = json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+    return figure if assets_exist(figure) else None
+
+
+def figure_snapshot(name, datasets_used, build, inputs=None):
+    """
+    The figure build() returns, loaded from its snapshot (as a dict) if
+    the data of the given datasets, the function and the extra inputs
+    haven't changed
+    """
+    paths = [data_path(dataset) for dataset in datasets_used]
+    snapshots[name] = (paths, build, inputs)
+    key = snapshot_key(paths, build, inputs)
+    figure = load_snapshot(name, key)
+    if figure is None:
+        with profiled_block(f'figure snapshot {name}'):
+            fig = build()
+            write_snapshot(name, key, fig)
+        return fig
+    return figure
+
+
+def build_snapshots(force=False):
+    """Write the snapshot of every static figure, returns their paths"""
+    # importing the sections registers (and builds the missing) snapshots
+    import static_graphs
+    import decades_analysis
+    import scikit_ml
+    paths = []
+    for name, (data_paths, build, inputs) in snapshots.items():
+        key = snapshot_key(data_paths, build, inputs)
+        if force:
+            write_snapshot(name, key, build())
+        paths.append(snapshot_path(name, key))
+    return paths
@@ -5,16 +5,13 @@ import plotly.express as px
 import plotly.graph_objects as graph_objects
 
 from dataframes import (
-    artist_freq_dist_df, genre_freq_dist_df,
+    datasets,
     artists, genres
 )
-
-import ast
-from itertools import islice
-
-def take(n, iterable):
-    """Return the first n items of the iterable as a list."""
-    return list(islice(iterable, n))
+# registers the artist / genre comparison index datasets
+import comparison_index
+# registers the lyrics_corpus dataset
+import lyrics_corpus
 
 # ---------------------------------------------------------------------------- #
 #       Find words that are common in artist / genre more than in others       #
@@ -57,17 +54,11 @@ def get_artist_freq_dist_callbacks(app):
         ]
     )
     def update_artist_freq_dist_graph(artists):
+        artist_index = datasets.artist_comparison_index
         artist_dist_fig = graph_objects.Figure()
         for artist in artists:
-            artist_comp_dict = artist_freq_dist_df[
-                artist_freq_dist_df['Artist'] == artist]['sorted_comparison_dict'].values[0]
-            
-            artist_comp_dict = ast.literal_eval(artist_comp_dict)
-            artist_comp_dict_no_unique = {k: v for k,v in artist_comp_dict.items() if v != 1000}
-            
-            no_unique_20 = take(20, artist_comp_dict_no_unique.items())
-            words = [word[0] for word in no_unique_20]
-            counts = [word[1] for word in no_unique_20]
+            # top 20 words, skipping the ones unique to the artist
+            words, counts = artist_index.top(artist, 20)
             
             artist_dist_fig.add_trace(graph_objects.Bar(x=words, y=counts, name=artist))
                                     
@@ -111,20 +102,114 @@ def get_genre_freq_dist_callbacks(app):
         ]
     )
     def update_genre_freq_dist_graph(genres):
+        genre_index = datasets.genre_comparison_index
         genre_dist_fig = graph_objects.Figure()
         for genre in genres:
-            genre_comp_dict = genre_freq_dist_df[
-                genre_freq_dist_df['genre'] == genre]['sorted_comparison_dict'].values[0]
-            genre_comp_dict = ast.literal_eval(genre_comp_dict)
-            genre_comp_dict_no_unique = {k: v for k,v in genre_comp_dict.items() if v != 1000}
-            no_unique_20 = take(20, genre_comp_dict_no_unique.items())
-            words = [word[0] for word in no_unique_20]
-            counts = [word[1] for word in no_unique_20]
+            # top 20 words, skipping the ones unique to the genre
+            words, counts = genre_index.top(genre, 20)
             
             genre_dist_fig.add_trace(graph_objects.Bar(x=words, y=counts, name=genre))
                                     
         return [genre_dist_fig,]
     
+# ======== any group of songs vs another =========
+# artists of both the genre and the rap decades datasets
+group_artists = sorted(set(artists) | set(datasets.decade_artist_mean['Artist']))
+group_decades = list(datasets.decade_sum.index)
+
+# words used fewer times by the target songs are left out, so that single
+# uses by small groups don't dominate the ratios
+GROUP_FREQ_DIST_MIN_COUNT = 5
+
+def group_filter_controls(prefix):
+    return [
+        dbc.Label("Genre"),
+        dcc.Dropdown(options = genres, value = [], id=f'{prefix}-genre-selection', multi=True),
+        dbc.Label("Artist"),
+        dcc.Dropdown(options = group_artists, value = [], id=f'{prefix}-artist-selection', multi=True),
+        dbc.Label("Gender"),
+        dcc.Dropdown(options = ['male', 'female'], value = [], id=f'{prefix}-gender-selection', multi=True),
+        dbc.Label("Decade (rap)"),
+        dcc.Dropdown(options = group_decades, value = [], id=f'{prefix}-decade-selection', multi=True),
+    ]
+
+group_freq_dist_controls = dbc.Card(
+    [
+        html.Div(
+            [
+            html.H5("Songs"),
+            *group_filter_controls('group-freq-dist-target'),
+            ]),
+        html.Hr(),
+        html.Div(
+            [
+            html.H5("Compared to (all other songs if empty)"),
+            *group_filter_controls('group-freq-dist-reference'),
+            ]),
+        html.Hr(),
+        html.Div(
+            [
+            dbc.Label("Metric"),
+            dcc.RadioItems(options = [{'label': ' log ratio', 'value': 'ratio'},
+                                      {'label': ' log-likelihood', 'value': 'log_likelihood'}],
+                           value = 'ratio',
+                           id='group-freq-dist-method-selection'),
+            ]),
+    ],
+    body=True,
+)
+
+group_freq_dist_container = dbc.Container([
+    html.H3(children = 'Words more common to any group of songs than another',
+             style={'textAlign': 'center'}),
+    dbc.Row(
+        [
+            dbc.Col(group_freq_dist_controls, md=4),
+            dbc.Col(dcc.Graph(id='group-freq-dist-graph-content'), md=8),
+        ],
+        align="center",
+    ),
+], fluid=True)
+
+def get_group_freq_dist_callbacks(app):
+    @app.callback(
+        [
+            Output('group-freq-dist-graph-content', 'figure'),
+        ],
+        [
+            Input('group-freq-dist-target-genre-selection', 'value'),
+            Input('group-freq-dist-target-artist-selection', 'value'),
+            Input('group-freq-dist-target-gender-selection', 'value'),
+            Input('group-freq-dist-target-decade-selection', 'value'),
+            Input('group-freq-dist-reference-genre-selection', 'value'),
+            Input('group-freq-dist-reference-artist-selection', 'value'),
+            Input('group-freq-dist-reference-gender-selection', 'value'),
+            Input('group-freq-dist-reference-decade-selection', 'value'),
+            Input('group-freq-dist-method-selection', 'value'),
+        ]
+    )
+    def update_group_freq_dist_graph(target_genres, target_artists, target_genders, target_decades,
+                                     reference_genres, reference_artists, reference_genders,
+                                     reference_decades, method):
+        corpus = datasets.lyrics_corpus
+        target = corpus.select(genre=target_genres, Artist=target_artists,
+                               gender=target_genders, decade=target_decades)
+        reference = None
+        if reference_genres or reference_artists or reference_genders or reference_decades:
+            reference = corpus.select(genre=reference_genres, Artist=reference_artists,
+                                      gender=reference_genders, decade=reference_decades)
+
+        group_dist_fig = graph_objects.Figure()
+        if not target.all():
+            top, _ = corpus.distinctive_words(target, reference, method=method, k=20,
+                                              min_count=GROUP_FREQ_DIST_MIN_COUNT)
+            group_dist_fig.add_trace(graph_objects.Bar(x=top['word'], y=top['score'],
+                                                       customdata=top[['target_count', 'reference_count']],
+                                                       hovertemplate='%{x}: %{y:.2f}<br>'
+                                                       'count: %{customdata[0]}, in the compared songs: %{customdata[1]}'
+                                                       '<extra></extra>'))
+        return [group_dist_fig,]
+
 freq_md_1 = dcc.Markdown(
 '''
     For this part of analysis, a deeper look at of what words do the analyzed lyrcic actually comprise
@@ -0,0 +1,88 @@
+"""
+Row positions of every genre / artist / decade of the song-level tables
+
+Callbacks filtering the song tables by genre, artist or decade used to
+scan a whole column each time. The positions of every group's rows are
+found once instead, so a selection is a take() of the precomputed
+positions, whose cost depends on the selection, not the table size
+"""
+import numpy as np
+import pandas as pd
+
+from dataframes import datasets
+
+
+class GroupIndex:
+    """
+    groups - {column: {value: sorted row positions}}
+    children - {(parent column, child column): {parent value: child values}},
+               the child values in order of first appearance, like .unique()
+    """
+    def __init__(self, groups, children):
+        self.groups = groups
+        self.children = children
+
+    @classmethod
+    def from_frame(cls, df, columns, hierarchy=()):
+        """Index the given columns of df, plus (parent, child) column pairs"""
+        groups = {}
+        for column in columns:
+            indices = df.groupby(column, observed=True, sort=False).indices
+            groups[column] = {value: np.asarray(positions, dtype=np.int64)
+                              for value, positions in indices.items()}
+        children = {}
+        for parent, child in hierarchy:
+            child_values = df[child].to_numpy()
+            children[(parent, child)] = {value: list(pd.unique(child_values[positions]))
+                                         for value, positions in groups[parent].items()}
+        return cls(groups, children)
+
+    @property
+    def nbytes(self):
+        return sum(positions.nbytes for column in self.groups.values()
+                   for positions in column.values())
+
+    def positions(self, **filters):
+        """
+        Sorted row positions matching all the filters (column=value or list of values),
+        in table order. Values missing from the table match no rows
+        """
+        selected = None
+        for column, values in filters.items():
+            if not isinstance(values, (list, tuple)):
+                values = [values]
+            groups = self.groups[column]
+            parts = [groups[value] for value in values if value in groups]
+            if len(parts) == 1:
+                matched = parts[0]
+            else:
+                matched = np.sort(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+            selected = matched if selected is None else np.intersect1d(selected, matched,
+                                                                       assume_unique=True)
+        return selected
+
+    def take(self, df, **filters):
+        """The rows of df (the indexed table) matching the filters"""
+        return df.take(self.positions(**filters))
+
+    def child_values(self, parent, child, parent_values):
+        """e.g. the artists of the given genres, in table order of each genre"""
+        if not isinstance(parent_values, (list, tuple)):
+            parent_values = [parent_values]
+        children = self.children[(parent, child)]
+        return [value for parent_value in parent_values
+                for value in children.get(parent_value, [])]
+
+
+# columns the indexes are built from
+GROUP_COLUMNS = {
+    'counts': ['genre', 'Artist'],
+    'decade_counts': ['decade', 'Artist'],
+}
+for dataset_name, dataset_columns in GROUP_COLUMNS.items():
+    datasets.require(dataset_name, dataset_columns)
+
+datasets.register('counts_groups', lambda: GroupIndex.from_frame(
+    datasets.counts, GROUP_COLUMNS['counts'], hierarchy=[('genre', 'Artist')]))
+datasets.register('decade_counts_groups', lambda: GroupIndex.from_frame(
+    datasets.decade_counts, GROUP_COLUMNS['decade_counts'], hierarchy=[('decade', 'Artist')]))
@@ -0,0 +1,111 @@
+"""
+Histograms binned on the server
+
+px.histogram puts every row's value in the figure and lets the browser
+bin them, so the figure grows with the table. Here the bins are counted
+with NumPy from sorted per-group arrays (built once per column and group,
+then each histogram is a searchsorted of the bin edges) and sent as a bar
+chart of at most nbins bars, whatever the number of songs
+"""
+import math
+
+import numpy as np
+import plotly.graph_objects as graph_objects
+
+from dataframes import datasets
+# registers the counts_groups / decade_counts_groups datasets
+import group_index
+
+
+def nice_bin_size(span, nbins, integer=False):
+    """Smallest 1/2/5 x 10^k bin size giving at most nbins bins over span"""
+    raw = span / max(nbins, 1) if span > 0 else 1
+    magnitude = 10 ** math.floor(math.log10(raw))
+    size = next(step * magnitude for step in (1, 2, 5, 10) if step * magnitude >= raw)
+    return max(1, round(size)) if integer else size
+
+
+def bin_edges(vmin, vmax, nbins, integer=False):
+    """
+    Edges of bins of a nice size covering [vmin, vmax],
+    integer data gets bins centered on whole numbers
+    """
+    size = nice_bin_size(vmax - vmin, nbins, integer)
+    start = math.floor(vmin / size) * size - (0.5 if integer else 0)
+    n = int(math.floor((vmax - start) / size)) + 1
+    return start + size * np.arange(n + 1)
+
+
+def sorted_counts(sorted_values, edges):
+    """Number of values in each [edge, next edge) bin of sorted values"""
+    return np.diff(np.searchsorted(sorted_values, edges, side='left'))
+
+
+class GroupHistograms:
+    """Histograms of the columns of a song table within its groups (genres / decades)"""
+    def __init__(self, df, groups, group_column):
+        self.df = df
+        self.groups = groups
+        self.group_column = group_column
+        self._sorted = {}
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values, _ in self._sorted.values())
+
+    def sorted_values(self, column, group):
+        """(sorted non-NaN values, are they all whole numbers) of a column within a group"""
+        key = (column, group)
+        if key not in self._sorted:
+            positions = self.groups.positions(**{self.group_column: group})
+            values = self.df[column].to_numpy(dtype=np.float64)[positions]
+            values = np.sort(values[~np.isnan(values)])
+            self._sorted[key] = (values, bool(np.all(values == np.round(values))))
+        return self._sorted[key]
+
+    def histogram(self, columns, groups, nbins):
+        """
+        (bin edges, {column: counts}) of one or more columns over the given group(s),
+        all columns binned with the same edges
+        """
+        if not isinstance(columns, (list, tuple)):
+            columns = [columns]
+        if not isinstance(groups, (list, tuple)):
+            groups = [groups]
+        arrays = {column: [(values, integer) for values, integer in
+                           (self.sorted_values(column, group) for group in groups) if len(values)]
+                  for column in columns}
+        all_arrays = [array for column_arrays in arrays.values() for array in column_arrays]
+        if not all_arrays:
+            return np.zeros(0), {column: np.zeros(0, dtype=np.int64) for column in columns}
+        vmin = min(values[0] for values, _ in all_arrays)
+        vmax = max(values[-1] for values, _ in all_arrays)
+        edges = bin_edges(vmin, vmax, nbins or 10, all(integer for _, integer in all_arrays))
+        counts = {column: sum((sorted_counts(values, edges) for values, _ in column_arrays),
+                              np.zeros(len(edges) - 1, dtype=np.int64))
+                  for column, column_arrays in arrays.items()}
+        return edges, counts
+
+
+def histogram_figure(edges, counts):
+    """Stacked bar chart of binned counts of each column, looking like a px.histogram"""
+    fig = graph_objects.Figure()
+    for column, column_counts in counts.items():
+        fig.add_trace(graph_objects.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=column_counts,
+            width=np.diff(edges),
+            name=column,
+            customdata=np.stack([edges[:-1], edges[1:]], axis=-1),
+            hovertemplate='%{customdata[0]:.4g} - %{customdata[1]:.4g}<br>count: %{y}',
+        ))
+    x_title = next(iter(counts)) if len(counts) == 1 else 'value'
+    fig.update_layout(barmode='relative', bargap=0, xaxis_title=x_title, yaxis_title='count',
+                      legend_title_text='variable')
+    return fig
+
+
+datasets.register('counts_histograms', lambda: GroupHistograms(
+    datasets.counts, datasets.counts_groups, 'genre'))
+datasets.register('decade_counts_histograms', lambda: GroupHistograms(
+    datasets.decade_counts, datasets.decade_counts_groups, 'decade'))
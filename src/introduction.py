@@ -2,7 +2,7 @@ from dash import Dash, html, dcc, callback, Output, Input, dash_table
 import dash_bootstrap_components as dbc
 
 from dataframes import (
-    counts_df, artist_df
+    datasets, artist_df
 )
 # ---------------------------------------------------------------------------- #
 #                                markdown intro                                #
@@ -82,9 +82,12 @@ md_intro_3 = dcc.Markdown(
 # ---------------------------------------------------------------------------- #
 
 ## table
+# the raw table, lyrics and artist images included, read just for the preview
+# instead of making the shared counts dataset load every column
+raw_counts_df = datasets.read_full('counts')
 counts_df_table = dash_table.DataTable(
-    counts_df.to_dict('records'),
-    columns=[{"name": c, "id": c} for c in counts_df.columns],
+    raw_counts_df.to_dict('records'),
+    columns=[{"name": c, "id": c} for c in raw_counts_df.columns],
 
     filter_action="native",
     sort_action="native",
@@ -0,0 +1,61 @@
+"""
+Page sections rendered on demand
+
+Each lazy section starts as an empty placeholder. Its content (and with
+it every callback of its graphs) is only sent once the placeholder
+scrolls near the viewport or one of the sidebar links pointing into it
+is followed - assets/lazy_sections.js then clicks the section's hidden
+load button, whose callback returns the content.
+
+The app has to be created with suppress_callback_exceptions=True,
+as the sections' components aren't in the initial layout
+"""
+from dash import html, Output, Input
+
+# placeholder height, so that sections below the fold aren't all in view at once
+PLACEHOLDER_STYLE = {'minHeight': '100vh'}
+
+# section id -> content
+sections = {}
+
+
+def component_ids(component):
+    """String ids of a component and everything under it"""
+    ids = []
+    component_id = getattr(component, 'id', None)
+    if isinstance(component_id, str):
+        ids.append(component_id)
+    children = getattr(component, 'children', None)
+    if not isinstance(children, (list, tuple)):
+        children = [children]
+    for child in children:
+        if child is not None and not isinstance(child, (str, int, float)):
+            ids.extend(component_ids(child))
+    return ids
+
+
+def lazy_section(section_id, content):
+    """A placeholder which is replaced by content when shown"""
+    sections[section_id] = content
+    return html.Div(
+        [
+            html.Div(style=PLACEHOLDER_STYLE),
+            html.Button(id=f'lazy-section-load-{section_id}', n_clicks=0,
+                        style={'display': 'none'}),
+        ],
+        id=f'lazy-section-{section_id}',
+        # read by lazy_sections.js, to know which section a sidebar link points into
+        **{'data-lazy-section': section_id,
+           'data-lazy-anchors': ' '.join(component_ids(content))},
+    )
+
+
+def get_lazy_section_callbacks(app):
+    for section_id in sections:
+        @app.callback(
+            Output(f'lazy-section-{section_id}', 'children'),
+            Input(f'lazy-section-load-{section_id}', 'n_clicks'),
+            prevent_initial_call=True,
+        )
+        def load_section(n_clicks, section_id=section_id):
+            return sections[section_id]
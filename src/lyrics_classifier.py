@@ -0,0 +1,133 @@
+"""
+Genre classification from the lyrics text itself
+
+The ML section's SVC only sees the engineered columns (topic counts,
+word counts, sentiment ...). This second track reads the 'Song Lyrics'
+of each song from its lyrics store, chunk by chunk, turns each chunk into
+a sparse matrix with a HashingVectorizer (stateless - no vocabulary to fit
+or keep, so every chunk is transformed on its own) and updates a linear
+SGDClassifier with partial_fit. Only one chunk of lyrics is ever in
+memory, so the corpus can be far larger than RAM.
+
+Songs are held out for validation by a hash of their id, so the split
+doesn't need the whole song list either - or, to compare with another
+model, the songs that model was validated on are given as valid_ids.
+"""
+import hashlib
+import time
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import accuracy_score, confusion_matrix, f1_score
+
+from dataframes import datasets
+from figure_snapshots import file_digest
+from lyrics_store import stores
+from model_evaluation import RANDOM_STATE
+
+N_FEATURES = 2**20
+# songs vectorized and learnt from at a time
+CHUNK_SIZE = 500
+EPOCHS = 5
+TEST_SIZE = 0.2
+
+
+def lyrics_vectorizer(n_features=N_FEATURES):
+    """Word unigram + bigram counts hashed into n_features columns, rows l2 normalized"""
+    return HashingVectorizer(n_features=n_features, ngram_range=(1, 2), alternate_sign=False)
+
+
+def lyrics_model(random_state=RANDOM_STATE):
+    return SGDClassifier(loss='hinge', alpha=1e-4, random_state=random_state)
+
+
+def held_out(song_ids, test_size=TEST_SIZE, random_state=RANDOM_STATE):
+    """Mask of the validation songs, from a hash of each (integer) song id and the seed"""
+    ids = np.asarray(song_ids, dtype=np.uint64)
+    hashed = (ids + np.uint64(random_state)) * np.uint64(0x9E3779B97F4A7C15)
+    return (hashed >> np.uint64(40)) < np.uint64(test_size * 2**24)
+
+
+def lyrics_chunks(dataset, song_ids, labels, chunk_size=CHUNK_SIZE):
+    """(lyrics, labels) of the given songs of a table, chunk by chunk, from its lyrics store"""
+    store = stores[dataset]
+    for start in range(0, len(song_ids), chunk_size):
+        yield (store.get_many(song_ids[start:start + chunk_size]),
+               labels[start:start + chunk_size])
+
+
+def fit_stream(model, vectorizer, chunks, classes):
+    """partial_fit the model on each (lyrics, labels) chunk. Returns the number of songs seen"""
+    n_songs = 0
+    for texts, labels in chunks:
+        model.partial_fit(vectorizer.transform(texts), labels, classes=classes)
+        n_songs += len(texts)
+    return n_songs
+
+
+def predict_stream(model, vectorizer, chunks):
+    """(labels, predictions) of every (lyrics, labels) chunk"""
+    labels = []
+    predictions = []
+    for texts, chunk_labels in chunks:
+        labels.append(np.asarray(chunk_labels))
+        predictions.append(model.predict(vectorizer.transform(texts)))
+    return np.concatenate(labels), np.concatenate(predictions)
+
+
+def train_lyrics_genre(dataset='counts', target_col='genre', epochs=EPOCHS, chunk_size=CHUNK_SIZE,
+                       test_size=TEST_SIZE, random_state=RANDOM_STATE, valid_ids=None):
+    """
+    Train the lyrics classifier on the songs of a table, streaming their
+    lyrics epochs times (in a new order each time) and validate it on the
+    held out songs, or on valid_ids if given (trained on all the others).
+    Returns the metrics like train_classify_target, plus the training
+    throughput in songs per second
+    """
+    targets = datasets[dataset][target_col].dropna()
+    song_ids = targets.index.to_numpy()
+    if valid_ids is not None:
+        test = np.isin(song_ids, np.asarray(valid_ids))
+    else:
+        test = held_out(song_ids, test_size, random_state)
+    classes = np.unique(targets.to_numpy())
+
+    model = lyrics_model(random_state)
+    vectorizer = lyrics_vectorizer()
+    rng = np.random.default_rng(random_state)
+    train_ids, train_labels = song_ids[~test], targets.to_numpy()[~test]
+    n_songs = 0
+    start = time.perf_counter()
+    for _ in range(epochs):
+        order = rng.permutation(len(train_ids))
+        n_songs += fit_stream(model, vectorizer, lyrics_chunks(
+            dataset, train_ids[order].tolist(), train_labels[order], chunk_size), classes)
+    train_time = time.perf_counter() - start
+
+    y_valid, preds = predict_stream(model, vectorizer, lyrics_chunks(
+        dataset, song_ids[test].tolist(), targets.to_numpy()[test], chunk_size))
+    return {
+        "acc": accuracy_score(y_valid, preds),
+        "f1": f1_score(y_valid, preds, average=None, labels=classes),
+        "cm": confusion_matrix(y_valid, preds, labels=classes),
+        "labels": classes,
+        "model": model,
+        "songs_per_s": n_songs / train_time,
+        "n_train": len(train_ids),
+        "n_valid": len(y_valid),
+    }
+
+
+def lyrics_params(dataset='counts', valid_ids=None):
+    """What a trained lyrics classifier depends on besides the labels, for load_or_train"""
+    store = stores[dataset]
+    # builds the store if missing, so its text file exists
+    store.song_ids()
+    params = {'lyrics': file_digest(store.text_path), 'model': repr(lyrics_model()),
+              'vectorizer': repr(lyrics_vectorizer()), 'epochs': EPOCHS, 'chunk_size': CHUNK_SIZE,
+              'test_size': TEST_SIZE, 'random_state': RANDOM_STATE}
+    if valid_ids is not None:
+        params['valid_ids'] = hashlib.sha1(
+            np.sort(np.asarray(valid_ids, dtype=np.int64)).tobytes()).hexdigest()
+    return params
@@ -0,0 +1,257 @@
+"""
+Tokenized lyrics corpus of all songs, as a sparse song x word count matrix
+
+Songs from both the genre (combined_count.csv) and the rap decades
+(decades_counts.csv) tables are merged into one corpus - a song present in
+both keeps its genre, gender and decade. The lyrics are tokenized once into
+integer word ids, from which the count matrix is built, and both are cached
+in data/cache/corpus/.
+
+distinctive_words compares the word usage of any two groups of songs
+(e.g. one artist vs the rest of their decade), which the precomputed
+frequency comparison tables can't do
+"""
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+from data_cache import CACHE_DIR, read_table
+from dataframes import datasets
+from lyrics_store import stores
+
+CORPUS_DIR = os.path.join(CACHE_DIR, 'corpus')
+
+# song metadata kept in the corpus, the filters of select()
+META_COLUMNS = ['Artist', 'Song Title', 'genre', 'gender', 'decade']
+
+# songs tokenized per batch when building
+BUILD_CHUNK_SIZE = 5000
+
+
+def tokenize(texts, vocab):
+    """
+    Token ids of the given texts, as one flat array with the start offsets of
+    each text in it. The lyrics are already lowercased and stripped of
+    punctuation, so splitting on whitespace is enough. New words are added to
+    vocab (a word -> id dict)
+    """
+    token_ids = []
+    offsets = [0]
+    for text in texts:
+        words = text.split() if isinstance(text, str) else []
+        token_ids.extend(vocab.setdefault(word, len(vocab)) for word in words)
+        offsets.append(len(token_ids))
+    return np.array(token_ids, dtype=np.int32), np.array(offsets, dtype=np.int64)
+
+
+def count_matrix(token_ids, offsets, n_words):
+    """Sparse song x word counts of tokenized songs"""
+    # the tokens of each song are already a csr row, with repeated words,
+    # summing the duplicates turns them into counts
+    counts = sparse.csr_matrix((np.ones(len(token_ids), dtype=np.int32), token_ids, offsets),
+                               shape=(len(offsets) - 1, n_words))
+    counts.sum_duplicates()
+    return counts
+
+
+class LyricsCorpus:
+    """
+    meta - song metadata (META_COLUMNS), one row per song
+    vocab - words, by id
+    token_ids, offsets - the tokenized songs, song i is token_ids[offsets[i]:offsets[i + 1]]
+    counts - sparse song x word count matrix
+    """
+    def __init__(self, meta, vocab, token_ids, offsets, counts):
+        self.meta = meta
+        self.vocab = vocab
+        self.token_ids = token_ids
+        self.offsets = offsets
+        self.counts = counts
+        self.word_ids = {word: word_id for word_id, word in enumerate(vocab.tolist())}
+        self.total_counts = np.asarray(counts.sum(axis=0)).ravel()
+        self.stopword_mask = np.isin(vocab, list(ENGLISH_STOP_WORDS))
+
+    @property
+    def nbytes(self):
+        return (int(self.meta.memory_usage(deep=True).sum()) + self.vocab.nbytes
+                + self.token_ids.nbytes + self.offsets.nbytes + self.counts.data.nbytes
+                + self.counts.indices.nbytes + self.counts.indptr.nbytes)
+
+    def select(self, **filters):
+        """
+        Boolean mask of the songs matching all the given metadata filters,
+        each a single value or a list of accepted values, e.g.
+        select(genre='rap', decade=['2010s', '2020s']).
+        Empty filters (None, []) are ignored
+        """
+        mask = np.ones(len(self.meta), dtype=bool)
+        for column, values in filters.items():
+            if values is None or (isinstance(values, (list, tuple)) and not values):
+                continue
+            if not isinstance(values, (list, tuple)):
+                values = [values]
+            mask &= self.meta[column].isin(values).to_numpy()
+        return mask
+
+    def word_counts(self, mask):
+        """Total count of every word over the selected songs"""
+        return np.asarray(self.counts[np.flatnonzero(mask)].sum(axis=0)).ravel()
+
+    def distinctive_words(self, target, reference=None, method='ratio', k=20,
+                          min_count=1, exclude_stopwords=True):
+        """
+        The k words most characteristic of the target songs compared to the reference
+        songs (both boolean masks from select(); by default the reference is every
+        song not in the target). Target songs are never counted in the reference.
+
+        method:
+            'ratio' - log of the word's relative frequency in target vs reference,
+                      the metric of the precomputed comparison charts, scaled by the
+                      group sizes (which doesn't change the ranking)
+            'log_likelihood' - signed Dunning log-likelihood (G2) keyness,
+                      more reliable for rare words and small groups
+
+        Words never used in the reference can't have a ratio, so they're left
+        out of the ranking (like the 1000 sentinel of the comparison tables)
+        and returned separately.
+
+        Returns (top, unique) - a DataFrame with word, score, target_count and
+        reference_count columns, sorted by score, and an array of words only
+        the target uses
+        """
+        target_counts = self.word_counts(target)
+        if reference is None:
+            reference_counts = self.total_counts - target_counts
+        else:
+            reference_counts = self.word_counts(reference & ~target)
+
+        candidates = target_counts >= min_count
+        if exclude_stopwords:
+            candidates &= ~self.stopword_mask
+        unique = candidates & (reference_counts == 0)
+        candidates &= reference_counts > 0
+
+        target_total = max(target_counts.sum(), 1)
+        reference_total = max(reference_counts.sum(), 1)
+        word_ids = np.flatnonzero(candidates)
+        a = target_counts[word_ids].astype(np.float64)
+        b = reference_counts[word_ids].astype(np.float64)
+
+        if method == 'ratio':
+            scores = np.log((a / target_total) / (b / reference_total))
+        elif method == 'log_likelihood':
+            expected_a = target_total * (a + b) / (target_total + reference_total)
+            expected_b = reference_total * (a + b) / (target_total + reference_total)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                g2 = 2 * (np.where(a > 0, a * np.log(a / expected_a), 0)
+                          + np.where(b > 0, b * np.log(b / expected_b), 0))
+            scores = np.sign(a / target_total - b / reference_total) * g2
+        else:
+            raise ValueError(f'unknown keyness method: {method}')
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k] if k else np.zeros(0, dtype=np.int64)
+        top = top[np.argsort(-scores[top], kind='stable')]
+        top_ids = word_ids[top]
+        top_df = pd.DataFrame({
+            'word': self.vocab[top_ids],
+            'score': scores[top],
+            'target_count': target_counts[top_ids],
+            'reference_count': reference_counts[top_ids],
+        })
+        return top_df, self.vocab[np.flatnonzero(unique)]
+
+    def save(self, directory=CORPUS_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.meta.to_parquet(os.path.join(directory, 'meta.parquet'))
+        np.savez(os.path.join(directory, 'tokens.npz'), vocab=self.vocab,
+                 token_ids=self.token_ids, offsets=self.offsets)
+        sparse.save_npz(os.path.join(directory, 'counts.npz'), self.counts)
+
+    @classmethod
+    def load(cls, directory=CORPUS_DIR):
+        meta = pd.read_parquet(os.path.join(directory, 'meta.parquet'))
+        tokens = np.load(os.path.join(directory, 'tokens.npz'), allow_pickle=False)
+        counts = sparse.load_npz(os.path.join(directory, 'counts.npz')).tocsr()
+        return cls(meta, tokens['vocab'], tokens['token_ids'], tokens['offsets'], counts)
+
+
+def corpus_meta():
+    """
+    Metadata of every song of both song-level tables, with the lyrics store
+    and id each song's lyrics are read from
+    """
+    frames = []
+    for dataset, columns in (('counts', ['Artist', 'Song Title', 'genre', 'gender']),
+                             ('decade_counts', ['Artist', 'Song Title', 'decade'])):
+        csv_path, index_col = datasets.source(dataset)
+        df = read_table(csv_path, index_col=index_col, columns=columns)
+        df = df.astype({col: 'object' for col in df.columns})
+        df['store'] = dataset
+        df['song_id'] = df.index
+        frames.append(df.reset_index(drop=True))
+    genre_songs, decade_songs = frames
+    decade_songs['genre'] = 'rap'
+
+    # songs in both tables keep their genre table row, with the decade added
+    merged = genre_songs.merge(decade_songs[['Artist', 'Song Title', 'decade']],
+                               on=['Artist', 'Song Title'], how='left')
+    in_genre_table = decade_songs.set_index(['Artist', 'Song Title']).index.isin(
+        genre_songs.set_index(['Artist', 'Song Title']).index)
+    meta = pd.concat([merged, decade_songs[~in_genre_table]], ignore_index=True)
+    for column in META_COLUMNS:
+        if column != 'Song Title':
+            meta[column] = meta[column].astype('category')
+    return meta
+
+
+def chunk_lyrics(chunk):
+    """Lyrics of a chunk of corpus songs, in order, fetched from their lyrics stores"""
+    lyrics = pd.Series(index=chunk.index, dtype=object)
+    for store_name, song_ids in chunk.groupby('store')['song_id']:
+        lyrics[song_ids.index] = stores[store_name].get_many(song_ids.tolist())
+    return lyrics.tolist()
+
+
+def build_corpus():
+    """Tokenize the lyrics of every song, in chunks, and build the count matrix"""
+    meta = corpus_meta()
+    vocab = {}
+    token_chunks = []
+    offset_chunks = [np.zeros(1, dtype=np.int64)]
+    n_tokens = 0
+    for start in range(0, len(meta), BUILD_CHUNK_SIZE):
+        token_ids, offsets = tokenize(chunk_lyrics(meta.iloc[start:start + BUILD_CHUNK_SIZE]),
+                                      vocab)
+        token_chunks.append(token_ids)
+        offset_chunks.append(offsets[1:] + n_tokens)
+        n_tokens += len(token_ids)
+
+    token_ids = np.concatenate(token_chunks)
+    offsets = np.concatenate(offset_chunks)
+    vocab = np.array(list(vocab), dtype=str)
+    return LyricsCorpus(meta, vocab, token_ids, offsets, count_matrix(token_ids, offsets, len(vocab)))
+
+
+def corpus_is_fresh(directory=CORPUS_DIR):
+    """True if the saved corpus exists and is newer than both song tables"""
+    path = os.path.join(directory, 'counts.npz')
+    if not os.path.exists(path):
+        return False
+    return all(os.path.getmtime(path) >= os.path.getmtime(datasets.source(dataset)[0])
+               for dataset in ('counts', 'decade_counts'))
+
+
+def load_corpus():
+    """The saved corpus, built and saved first if missing or stale"""
+    if corpus_is_fresh():
+        return LyricsCorpus.load()
+    corpus = build_corpus()
+    corpus.save()
+    return corpus
+
+
+datasets.register('lyrics_corpus', load_corpus)
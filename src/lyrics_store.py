@@ -0,0 +1,104 @@
+"""
+On-demand access to the lyrics of single songs
+
+The song-level tables are loaded without their 'Song Lyrics' column,
+instead the lyrics of each table are written once to a plain text file
+with an array of song offsets next to it, so fetching a song is a seek
+and a read, and only the offsets are kept in memory
+"""
+import os
+import threading
+
+import numpy as np
+
+from data_cache import CACHE_DIR, read_table
+
+LYRICS_DIR = os.path.join(CACHE_DIR, 'lyrics')
+
+
+class LyricsStore:
+    """Lyrics of one song-level table, keyed by the table's index"""
+    def __init__(self, name, csv_path, index_col=0, column='Song Lyrics'):
+        self.name = name
+        self.csv_path = csv_path
+        self.index_col = index_col
+        self.column = column
+        self.text_path = os.path.join(LYRICS_DIR, f'{name}.txt')
+        self.offsets_path = os.path.join(LYRICS_DIR, f'{name}.npz')
+        self._positions = None
+        self._offsets = None
+        self._lock = threading.Lock()
+
+    def is_fresh(self):
+        """True if both files exist and are newer than the table"""
+        csv_mtime = os.path.getmtime(self.csv_path)
+        return all(os.path.exists(path) and os.path.getmtime(path) >= csv_mtime
+                   for path in (self.text_path, self.offsets_path))
+
+    def build(self):
+        """Write the lyrics text file and the offsets of each song in it"""
+        lyrics = read_table(self.csv_path, index_col=self.index_col, columns=[self.column])
+        encoded = [text.encode('utf-8') if isinstance(text, str) else b''
+                   for text in lyrics[self.column]]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(text) for text in encoded])
+
+        os.makedirs(LYRICS_DIR, exist_ok=True)
+        # both through temporary files, the offsets last, so a store whose
+        # offsets exist has its whole text file
+        tmp_suffix = f'.{os.getpid()}.tmp'
+        with open(self.text_path + tmp_suffix, 'wb') as text_file:
+            text_file.write(b''.join(encoded))
+        os.replace(self.text_path + tmp_suffix, self.text_path)
+        with open(self.offsets_path + tmp_suffix, 'wb') as offsets_file:
+            np.savez(offsets_file, index=lyrics.index.to_numpy(), offsets=offsets)
+        os.replace(self.offsets_path + tmp_suffix, self.offsets_path)
+
+    def _load(self):
+        with self._lock:
+            if self._offsets is not None:
+                return
+            if not self.is_fresh():
+                self.build()
+            arrays = np.load(self.offsets_path, allow_pickle=False)
+            self._positions = {song_id: position
+                               for position, song_id in enumerate(arrays['index'].tolist())}
+            self._offsets = arrays['offsets']
+
+    def song_ids(self):
+        """Index of every song of the table, in table order"""
+        self._load()
+        return list(self._positions)
+
+    def get(self, song_id):
+        """Lyrics of one song"""
+        return self.get_many([song_id])[0]
+
+    def get_many(self, song_ids):
+        """Lyrics of the given songs, in the same order"""
+        self._load()
+        lyrics = []
+        with open(self.text_path, 'rb') as text_file:
+            for song_id in song_ids:
+                position = self._positions[song_id]
+                start, end = self._offsets[position], self._offsets[position + 1]
+                text_file.seek(start)
+                lyrics.append(text_file.read(end - start).decode('utf-8'))
+        return lyrics
+
+
+stores = {
+    'counts': LyricsStore('counts', '../data/combined_count.csv'),
+    'decade_counts': LyricsStore('decade_counts', '../data/decade_dataframes/decades_counts.csv'),
+}
+
+
+def song_lyrics(dataset, song_ids):
+    """Lyrics of the given songs (index values) of one of the song-level datasets"""
+    return stores[dataset].get_many(list(song_ids))
+
+
+def build_stores():
+    for store in stores.values():
+        store.build()
+    return [store.text_path for store in stores.values()]
@@ -6,12 +6,12 @@ import plotly.graph_objects as graph_objects
 from plotly.subplots import make_subplots
 
 from dataframes import (
-    genre_mean_df, artist_mean_df,
-    counts_df,
+    datasets,
     meta_columns,
     topics,
     genres
 )
+from histograms import histogram_figure
 
 # ---------------------------------------------------------------------------- #
 #       Artist metadata (unique_words, producer_count etc) means by genre      #
@@ -50,6 +50,7 @@ def get_genre_metadata_callbacks(app):
         ]
     )
     def update_genre_metadata_graph(meta_col):
+        genre_mean_df = datasets.genre_mean
         # meta_fig = px.bar(genre_mean_df, x=genre_mean_df.index, y=genre_mean_df[meta_col])
         meta_fig = px.bar(genre_mean_df, x=genre_mean_df.index, y=genre_mean_df[meta_col])
         # meta_fig = graph_objects.Figure()
@@ -113,8 +114,8 @@ def get_genre_hist_meta_callbacks(app):
         ]
     )
     def update_hist_meta_graph(meta, genre, nbins):
-        genre_df = counts_df[counts_df['genre'] == genre]
-        hist_fig = px.histogram(genre_df, x=meta, nbins=nbins)
+        edges, counts = datasets.counts_histograms.histogram(meta, genre, nbins)
+        hist_fig = histogram_figure(edges, counts)
         return [hist_fig,]
 
 
@@ -156,6 +157,7 @@ def get_artist_metadata_callbacks(app):
         ]
     )
     def update_artist_metadata_graph(meta_col):
+        artist_mean_df = datasets.artist_mean
         # meta_fig = px.bar(genre_mean_df, x=genre_mean_df.index, y=genre_mean_df[meta_col])
         meta_fig = px.bar(artist_mean_df, x=artist_mean_df['Artist'], y=artist_mean_df[meta_col])
         # meta_fig = graph_objects.Figure()
@@ -165,8 +167,11 @@ def get_artist_metadata_callbacks(app):
 # ---------------------------------------------------------------------------- #
 #              Artist metadata means by year overlaid bar and line             #
 # ---------------------------------------------------------------------------- #
-by_year_df = counts_df.groupby(by=['Year'])
-by_year_means = by_year_df[[*meta_columns]].mean()
+def get_by_year_means():
+    by_year_df = datasets.counts.groupby(by=['Year'])
+    return by_year_df[[*meta_columns]].mean()
+
+datasets.register('by_year_means', get_by_year_means)
 
 bar_line_metadata_controls = dbc.Card(
     [
@@ -210,6 +215,7 @@ def get_bar_line_metadata_callbacks(app):
         ]
     )
     def update_bar_line_metadata_graph(bar_col, line_col):
+        by_year_means = datasets.by_year_means
         year_fig = make_subplots(specs=[[{"secondary_y": True}]])
 
         year_fig.add_trace(
@@ -279,6 +285,7 @@ def get_bar_line_metadata_topic_callbacks(app):
         ]
     )
     def update_bar_line_metadata_topic_graph(bar_col, line_col):
+        genre_mean_df = datasets.genre_mean
         bl_fig = make_subplots(specs=[[{"secondary_y": True}]])
 
         bl_fig.add_trace(
@@ -0,0 +1,115 @@
+"""
+Trained model artifacts, so the app doesn't train its models on every start
+
+Each model's training results (fitted pipeline, validation split,
+predictions and metrics) are saved with joblib to models/{name}.joblib,
+together with a fingerprint of the training data and parameters, plus a
+readable {name}.json with the metrics. A model is only retrained when
+its fingerprint changes or its artifact is missing.
+"""
+import hashlib
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+from startup_profiler import profiled_block
+
+MODELS_DIR = '../models'
+# cross-validation fold scores, see model_evaluation
+CV_DIR = os.path.join(MODELS_DIR, 'cv')
+
+
+def data_fingerprint(df, params):
+    """Hash of the training data (values, index, columns and dtypes) and parameters"""
+    digest = hashlib.sha1()
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    digest.update(json.dumps([list(map(str, df.columns)), list(map(str, df.dtypes))]).encode('utf-8'))
+    digest.update(json.dumps({**params, 'sklearn': sklearn.__version__},
+                             sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def artifact_path(name):
+    return os.path.join(MODELS_DIR, f'{name}.joblib')
+
+
+def metrics_path(name):
+    return os.path.join(MODELS_DIR, f'{name}.json')
+
+
+def json_metric(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def save_artifact(name, results, fingerprint, params, train_time):
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    joblib.dump({'fingerprint': fingerprint, 'params': params, 'results': results},
+                artifact_path(name))
+    metrics = {key: json_metric(value) for key, value in results.items()
+               if key in ('acc', 'f1', 'cm', 'labels', 'mae', 'r2')}
+    with open(metrics_path(name), 'w') as metrics_file:
+        json.dump({'fingerprint': fingerprint, 'params': params,
+                   'trained_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                   'train_time_s': train_time, 'metrics': metrics},
+                  metrics_file, indent=1, default=str)
+
+
+def load_artifact(name, fingerprint):
+    """Saved training results of the model, None if missing or trained on other data"""
+    path = artifact_path(name)
+    if not os.path.exists(path):
+        return None
+    try:
+        artifact = joblib.load(path)
+    except Exception:
+        # unreadable (e.g. saved by another library version), retrain
+        return None
+    if artifact.get('fingerprint') != fingerprint:
+        return None
+    return artifact['results']
+
+
+def load_or_train(name, df, train, params):
+    """
+    Training results of a model trained on df by train(), loaded from its
+    artifact if the data and params are unchanged, trained and saved otherwise
+    """
+    with profiled_block(f'model {name}'):
+        fingerprint = data_fingerprint(df, params)
+        results = load_artifact(name, fingerprint)
+        if results is None:
+            start = time.perf_counter()
+            results = train()
+            save_artifact(name, results, fingerprint, params, time.perf_counter() - start)
+    return results
+
+
+def remove_artifacts():
+    """Delete every saved model and fold score, so the next load retrains them"""
+    for directory in (MODELS_DIR, CV_DIR):
+        if not os.path.exists(directory):
+            continue
+        for file_name in os.listdir(directory):
+            if file_name.endswith(('.joblib', '.json')):
+                os.remove(os.path.join(directory, file_name))
+
+
+def artifact_metrics():
+    """{name: metrics json} of every saved model"""
+    if not os.path.exists(MODELS_DIR):
+        return {}
+    metrics = {}
+    for file_name in sorted(os.listdir(MODELS_DIR)):
+        if file_name.endswith('.json'):
+            with open(os.path.join(MODELS_DIR, file_name)) as metrics_file:
+                metrics[file_name[:-len('.json')]] = json.load(metrics_file)
+    return metrics
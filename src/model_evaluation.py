@@ -0,0 +1,131 @@
+"""
+k-fold cross-validation of the ML section models
+
+train_classify_target scores a model on a single train / validation split,
+so its accuracy, f1 or MAE depend on which songs land in the validation
+set. cross_validate_target fits the same preprocessing + model pipeline on
+each of k folds (stratified by the target for classification), the folds
+running in parallel joblib worker processes, and reports the mean and std
+of each metric over the folds.
+
+Each fold's metrics are saved to models/cv/{key}-{fold}.json, key being a
+hash of the data, the target, the model's class and parameters and the
+splitting seed, so only folds that were never scored are fitted again.
+
+This module is kept free of the page code, so the worker processes only
+import scikit-learn and not the app.
+"""
+import json
+import os
+
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.compose import ColumnTransformer
+from sklearn.metrics import accuracy_score, f1_score, mean_absolute_error, r2_score
+from sklearn.model_selection import KFold, StratifiedKFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from model_artifacts import CV_DIR, data_fingerprint
+from startup_profiler import profiled_block
+
+N_SPLITS = 5
+# seed of every split and fold, so the page shows the same numbers on every start
+RANDOM_STATE = 0
+
+
+def build_pipeline(X, model):
+    """
+    Pipeline standard scaling the numerical columns of X and one-hot-encoding
+    the categorical ones, followed by the model
+    """
+    categorical_cols = [cname for cname in X.columns if X[cname].dtype in ["object", "category"]]
+    numerical_cols = [cname for cname in X.columns if X[cname].dtype in ['int64', 'float64']]
+
+    categorical_transformer = Pipeline(steps=[
+        ('onehot', OneHotEncoder(handle_unknown='ignore')),
+    ])
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ('num', StandardScaler(), numerical_cols),
+            ('cat', categorical_transformer, categorical_cols)
+        ]
+    )
+    return Pipeline(steps=[
+        ('preprocessor', preprocessor),
+        ('model', model)
+    ])
+
+
+def model_params(model):
+    """Class name and parameters of a model, for cache keys"""
+    return {'model': type(model).__name__, **model.get_params()}
+
+
+def fold_splits(X, y, n_splits, task, random_state):
+    """(train rows, validation rows) of each fold"""
+    splitter = StratifiedKFold if task == 'class' else KFold
+    return list(splitter(n_splits=n_splits, shuffle=True, random_state=random_state).split(X, y))
+
+
+def score_fold(X, y, model, train_rows, valid_rows, task):
+    """Metrics of a fresh copy of the model fitted on the train rows, on the validation rows"""
+    pipeline = build_pipeline(X, clone(model))
+    pipeline.fit(X.iloc[train_rows], y.iloc[train_rows])
+    y_valid = y.iloc[valid_rows]
+    preds = pipeline.predict(X.iloc[valid_rows])
+    if task == 'class':
+        return {'acc': accuracy_score(y_valid, preds),
+                'f1_macro': f1_score(y_valid, preds, average='macro')}
+    return {'mae': mean_absolute_error(y_valid, preds), 'r2': r2_score(y_valid, preds)}
+
+
+def fold_path(key, fold):
+    return os.path.join(CV_DIR, f'{key}-{fold}.json')
+
+
+def load_fold(key, fold):
+    """Saved metrics of a fold, None if never scored"""
+    try:
+        with open(fold_path(key, fold)) as fold_file:
+            return json.load(fold_file)
+    except (OSError, ValueError):
+        return None
+
+
+def save_fold(key, fold, metrics):
+    os.makedirs(CV_DIR, exist_ok=True)
+    with open(fold_path(key, fold), 'w') as fold_file:
+        json.dump({name: float(value) for name, value in metrics.items()}, fold_file)
+
+
+def cross_validate_target(df, target_col, model, n_splits=N_SPLITS, task='class', n_jobs=-1,
+                          random_state=RANDOM_STATE, cache=True):
+    """
+    Scores of the model predicting target_col from the other columns of df
+    (without NaNs) over n_splits folds, task 'class' (accuracy, macro f1) or
+    'regr' (mae, r2). The folds not cached yet are fitted on n_jobs processes.
+
+    Returns {'folds': DataFrame of each fold's metrics, 'mean': ..., 'std': ...}
+    """
+    y = df[target_col]
+    X = df.drop([target_col], axis=1)
+    params = {'target_col': target_col, 'n_splits': n_splits, 'task': task,
+              'random_state': random_state, **model_params(model)}
+    key = data_fingerprint(df, params)[:16]
+
+    folds = [load_fold(key, fold) if cache else None for fold in range(n_splits)]
+    missing = [fold for fold, metrics in enumerate(folds) if metrics is None]
+    if missing:
+        with profiled_block(f'cross-validation {target_col} {type(model).__name__}'):
+            splits = fold_splits(X, y, n_splits, task, random_state)
+            scores = Parallel(n_jobs=n_jobs)(
+                delayed(score_fold)(X, y, model, *splits[fold], task) for fold in missing)
+        for fold, metrics in zip(missing, scores):
+            folds[fold] = metrics
+            if cache:
+                save_fold(key, fold, metrics)
+
+    folds = pd.DataFrame(folds, index=pd.RangeIndex(n_splits, name='fold'))
+    return {'folds': folds, 'mean': folds.mean(), 'std': folds.std()}
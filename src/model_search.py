@@ -0,0 +1,177 @@
+"""
+Hyperparameter search for the ML section models
+
+The page models are the default SVC() / SVR(). run_search() tries
+candidate hyperparameters of a model, either a randomized search (every
+candidate scored on all the training rows of each fold) or successive
+halving (every candidate scored on a small sample of the training rows,
+the best 1 / factor of them again on factor times more rows, and so on).
+
+The table is encoded once through the feature store (see feature_store),
+a dense matrix in models/features. The worker processes scoring the
+candidates open it with mmap_mode='r', so they share its pages read-only
+instead of each refitting the preprocessor for every candidate and fold.
+(The scaler then sees the validation rows' mean and variance too, which
+doesn't change how candidates compare.)
+
+Every scored (candidate, number of training rows) is appended to the
+leaderboard, models/search/{name}-{key}.csv, as soon as it's done. The
+candidates are drawn from a seeded sampler, so rerunning a search - after
+an interruption, or with more candidates - only scores what isn't on the
+leaderboard yet.
+"""
+import json
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from scipy.stats import loguniform
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterSampler
+from sklearn.svm import SVC, SVR
+
+from feature_store import frame_matrix
+from model_artifacts import MODELS_DIR, data_fingerprint
+from model_evaluation import fold_splits, model_params, N_SPLITS, RANDOM_STATE
+
+SEARCH_DIR = os.path.join(MODELS_DIR, 'search')
+
+# name -> (target column, task, model, {param: [values] or ('log', low, high)})
+SEARCH_SPACES = {
+    'counts_genre': ('genre', 'class', SVC(), {
+        'C': ('log', 1e-2, 1e3),
+        'gamma': ('log', 1e-4, 1e0),
+        'kernel': ['rbf', 'linear'],
+    }),
+    'counts_unique_words': ('unique_words', 'regr', SVR(), {
+        'C': ('log', 1e-1, 1e4),
+        'gamma': ('log', 1e-4, 1e0),
+        'epsilon': ('log', 1e-2, 1e2),
+    }),
+}
+
+# higher is better for both
+SCORING = {'class': 'accuracy', 'regr': 'neg_mean_absolute_error'}
+
+LEADERBOARD_COLUMNS = ['params', 'n_samples', 'mean_score', 'std_score', 'fit_time']
+
+
+def distributions(space):
+    """ParameterSampler distributions of a search space"""
+    return {param: loguniform(values[1], values[2]) if isinstance(values, tuple) else values
+            for param, values in space.items()}
+
+
+def candidates(space, n_candidates, random_state=RANDOM_STATE):
+    """The first n_candidates parameter sets drawn from the space, as plain python values"""
+    return [{param: value.item() if isinstance(value, np.generic) else value
+             for param, value in params.items()}
+            for params in ParameterSampler(distributions(space), n_candidates,
+                                           random_state=random_state)]
+
+
+def params_key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def subsample(rows, n_samples, random_state):
+    """n_samples of the rows (all if fewer), the same ones for every candidate"""
+    if n_samples >= len(rows):
+        return rows
+    rng = np.random.default_rng(random_state)
+    return np.sort(rng.choice(rows, n_samples, replace=False))
+
+
+def score_candidate(features_path, y, model, params, splits, scoring, n_samples, random_state):
+    """(mean, std of the fold scores, fit time) of the model with params, on the shared matrix"""
+    features = np.load(features_path, mmap_mode='r')
+    scorer = get_scorer(scoring)
+    start = time.perf_counter()
+    scores = []
+    for train_rows, valid_rows in splits:
+        train_rows = subsample(train_rows, n_samples, random_state)
+        estimator = clone(model).set_params(**params)
+        estimator.fit(features[train_rows], y[train_rows])
+        scores.append(scorer(estimator, features[valid_rows], y[valid_rows]))
+    return float(np.mean(scores)), float(np.std(scores)), time.perf_counter() - start
+
+
+def leaderboard_path(name, key):
+    return os.path.join(SEARCH_DIR, f'{name}-{key}.csv')
+
+
+def load_leaderboard(path):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=LEADERBOARD_COLUMNS)
+    return pd.read_csv(path)
+
+
+def halving_rounds(n_candidates, n_max, factor, min_samples):
+    """Training rows of each successive halving round, the last one all of them"""
+    n_rounds = max(1, math.ceil(math.log(n_candidates, factor))) if n_candidates > 1 else 1
+    return [max(min_samples, n_max // factor ** (n_rounds - 1 - round_index))
+            for round_index in range(n_rounds)]
+
+
+def run_search(df, name, method='random', n_candidates=20, factor=3, min_samples=50,
+               n_jobs=-1, n_splits=N_SPLITS, random_state=RANDOM_STATE, log=print):
+    """
+    Search the hyperparameters of a SEARCH_SPACES model on df (without NaNs)
+    with method 'random' or 'halving'. Scores are the mean over n_splits folds,
+    candidates are scored on n_jobs processes.
+
+    Returns (leaderboard of this search, best first, its path)
+    """
+    target_col, task, model, space = SEARCH_SPACES[name]
+    scoring = SCORING[task]
+    y = df[target_col].to_numpy()
+    X = df.drop([target_col], axis=1)
+    key = data_fingerprint(df, {'target_col': target_col, 'task': task, 'scoring': scoring,
+                                'space': space, 'n_splits': n_splits,
+                                'random_state': random_state, **model_params(model)})[:16]
+    path = leaderboard_path(name, key)
+    features_path = frame_matrix(df, target_col, name).path
+    splits = fold_splits(X, y, n_splits, task, random_state)
+    n_max = min(len(train_rows) for train_rows, _ in splits)
+
+    searched = [params_key(params) for params in candidates(space, n_candidates, random_state)]
+    if method == 'halving':
+        rounds = halving_rounds(len(searched), n_max, factor, min_samples)
+    else:
+        rounds = [n_max]
+
+    leaderboard = load_leaderboard(path)
+    os.makedirs(SEARCH_DIR, exist_ok=True)
+    pool = searched
+    for round_index, n_samples in enumerate(rounds):
+        done = set(leaderboard.loc[leaderboard['n_samples'] == n_samples, 'params'])
+        todo = [params for params in pool if params not in done]
+        log(f'{name}: {len(pool)} candidates on {n_samples} rows, '
+            f'{len(pool) - len(todo)} already on the leaderboard')
+        results = Parallel(n_jobs=n_jobs, return_as='generator')(
+            delayed(score_candidate)(features_path, y, model, json.loads(params), splits, scoring,
+                                     n_samples, random_state)
+            for params in todo)
+        rows = []
+        for params, result in zip(todo, results):
+            # written as soon as it's scored, so an interrupted round resumes from there
+            row = pd.DataFrame([[params, n_samples, *result]], columns=LEADERBOARD_COLUMNS)
+            row.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+            rows.append(row)
+        if rows:
+            leaderboard = pd.concat([leaderboard, *rows] if len(leaderboard) else rows,
+                                    ignore_index=True)
+
+        if round_index < len(rounds) - 1:
+            round_scores = leaderboard[(leaderboard['n_samples'] == n_samples)
+                                       & leaderboard['params'].isin(pool)]
+            pool = list(round_scores.sort_values('mean_score', ascending=False)['params']
+                        .head(max(1, len(pool) // factor)))
+
+    result = leaderboard[leaderboard['params'].isin(searched)]
+    result = result.sort_values(['n_samples', 'mean_score'], ascending=False)
+    return result.reset_index(drop=True), path
@@ -1,20 +1,54 @@
-from dash import Dash, html, dcc, callback, Output, Input
+from dash import Dash, html, dcc, callback, Output, Input, ctx, no_update
 import dash_bootstrap_components as dbc
 
 import plotly.express as px
 from plotly.subplots import make_subplots
 import plotly.graph_objects as graph_objects
 
-from wordcloud import WordCloud
+from wordcloud_assets import wordcloud_url, add_wordcloud_image
 
 from dataframes import (
-    artist_ngrams_df
+    datasets
 )
+# registers the artist_ngram_terms dataset
+import term_tables
 
 # ---------------------------------------------------------------------------- #
 #                          Dynamic artist ngram graph                          #
 # ---------------------------------------------------------------------------- #
 
+def ngram_artist_options(genre):
+    """Artists of the genre, as dropdown options"""
+    genre_artists = datasets.artist_ngram_terms.entities(genre=genre)
+    options = [{"label": artist, "value": artist} for artist in genre_artists]
+    return options
+
+def ngram_artist_wordcloud_figure(artist):
+    artist_terms = datasets.artist_ngram_terms
+    # create wordclouds for all ngram lens
+
+    ngram_lens = [2,3,4]
+
+    gram_wordclouds_fig = make_subplots(rows=3, cols=2, subplot_titles = ngram_lens)
+
+    for len_index, gram_len in enumerate(ngram_lens):
+        # one slice of the long ngram table per length
+        gram_words, gram_counts = artist_terms.fetch(artist, gram_len)
+
+        add_wordcloud_image(gram_wordclouds_fig, wordcloud_url(f'ngram_{gram_len}', artist, gram_words, gram_counts),
+                            row=len_index+1, col=1)
+        gram_wordclouds_fig.add_trace(graph_objects.Bar(x=gram_words, y=gram_counts, showlegend = False), row=len_index+1, col=2)
+        
+    gram_wordclouds_fig.update_layout(height = 3*400)
+    # gram_wordclouds_fig.show()
+    
+    return gram_wordclouds_fig
+
+# initial state, rendered with the layout rather than by callbacks on load
+initial_ngram_genre = 'soul'
+initial_ngram_options = ngram_artist_options(initial_ngram_genre)
+initial_ngram_artist = initial_ngram_options[0]['value']
+
 ngram_artist_wordcloud_controls = dbc.Card(
     [
         html.Div(
@@ -22,8 +56,8 @@ ngram_artist_wordcloud_controls = dbc.Card(
             dbc.Label("Genre"),
             dcc.Dropdown(
                 id='ngram-wordcloud-genre-selection',
-                value = 'soul',
-                options = list(artist_ngrams_df.genre.unique())
+                value = initial_ngram_genre,
+                options = list(datasets.artist_ngram_terms.info.genre.unique())
             )
             ]),
         html.Div(
@@ -31,7 +65,8 @@ ngram_artist_wordcloud_controls = dbc.Card(
             dbc.Label("Artist"),
             dcc.Dropdown(
                 id='ngram-wordcloud-artist-selection-dynamic',
-                value='Al Green'
+                options = initial_ngram_options,
+                value = initial_ngram_artist
             )
             ]),
     ],
@@ -44,7 +79,8 @@ ngram_artist_wordcloud_container = dbc.Container([
     dbc.Row(
         [
             dbc.Col(ngram_artist_wordcloud_controls, md=4),
-            dbc.Col(dcc.Graph(id='ngram-artist-wordcloud-graph-content'), md=8),
+            dbc.Col(dcc.Graph(id='ngram-artist-wordcloud-graph-content',
+                              figure=ngram_artist_wordcloud_figure(initial_ngram_artist)), md=8),
         ],
         align="center",
     ),
@@ -52,65 +88,23 @@ ngram_artist_wordcloud_container = dbc.Container([
 
 
 def get_ngram_artist_wordcloud_callbacks(app):
+    # one callback for the genre -> artist options -> artist -> graph chain,
+    # a genre change selects its first artist and redraws in the same round trip
     @app.callback(
         [
+            Output('ngram-wordcloud-artist-selection-dynamic', 'options'),
+            Output('ngram-wordcloud-artist-selection-dynamic', 'value'),
             Output('ngram-artist-wordcloud-graph-content', 'figure'),
         ],
         [
             Input('ngram-wordcloud-genre-selection', 'value'),
             Input('ngram-wordcloud-artist-selection-dynamic', 'value'),
-        ]
+        ],
+        prevent_initial_call=True
     )
     def update_ngram_artist_wordcloud_graph(genre, artist):
-        artist_df = artist_ngrams_df[artist_ngrams_df['Artist'] == artist]
-        # create wordclouds for all ngram lens
-
-        ngram_lens = [2,3,4]
-        ngrams_n = 20
-        n = len(ngram_lens) * ngrams_n
-
-        gram_wordclouds_fig = make_subplots(rows=3, cols=2, subplot_titles = ngram_lens)
-
-        for len_index, gram_len in enumerate(ngram_lens):
-            gram_count_cols = []
-            gram_cols = []
-            for ind in range(ngrams_n):
-                gram_cols.append(f'ngram_{gram_len}_{ind}')
-                gram_count_cols.append(f'count_{gram_len}_{ind}')
-                
-            gram_words = [artist_df[word].values[0] for word in gram_cols]
-            gram_counts = [artist_df[count].values[0] for count in gram_count_cols]
-                
-            d = {}
-            for word, count in zip(gram_words, gram_counts):
-                d[word] = count
-                
-            wordcloud = WordCloud(background_color = "white", width=800, height=400)
-            wordcloud.generate_from_frequencies(frequencies=d)
-            
-            gram_wordclouds_fig.add_trace(graph_objects.Image(z=wordcloud), row=len_index+1, col=1)
-            gram_wordclouds_fig.add_trace(graph_objects.Bar(x=gram_words, y=gram_counts, showlegend = False), row=len_index+1, col=2)
-            
-        gram_wordclouds_fig.update_layout(height = 3*400)
-        # gram_wordclouds_fig.show()
-        
-        return [gram_wordclouds_fig,]
-
-    # ========= set available artist options based on chosen genre =========
-    @app.callback(
-        Output('ngram-wordcloud-artist-selection-dynamic', 'options'),
-        Input('ngram-wordcloud-genre-selection', 'value')
-    )
-    def set_ngram_dynamic_artist_options(genre):
-        genre_artists = list(artist_ngrams_df[artist_ngrams_df['genre'] == genre]['Artist'].unique())
-        options = [{"label": artist, "value": artist} for artist in genre_artists]
-        return options
-
-    # ======= choose from available dynamic options =========
-    @app.callback(
-        Output('ngram-wordcloud-artist-selection-dynamic', 'value'),
-        Input('ngram-wordcloud-artist-selection-dynamic', 'options')
-    )
-    def set_ngram_dynamic_artist_value(options):
-        return options[0]['value']
-    
+        if ctx.triggered_id == 'ngram-wordcloud-genre-selection':
+            options = ngram_artist_options(genre)
+            artist = options[0]['value']
+            return [options, artist, ngram_artist_wordcloud_figure(artist)]
+        return [no_update, no_update, ngram_artist_wordcloud_figure(artist)]
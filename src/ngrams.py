@@ -0,0 +1,261 @@
+"""
+Top n-grams of any grouping of songs (artist, genre, decade, ...)
+
+artist_ngrams.csv / genre_ngrams.csv were made offline by a notebook.
+top_ngrams() recomputes them from the tokenized lyrics corpus: each
+n-gram of integer token ids is turned into a 64 bit key by a rolling
+polynomial hash (the (n-1)-gram keys times the base plus the next token,
+so n = 2..max_n are computed one after another in place), n-grams
+crossing a song boundary are masked out, and the (group, key) pairs are
+counted by sorting them and taking the lengths of the runs of equal pairs. The base is the vocabulary size
+whenever vocab_size ** max_n fits in 64 bits, making the keys exact.
+The csvs were made from each artist's / genre's lyrics joined together,
+which across_songs=True reproduces (n-grams spanning two songs included).
+
+Songs are processed in chunks of about chunk_tokens tokens, in group
+order, and a group's top k is taken (and its counts dropped) as soon as
+its last song is counted, so memory is bounded by the chunk and the
+groups it spans, not the corpus. The result is a long table with one
+row per (group, n, rank), ties ranked by first occurrence like
+collections.Counter.most_common.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_cache import CACHE_DIR
+from dataframes import datasets
+# registers the lyrics_corpus dataset
+import lyrics_corpus
+
+NGRAMS_DIR = os.path.join(CACHE_DIR, 'ngrams')
+
+MAX_N = 4
+TOP_K = 20
+# tokens counted per chunk
+CHUNK_TOKENS = 2_000_000
+
+# base of the rolling hash when the vocabulary is too large for exact keys
+HASH_BASE = np.uint64(0x9E3779B97F4A7C15)
+
+
+def hash_base(vocab_size, max_n):
+    """The vocabulary size if n-gram keys in that base fit in 64 bits, else HASH_BASE"""
+    return np.uint64(vocab_size) if vocab_size ** max_n < 2**64 else HASH_BASE
+
+
+def gather_songs(token_ids, offsets, songs):
+    """Global token positions of the given songs, concatenated, and the songs' local offsets"""
+    starts = offsets[songs]
+    lengths = offsets[songs + 1] - starts
+    local_offsets = np.zeros(len(songs) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=local_offsets[1:])
+    positions = np.arange(local_offsets[-1], dtype=np.int64) + np.repeat(starts - local_offsets[:-1],
+                                                                         lengths)
+    return positions, local_offsets
+
+
+def segment_ends(segment_ids):
+    """For each token, the position after the end of its run of equal segment ids"""
+    ends = np.append(np.flatnonzero(np.diff(segment_ids)) + 1, len(segment_ids))
+    return np.repeat(ends, np.diff(ends, prepend=0))
+
+
+def rolling_keys(tokens, ends, max_n, base, overlap=0):
+    """
+    (n, key of the n-gram starting at each token, mask of the n-grams
+    inside one segment) for n = 2..max_n. The first overlap tokens are the
+    end of the previous chunk, only n-grams reaching past them are counted.
+    The keys array is reused
+    """
+    keys = tokens.astype(np.uint64)
+    starts = np.arange(len(tokens))
+    for n in range(2, max_n + 1):
+        shift = n - 1
+        keys[:-shift] = keys[:-shift] * base + tokens[shift:].astype(np.uint64)
+        yield n, keys, (starts + n <= ends) & (starts + n > overlap)
+
+
+def run_starts(*columns):
+    """Indices where any of the (sorted) columns changes value, from 0"""
+    changed = np.zeros(len(columns[0]), dtype=bool)
+    changed[:1] = True
+    for column in columns:
+        changed[1:] |= column[1:] != column[:-1]
+    return np.flatnonzero(changed)
+
+
+def group_sort(groups, keys):
+    """
+    Order sorting the keys within each run of equal groups (groups sorted
+    already). Sorting the runs one by one is many times faster than a
+    lexsort of both, as each run fits in the cpu caches
+    """
+    order = np.empty(len(keys), dtype=np.int64)
+    bounds = np.append(run_starts(groups), len(groups))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        order[start:end] = np.argsort(keys[start:end]) + start
+    return order
+
+
+def count_pairs(groups, keys, counts, firsts):
+    """
+    Sum the counts of equal (group, key) pairs, keeping their earliest
+    position. The arguments are arrays of the same length sorted by group,
+    the result too
+    """
+    if not len(groups):
+        return groups, keys, counts, firsts
+    order = group_sort(groups, keys)
+    groups, keys = groups[order], keys[order]
+    starts = run_starts(groups, keys)
+    return (groups[starts], keys[starts], np.add.reduceat(counts[order], starts),
+            np.minimum.reduceat(firsts[order], starts))
+
+
+def top_k(groups, counts, firsts, k):
+    """(indices, ranks) of the top k pairs of each group by count, ties by first occurrence"""
+    # most n-grams are used once, those only matter in groups without k repeated ones
+    repeated = counts > 1
+    candidates = np.flatnonzero(repeated | (np.bincount(groups[repeated], minlength=groups.max() + 1)
+                                            < k)[groups])
+    order = candidates[np.lexsort((firsts[candidates], -counts[candidates], groups[candidates]))]
+    starts = run_starts(groups[order])
+    ranks = np.arange(len(order)) - np.repeat(starts, np.diff(np.append(starts, len(order))))
+    top = ranks < k
+    return order[top], ranks[top]
+
+
+def top_ngrams(corpus, by, max_n=MAX_N, k=TOP_K, chunk_tokens=CHUNK_TOKENS, songs=None,
+               across_songs=False):
+    """
+    Long table of the top k n-grams (n = 2..max_n) of the groups of the
+    corpus songs by the meta column(s) by, e.g. 'Artist' or ['genre', 'decade'],
+    optionally of the songs of a select() mask only. Songs with a missing
+    group value are left out. With across_songs, the songs of a group are
+    joined in corpus order, like the csvs.
+
+    Columns: the by columns, n, rank, ngram (space-joined words), count
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    # ngroup() gives NaN to the songs missing a group value, -1 leaves them out below
+    song_groups = corpus.meta.groupby(by, observed=True, sort=True, dropna=True).ngroup() \
+        .fillna(-1).to_numpy(np.int64)
+    group_labels = corpus.meta[by].assign(group=song_groups).drop_duplicates('group') \
+        .set_index('group').sort_index()
+    if songs is not None:
+        song_groups = np.where(songs, song_groups, -1)
+    order = np.flatnonzero(song_groups >= 0)
+    order = order[np.argsort(song_groups[order], kind='stable')]
+
+    base = hash_base(len(corpus.vocab), max_n)
+    # (groups, keys, counts, firsts) of the groups the next chunks may add to
+    empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint64),
+             np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    pending = {n: empty for n in range(2, max_n + 1)}
+    results = []
+    song_lengths = np.diff(corpus.offsets)[order]
+    chunk_ends = np.searchsorted(np.cumsum(song_lengths), np.arange(chunk_tokens, song_lengths.sum(),
+                                                                    chunk_tokens), side='right')
+    chunks = [chunk for chunk in np.split(order, np.unique(chunk_ends)) if len(chunk)]
+    tail_positions = tail_groups = np.zeros(0, dtype=np.int64)
+    for chunk_index, chunk in enumerate(chunks):
+        positions, local_offsets = gather_songs(corpus.token_ids, corpus.offsets, chunk)
+        lengths = np.diff(local_offsets)
+        token_groups = np.repeat(song_groups[chunk], lengths)
+        if across_songs:
+            # n-grams end at group boundaries only, and the last tokens of
+            # the previous chunk are kept for the n-grams spanning both
+            positions = np.concatenate([tail_positions, positions])
+            token_groups = np.concatenate([tail_groups, token_groups])
+            overlap = len(tail_positions)
+            ends = segment_ends(token_groups)
+            tail_positions, tail_groups = positions[-(max_n - 1):], token_groups[-(max_n - 1):]
+        else:
+            overlap = 0
+            ends = segment_ends(np.repeat(np.arange(len(chunk)), lengths))
+        tokens = corpus.token_ids[positions]
+        # groups before the last one of the chunk won't get any more songs
+        last_group = song_groups[chunk[-1]] if chunk_index < len(chunks) - 1 else np.inf
+        for n, keys, valid in rolling_keys(tokens, ends, max_n, base, overlap):
+            groups, keys, counts, firsts = count_pairs(
+                *(np.concatenate(columns) for columns in zip(
+                    pending[n], (token_groups[valid], keys[valid],
+                                 np.ones(valid.sum(), dtype=np.int64), positions[valid]))))
+            complete = groups < last_group
+            if complete.any():
+                top, ranks = top_k(groups[complete], counts[complete], firsts[complete], k)
+                results.append(pd.DataFrame({'group': groups[complete][top], 'n': n, 'rank': ranks,
+                                             'count': counts[complete][top],
+                                             'first': firsts[complete][top]}))
+            pending[n] = tuple(column[~complete] for column in (groups, keys, counts, firsts))
+
+    if not results:
+        return pd.DataFrame(columns=[*by, 'n', 'rank', 'ngram', 'count'])
+    top = pd.concat(results, ignore_index=True)
+    words = np.stack([corpus.token_ids[np.minimum(top['first'].to_numpy() + shift,
+                                                  len(corpus.token_ids) - 1)]
+                      for shift in range(max_n)], axis=1)
+    vocab = corpus.vocab
+    top['ngram'] = [' '.join(vocab[word_ids[:n]]) for word_ids, n in zip(words, top['n'])]
+    labels = group_labels.loc[top['group']].reset_index(drop=True)
+    table = pd.concat([labels, top[['n', 'rank', 'ngram', 'count']]], axis=1)
+    table = table.astype(
+        {'n': np.int8, 'rank': np.int16, 'count': np.int64, 'ngram': 'string'})
+    for column in by:
+        table[column] = table[column].astype('category')
+    return table.sort_values([*by, 'n', 'rank'], kind='stable').reset_index(drop=True)
+
+
+def wide_table(long, by):
+    """
+    The layout of artist_ngrams.csv from a top_ngrams table: the ngram_{n}
+    lists of ((words), count) tuples and the ngram_{n}_{rank} / count_{n}_{rank} columns.
+    By Artist, the artists' genre and gender of artist_info follow, like in the csv
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    rows = []
+    for group, group_top in long.groupby(by, observed=True, sort=False):
+        row = dict(zip(by, group if isinstance(group, tuple) else (group,)))
+        by_n = list(group_top.groupby('n', sort=True))
+        for n, n_top in by_n:
+            row[f'ngram_{n}'] = repr([(tuple(ngram.split()), int(count))
+                                      for ngram, count in zip(n_top['ngram'], n_top['count'])])
+        for n, n_top in by_n:
+            for rank, ngram in zip(n_top['rank'], n_top['ngram']):
+                row[f'ngram_{n}_{rank}'] = ngram
+        for n, n_top in by_n:
+            for rank, count in zip(n_top['rank'], n_top['count']):
+                row[f'count_{n}_{rank}'] = count
+        rows.append(row)
+    wide = pd.DataFrame(rows)
+    if by == ['Artist']:
+        artist_info = datasets.artist_info.drop_duplicates('Artist')[['Artist', 'genre', 'gender']]
+        wide = artist_info.merge(wide, on='Artist', how='right')
+    return wide
+
+
+def ngrams_path(by, extension='parquet'):
+    by = [by] if isinstance(by, str) else list(by)
+    return os.path.join(NGRAMS_DIR, f'{"_".join(by).lower()}.{extension}')
+
+
+def build_ngrams(by, max_n=MAX_N, k=TOP_K, chunk_tokens=CHUNK_TOKENS, store=None,
+                 across_songs=False, wide=False):
+    """
+    Write the top n-grams table of a grouping, of the songs of one song table
+    if store is given, and optionally the same in the layout of
+    artist_ngrams.csv. Returns the paths written
+    """
+    corpus = datasets.lyrics_corpus
+    songs = None if store is None else corpus.select(store=store)
+    table = top_ngrams(corpus, by, max_n, k, chunk_tokens, songs=songs,
+                       across_songs=across_songs)
+    os.makedirs(NGRAMS_DIR, exist_ok=True)
+    paths = [ngrams_path(by)]
+    table.to_parquet(paths[0])
+    if wide:
+        paths.append(ngrams_path(by, 'csv'))
+        wide_table(table, by).to_csv(paths[1])
+    return paths
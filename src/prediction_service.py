@@ -0,0 +1,196 @@
+"""
+Batch prediction endpoints of the ML section models, with micro-batching
+
+serve_predictions(app, pipelines) adds a POST /predict/{name} route to
+app.server for each trained pipeline. A request's body is a JSON list of
+rows (or {"rows": [...]}), each an object with the columns the model was
+trained on - counts_classif_cols without the target - and the response
+is {"predictions": [...]}, one per row.
+
+Requests are handled on the server's threads, each one only validating
+its rows and queueing them. One worker thread per model takes everything
+queued within max_wait seconds of the first request (up to max_batch
+rows), runs a single vectorized predict over all of it and hands each
+request its slice, so concurrent requests cost one pipeline call instead
+of one each. Latency, rows per batch and requests per batch of the recent
+requests are served as JSON at /predict/stats.
+
+Each worker process batches its own requests.
+"""
+import collections
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from flask import jsonify, request
+
+# seconds a batch waits for more requests after its first one
+MAX_WAIT = 0.005
+MAX_BATCH = 4096
+# requests / batches the stats are computed over
+STATS_WINDOW = 10_000
+
+
+class BadRows(ValueError):
+    """Rows a model can't predict on, reported back as a 400"""
+
+
+def pipeline_columns(pipeline):
+    """(numerical, categorical) input columns of a fitted model_evaluation pipeline"""
+    transformers = {name: columns
+                    for name, _, columns in pipeline.named_steps['preprocessor'].transformers_}
+    return list(transformers.get('num', [])), list(transformers.get('cat', []))
+
+
+def rows_frame(rows, numerical_cols, categorical_cols):
+    """DataFrame of JSON rows with the model's columns, in its order and dtypes"""
+    if isinstance(rows, dict):
+        rows = rows.get('rows')
+    if not isinstance(rows, list) or not rows or not all(isinstance(row, dict) for row in rows):
+        raise BadRows('expected a non-empty list of row objects, or {"rows": [...]}')
+    frame = pd.DataFrame.from_records(rows)
+    columns = [*numerical_cols, *categorical_cols]
+    missing = [column for column in columns if column not in frame.columns]
+    if missing:
+        raise BadRows(f'rows are missing the columns: {missing}')
+    frame = frame[columns].copy()
+    try:
+        for column in numerical_cols:
+            frame[column] = pd.to_numeric(frame[column]).astype(np.float64)
+    except (TypeError, ValueError) as error:
+        raise BadRows(f'non-numeric value in {column}: {error}')
+    if frame[numerical_cols].isna().any().any() or frame[categorical_cols].isna().any().any():
+        raise BadRows('rows have null values')
+    for column in categorical_cols:
+        frame[column] = frame[column].astype(str)
+    return frame
+
+
+class PendingRequest:
+    def __init__(self, rows):
+        self.rows = rows
+        self.submitted = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Runs predict once over the rows of all the requests submitted within
+    max_wait seconds of the first one, up to max_batch rows
+    """
+    def __init__(self, predict, max_wait=MAX_WAIT, max_batch=MAX_BATCH):
+        self.predict = predict
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.latency = collections.deque(maxlen=STATS_WINDOW)
+        self.batch_rows = collections.deque(maxlen=STATS_WINDOW)
+        self.batch_requests = collections.deque(maxlen=STATS_WINDOW)
+        self.totals = {'requests': 0, 'rows': 0, 'batches': 0, 'errors': 0}
+        self._queue = collections.deque()
+        self._ready = threading.Condition()
+        self._worker = None
+
+    def submit(self, rows):
+        """Predictions of a DataFrame of rows, once its batch has run"""
+        pending = PendingRequest(rows)
+        with self._ready:
+            # started on first use, so a server forking its workers after import gets one each
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+            self._queue.append(pending)
+            self._ready.notify()
+        pending.done.wait()
+        with self._ready:
+            self.latency.append(time.perf_counter() - pending.submitted)
+            self.totals['requests'] += 1
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _next_batch(self):
+        with self._ready:
+            self._ready.wait_for(lambda: self._queue)
+            batch = [self._queue.popleft()]
+            n_rows = len(batch[0].rows)
+            deadline = time.perf_counter() + self.max_wait
+            while n_rows < self.max_batch:
+                if not self._queue:
+                    timeout = deadline - time.perf_counter()
+                    if timeout <= 0 or not self._ready.wait_for(lambda: self._queue, timeout):
+                        break
+                batch.append(self._queue.popleft())
+                n_rows += len(batch[-1].rows)
+        return batch, n_rows
+
+    def _run(self):
+        while True:
+            batch, n_rows = self._next_batch()
+            try:
+                rows = batch[0].rows if len(batch) == 1 else pd.concat(
+                    [pending.rows for pending in batch], ignore_index=True)
+                predictions = self.predict(rows)
+            except Exception as error:
+                for pending in batch:
+                    pending.error = error
+            else:
+                start = 0
+                for pending in batch:
+                    pending.result = predictions[start:start + len(pending.rows)]
+                    start += len(pending.rows)
+            with self._ready:
+                self.batch_rows.append(n_rows)
+                self.batch_requests.append(len(batch))
+                self.totals['rows'] += n_rows
+                self.totals['batches'] += 1
+                self.totals['errors'] += sum(pending.error is not None for pending in batch)
+            for pending in batch:
+                pending.done.set()
+
+    def stats(self):
+        with self._ready:
+            latency = np.array(self.latency) * 1000
+            batch_rows = np.array(self.batch_rows)
+            batch_requests = np.array(self.batch_requests)
+            totals = dict(self.totals)
+        if not len(latency) or not len(batch_rows):
+            return totals
+        return {
+            **totals,
+            'latency_ms': {f'p{q}': float(np.percentile(latency, q)) for q in (50, 95, 99)},
+            'rows_per_batch': {'mean': float(batch_rows.mean()), 'max': int(batch_rows.max())},
+            'requests_per_batch': {'mean': float(batch_requests.mean()),
+                                   'max': int(batch_requests.max())},
+        }
+
+
+def json_values(predictions):
+    return predictions.tolist() if isinstance(predictions, np.ndarray) else list(predictions)
+
+
+def serve_predictions(app, pipelines, max_wait=MAX_WAIT, max_batch=MAX_BATCH):
+    """
+    Add the /predict/{name} route of each {name: fitted pipeline} and
+    /predict/stats to app.server. Returns the {name: MicroBatcher}
+    """
+    batchers = {}
+    for name, pipeline in pipelines.items():
+        numerical_cols, categorical_cols = pipeline_columns(pipeline)
+        batcher = batchers[name] = MicroBatcher(pipeline.predict, max_wait, max_batch)
+
+        def predict(batcher=batcher, numerical_cols=numerical_cols,
+                    categorical_cols=categorical_cols):
+            try:
+                rows = rows_frame(request.get_json(silent=True), numerical_cols, categorical_cols)
+            except BadRows as error:
+                return jsonify({'error': str(error)}), 400
+            return jsonify({'predictions': json_values(batcher.submit(rows))})
+
+        app.server.add_url_rule(f'/predict/{name}', f'predict_{name}', predict, methods=['POST'])
+
+    app.server.add_url_rule('/predict/stats', 'predict_stats', lambda: jsonify(
+        {name: batcher.stats() for name, batcher in batchers.items()}))
+    return batchers
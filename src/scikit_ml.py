@@ -28,49 +28,39 @@ from sklearn.linear_model import LinearRegression
 from xgboost.sklearn import XGBRegressor
 from sklearn.svm import SVR
 
-import matplotlib.pyplot as plt
-
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-
 from dataframes import (
-    counts_df,
-    genre_mean_df,
-    artist_mean_df,
-    decade_counts_df,
-    decade_mean_df
+    counts_df
 )
+from feature_importance import importance_report, report_key, N_REPEATS
+from figure_snapshots import figure_snapshot
+from lyrics_store import song_lyrics
+from model_artifacts import load_or_train
+from model_evaluation import build_pipeline, cross_validate_target, N_SPLITS, RANDOM_STATE
+from startup_profiler import profiled_block
+from lyrics_classifier import train_lyrics_genre, lyrics_params
 
 # ---------------------------------------------------------------------------- #
 #                     columns to be considered for ML tasks                    #
 # ---------------------------------------------------------------------------- #
 
-counts_classif_cols = ['Year',
-                      'Pageviews', 'featured_count', 'producer_count', 'writer_count',
-                      'gender', 'genre', 'unique_words', 'total_words', 
-                       'manual_love_count',
-                       'manual_money_count', 'manual_violence_count', 'manual_drugs_count',
-                       'manual_gendered_count', 'manual_sadness_count', 'manual_joy_count',
-                       'manual_yes_count', 'manual_no_count',
-                       'sentiment', 'emotion'
-                      ]
-counts_classif_cols_no_gender = [col for col in counts_classif_cols if col != 'gender']
-counts_classif_cols_no_genre = [col for col in counts_classif_cols if col != 'genre']
-counts_classif_cols_no_sentiment = [col for col in counts_classif_cols if col != 'sentiment']
-counts_classif_cols_no_emotion = [col for col in counts_classif_cols if col != 'emotion']
+# the column sets live with their encoded design matrices, see feature_store
+from feature_store import (
+    column_set_frame, counts_classif_cols, counts_classif_cols_no_gender,
+    counts_classif_cols_no_genre, counts_classif_cols_no_sentiment, counts_classif_cols_no_emotion,
+)
 
 # cleanup
-classif_counts_df = counts_df[[*counts_classif_cols]]
-classif_counts_df.dropna(inplace=True)
+classif_counts_df = column_set_frame('counts_classif_cols')
 
 # ---------------------------------------------------------------------------- #
 #                            model training function                           #
 # ---------------------------------------------------------------------------- #
 
-def train_classify_target(df, target_col, model, train_size=0.8, task='class'):
+def train_classify_target(df, target_col, model, train_size=0.8, task='class',
+                          random_state=RANDOM_STATE):
     """
     Takes a dataframe, target column and model,
-    plus optionally train_size and tak
+    plus optionally train_size, task and the seed of the split
     
     if task set to 'class' will calculate classification metrics
     if task set to 'regr' will calculate regression metrics!
@@ -80,42 +70,25 @@ def train_classify_target(df, target_col, model, train_size=0.8, task='class'):
     calculates accuracy, f1, confusion matrix metrics,
     returns the trained model and metrics
 
+    For metrics averaged over k folds, see model_evaluation.cross_validate_target
+
     Caveats:
         * Expects a df without NaNs, you have to choose columns / rows to drop / keep first
         * The pipeline could be expanded
 
     To be expanded:
         * right now takes model, could possibly take model_type and hyperparams
+          (python build.py search finds hyperparams for the page models, see model_search)
     
     """
     y = df[target_col]
     X = df.drop([target_col], axis=1)
 
-    X_train, X_valid, y_train, y_valid = train_test_split(X, y, train_size=train_size, test_size=(1-train_size))
-
-    categorical_cols = [cname for cname in X_train.columns if X_train[cname].dtype == "object"]
-    numerical_cols = [cname for cname in X_train.columns if X_train[cname].dtype in ['int64', 'float64']]
+    X_train, X_valid, y_train, y_valid = train_test_split(X, y, train_size=train_size, test_size=(1-train_size),
+                                                          random_state=random_state)
 
-    # Preprocessing transformers
-    numerical_transformer = StandardScaler()
-    
-    categorical_transformer = Pipeline(steps=[
-        ('onehot', OneHotEncoder(handle_unknown='ignore')),
-    ])
-
-    # combined preprocessor
-    preprocessor = ColumnTransformer(
-        transformers = [
-            ('num', numerical_transformer, numerical_cols),
-            ('cat', categorical_transformer, categorical_cols)
-        ]
-    )
-
-    # Bundle preprocessing and modeling code in a pipeline
-    train_pipeline = Pipeline(steps=[
-        ('preprocessor', preprocessor),
-        ('model', model)
-    ])
+    # Bundle preprocessing (scaling, one-hot-encoding) and modeling code in a pipeline
+    train_pipeline = build_pipeline(X_train, model)
     
     # Preprocessing of training data, fit model 
     train_pipeline.fit(X_train, y_train)
@@ -157,6 +130,9 @@ def train_classify_target(df, target_col, model, train_size=0.8, task='class'):
     
 
 def save_confusion_matrix(cm, labels, exp_name):
+    # only needed when training, so kept out of the app's import time
+    import matplotlib.pyplot as plt
+
     disp = ConfusionMatrixDisplay(confusion_matrix = cm,
                              display_labels=labels
                              )
@@ -169,27 +145,39 @@ def save_confusion_matrix(cm, labels, exp_name):
 #                        classify for genre by counts_df                       #
 # ---------------------------------------------------------------------------- #
     
-counts_genre_model = SVC()
-counts_genre_results = train_classify_target(
-    df = classif_counts_df,
-    target_col = 'genre',
-    model = counts_genre_model
+def train_counts_genre():
+    counts_genre_model = SVC()
+    results = train_classify_target(
+        df = classif_counts_df,
+        target_col = 'genre',
+        model = counts_genre_model
+    )
+    save_confusion_matrix(cm = results['cm'],
+                          labels = results['labels'],
+                          exp_name="counts_genre_cm"
+                          )
+    return results
+
+# trained once and loaded from models/ afterwards, until the data changes
+counts_genre_results = load_or_train(
+    'counts_genre', classif_counts_df, train_counts_genre,
+    params = {'target_col': 'genre', 'model': repr(SVC()), 'train_size': 0.8, 'task': 'class',
+              'random_state': RANDOM_STATE}
 )
 
+# the same model scored over k folds, fitted in parallel the first time and cached after
+counts_genre_cv = cross_validate_target(classif_counts_df, 'genre', SVC())
+
 # print("acc: ", counts_genre_results['acc'], "f1: ", counts_genre_results['f1'])
 
 test_index = counts_genre_results['X_valid'].head(1).index
 
-test_counts_slice = counts_df.loc[test_index, ['Artist', 'Song Title', 'Song Lyrics', 'genre']]
+test_counts_slice = counts_df.loc[test_index, ['Artist', 'Song Title', 'genre']]
+test_counts_slice.insert(2, 'Song Lyrics', song_lyrics('counts', test_index))
 test_X_valid = counts_genre_results['X_valid'].loc[test_index, :]
 counts_genre_pred = counts_genre_results['train_pipeline'].predict(
     counts_genre_results['X_valid'].loc[test_index, :])
 
-save_confusion_matrix(cm = counts_genre_results['cm'],
-                      labels = counts_genre_results['labels'],
-                      exp_name="counts_genre_cm"
-                      )
-
 # ---------------------------------------------------------------------------- #
 #                                  explanation                                 #
 # ---------------------------------------------------------------------------- #
@@ -223,7 +211,12 @@ scikit_md_1 = dcc.Markdown(
 id = 'scikit-md-1'
 )
 
-scikit_md_2 = dcc.Markdown(f'Accuracy: {counts_genre_results["acc"]}, f1 score: {counts_genre_results["f1"]}')
+scikit_md_2 = dcc.Markdown(
+    f'Accuracy: {counts_genre_results["acc"]}, f1 score: {counts_genre_results["f1"]}\n\n'
+    f'{N_SPLITS}-fold cross-validation: accuracy {counts_genre_cv["mean"]["acc"]:.3f} '
+    f'± {counts_genre_cv["std"]["acc"]:.3f}, macro f1 score {counts_genre_cv["mean"]["f1_macro"]:.3f} '
+    f'± {counts_genre_cv["std"]["f1_macro"]:.3f}'
+)
 
 scikit_ex_df_1 = dash_table.DataTable(
     test_counts_slice.to_dict('records'),
@@ -257,6 +250,112 @@ scikit_images_1 = html.Div([
     html.Img(src='assets/counts_genre_cm.png'),
 ])
 
+# ---------------------------------------------------------------------------- #
+#                    which columns the genre classifier uses                   #
+# ---------------------------------------------------------------------------- #
+
+# partial dependence shown for this many of the most important columns
+N_DEPENDENCE_PLOTS = 6
+
+def build_importance_fig():
+    # cached per column in models/importance, computed on a process pool the first time
+    importance, reports = importance_report(counts_genre_results['train_pipeline'],
+                                            counts_genre_results['X_valid'],
+                                            counts_genre_results['y_valid'])
+    importance = importance.iloc[::-1]
+    top_columns = list(importance['column'].iloc[::-1].head(N_DEPENDENCE_PLOTS))
+
+    importance_fig = make_subplots(
+        rows=3, cols=3,
+        specs=[[{'colspan': 3}, None, None], [{}, {}, {}], [{}, {}, {}]],
+        row_heights=[0.5, 0.25, 0.25],
+        vertical_spacing=0.08,
+        subplot_titles=['Permutation importance (accuracy drop)', *top_columns]
+    )
+    importance_fig.add_trace(graph_objects.Bar(
+        x=importance['importance_mean'],
+        y=importance['column'],
+        error_x={'type': 'data', 'array': importance['importance_std']},
+        orientation='h',
+        marker_color='grey',
+        showlegend=False
+    ), row=1, col=1)
+
+    colors = px.colors.qualitative.Plotly
+    labels = counts_genre_results['labels']
+    for plot_index, column in enumerate(top_columns):
+        report = reports[column]
+        for label_index, label in enumerate(labels):
+            importance_fig.add_trace(graph_objects.Scatter(
+                x=report['grid'],
+                y=report['average'][label_index],
+                mode='lines+markers',
+                name=label,
+                legendgroup=label,
+                showlegend=plot_index == 0,
+                line_color=colors[label_index % len(colors)]
+            ), row=2 + plot_index // 3, col=1 + plot_index % 3)
+
+    importance_fig.update_layout(height=1000, legend_title_text='Partial dependence, genre')
+    return importance_fig
+
+with profiled_block('scikit_ml: feature importance'):
+    # keyed on the fitted model and its validation rows too, a retrained model is a new figure
+    importance_fig = figure_snapshot(
+        'counts_genre_importance', ['counts'], build_importance_fig,
+        inputs={'importance': report_key(counts_genre_results['train_pipeline'],
+                                         counts_genre_results['X_valid'],
+                                         counts_genre_results['y_valid'])})
+
+scikit_md_importance = dcc.Markdown(
+f'''
+    Which of the engineered columns does the classifier rely on? The bar chart shows how much
+    the validation accuracy drops when one column's values are shuffled between the songs
+    (averaged over {N_REPEATS} shuffles, with their standard deviation), the line charts the
+    classifier's mean decision value for each genre when every song is given the same value
+    of one of the most important columns.
+''',
+id = 'scikit-md-importance'
+)
+
+scikit_importance_container = dbc.Container([
+    html.H3(children = 'Feature importance', style={'textAlign': 'center'}),
+    scikit_md_importance,
+    dcc.Graph(id='scikit-importance-graph',
+              figure = importance_fig)
+], fluid=True)
+
+# ---------------------------------------------------------------------------- #
+#                      classify for genre by the lyrics text                   #
+# ---------------------------------------------------------------------------- #
+
+# streamed from the lyrics store through hashed word features, see lyrics_classifier.
+# Validated on the SVC's validation songs and trained on every other song,
+# so the two models' scores below are comparable
+lyrics_valid_ids = counts_genre_results['X_valid'].index.to_numpy()
+lyrics_genre_results = load_or_train(
+    'lyrics_genre', counts_df[['genre']].dropna(),
+    lambda: train_lyrics_genre(valid_ids=lyrics_valid_ids),
+    params = lyrics_params(valid_ids=lyrics_valid_ids)
+)
+
+scikit_md_lyrics = dcc.Markdown(
+f'''
+    For comparison, a second classifier was trained on the lyrics themselves: each song's words
+    and word pairs are hashed into a sparse vector, and a linear model learns from the songs
+    in chunks, so the lyrics never have to fit in memory at once. Both are scored on the same
+    validation songs, the lyrics model trained on all the other songs.
+
+    | | Engineered features (SVC) | Lyrics text (hashed words, linear model) |
+    |---|---|---|
+    | Validation accuracy | {counts_genre_results["acc"]:.3f} | {lyrics_genre_results["acc"]:.3f} |
+    | Macro f1 score | {np.mean(counts_genre_results["f1"]):.3f} | {np.mean(lyrics_genre_results["f1"]):.3f} |
+    | Validation songs | {len(counts_genre_results["y_valid"])} | {lyrics_genre_results["n_valid"]} |
+    | Training throughput | | {lyrics_genre_results["songs_per_s"]:,.0f} songs / s |
+''',
+id = 'scikit-md-lyrics'
+)
+
 scikit_md_5 = dcc.Markdown(
 '''
     For this example the built-in scikit-learn Support Vector Classifier was used as model, with default parameters.
@@ -300,23 +399,37 @@ scikit_md_6 = dcc.Markdown(
 id = 'scikit-md-6'
 )
 
-counts_unique_model = SVR()
-counts_unique_results = train_classify_target(
-    df = classif_counts_df,
-    target_col = 'unique_words',
-    model = counts_unique_model,
-    task = 'regr'
+def train_counts_unique():
+    counts_unique_model = SVR()
+    return train_classify_target(
+        df = classif_counts_df,
+        target_col = 'unique_words',
+        model = counts_unique_model,
+        task = 'regr'
+    )
+
+counts_unique_results = load_or_train(
+    'counts_unique_words', classif_counts_df, train_counts_unique,
+    params = {'target_col': 'unique_words', 'model': repr(SVR()), 'train_size': 0.8, 'task': 'regr',
+              'random_state': RANDOM_STATE}
 )
 
+counts_unique_cv = cross_validate_target(classif_counts_df, 'unique_words', SVR(), task='regr')
+
 regr_test_index = counts_unique_results['X_valid'].head(1).index
 
-regr_test_counts_slice = counts_df.loc[regr_test_index, ['Artist', 'Song Title', 'Song Lyrics', 'unique_words']]
+regr_test_counts_slice = counts_df.loc[regr_test_index, ['Artist', 'Song Title', 'unique_words']]
+regr_test_counts_slice.insert(2, 'Song Lyrics', song_lyrics('counts', regr_test_index))
 regr_test_X_valid = counts_unique_results['X_valid'].loc[regr_test_index, :]
 counts_unique_pred = counts_unique_results['train_pipeline'].predict(
     counts_unique_results['X_valid'].loc[regr_test_index, :])
 
-scikit_md_7 = dcc.Markdown(f'MAE: {counts_unique_results["mae"]}, \
-                            r2 score: {counts_unique_results["r2"]}')
+scikit_md_7 = dcc.Markdown(
+    f'MAE: {counts_unique_results["mae"]}, r2 score: {counts_unique_results["r2"]}\n\n'
+    f'{N_SPLITS}-fold cross-validation: MAE {counts_unique_cv["mean"]["mae"]:.2f} '
+    f'± {counts_unique_cv["std"]["mae"]:.2f}, r2 score {counts_unique_cv["mean"]["r2"]:.3f} '
+    f'± {counts_unique_cv["std"]["r2"]:.3f}'
+)
 
 scikit_ex_df_3 = dash_table.DataTable(
     regr_test_counts_slice.to_dict('records'),
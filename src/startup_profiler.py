@@ -0,0 +1,176 @@
+"""
+Startup profiling of the app: python app.py --profile-startup
+
+Most of the app's work happens as import side effects of the section
+modules (figures, wordclouds, correlation matrices, models). In profiling
+mode every module import and every block marked with profiled_block() is
+timed, with the RSS growth over it, and a report sorted by cost is printed
+instead of starting the server. --profile-output also dumps a cProfile
+stats file of the whole startup (snakeviz, or python -m pstats).
+
+When profiling isn't on, profiled_block() does nothing.
+"""
+import argparse
+import cProfile
+import importlib.abc
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_profiler = None
+
+
+def rss_mb():
+    """Current resident set size of this process (peak RSS where /proc is missing)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class TimedLoader(importlib.abc.Loader):
+    """Wraps a module loader, timing the execution of the module"""
+    def __init__(self, loader, profiler):
+        self.loader = loader
+        self.profiler = profiler
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        with self.profiler.measure('import', module.__name__):
+            self.loader.exec_module(module)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """Meta path finder handing out timed loaders for every module imported"""
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = TimedLoader(spec.loader, self.profiler)
+                return spec
+        return None
+
+
+class StartupProfiler:
+    """
+    Wall time and RSS growth of imports and marked blocks.
+    Time spent in nested imports / blocks is subtracted from the self time
+    """
+    def __init__(self):
+        self.records = []
+        self._stack = []
+        self.start_time = time.perf_counter()
+        self.start_rss = rss_mb()
+
+    @contextmanager
+    def measure(self, kind, name):
+        start, start_rss = time.perf_counter(), rss_mb()
+        self._stack.append(0.0)
+        try:
+            yield
+        finally:
+            total = time.perf_counter() - start
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += total
+            self.records.append({
+                'kind': kind,
+                'name': name,
+                'total_s': total,
+                'self_s': total - children,
+                'rss_mb': rss_mb() - start_rss,
+                'local': kind == 'block' or self.is_local(name),
+            })
+
+    @staticmethod
+    def is_local(module_name):
+        module = sys.modules.get(module_name)
+        path = getattr(module, '__file__', None) or ''
+        return os.path.dirname(os.path.abspath(path)) == SRC_DIR
+
+    def report(self, top=25):
+        """Sorted report of the app's own modules and blocks, then the heaviest other imports"""
+        total = time.perf_counter() - self.start_time
+        lines = [f'startup: {total:.2f}s, RSS +{rss_mb() - self.start_rss:.1f} MB', '']
+
+        def table(title, records):
+            lines.append(title)
+            lines.append(f'  {"name":<45}{"self [s]":>10}{"total [s]":>11}{"RSS [MB]":>10}')
+            for record in records:
+                lines.append(f'  {record["name"]:<45}{record["self_s"]:>10.3f}'
+                             f'{record["total_s"]:>11.3f}{record["rss_mb"]:>10.1f}')
+            lines.append('')
+
+        by_self_time = sorted(self.records, key=lambda record: record['self_s'], reverse=True)
+        table('app modules', [r for r in by_self_time if r['kind'] == 'import' and r['local']])
+        table('blocks', [r for r in by_self_time if r['kind'] == 'block'])
+        table(f'other imports (top {top})',
+              [r for r in by_self_time if r['kind'] == 'import' and not r['local']][:top])
+
+        from dataframes import datasets
+        stats = datasets.load_stats()
+        lines.append('datasets loaded')
+        for name, row in stats.sort_values('load_time_s', ascending=False).iterrows():
+            lines.append(f'  {name:<45}{row["load_time_s"]:>10.3f}{"":>11}{row["memory_mb"]:>10.1f}')
+        return '\n'.join(lines)
+
+
+@contextmanager
+def profiled_block(name):
+    """Mark an expensive top level block of a module for the startup report"""
+    if _profiler is None:
+        yield
+        return
+    with _profiler.measure('block', name):
+        yield
+
+
+def start(argv=None):
+    """
+    Start profiling if --profile-startup is in argv (sys.argv by default).
+    Returns the parsed profiling options, or None if not profiling
+    """
+    global _profiler
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--profile-startup', action='store_true')
+    parser.add_argument('--profile-output', default=None,
+                        help='file to dump the cProfile stats of the startup to')
+    parser.add_argument('--profile-top', type=int, default=25,
+                        help='number of third party imports in the report')
+    options, _ = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+    if not options.profile_startup:
+        return None
+
+    _profiler = StartupProfiler()
+    sys.meta_path.insert(0, ImportTimer(_profiler))
+    if options.profile_output:
+        options.cprofile = cProfile.Profile()
+        options.cprofile.enable()
+    return options
+
+
+def finish(options):
+    """Stop profiling and print the report"""
+    if getattr(options, 'cprofile', None) is not None:
+        options.cprofile.disable()
+        options.cprofile.dump_stats(options.profile_output)
+    sys.meta_path[:] = [finder for finder in sys.meta_path if not isinstance(finder, ImportTimer)]
+    print(_profiler.report(top=options.profile_top))
+    if options.profile_output:
+        print(f'\ncProfile stats written to {options.profile_output}')
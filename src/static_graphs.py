@@ -6,16 +6,14 @@ import plotly.express as px
 from plotly.subplots import make_subplots
 import plotly.graph_objects as graph_objects
 
-from wordcloud import WordCloud
+from wordcloud_assets import wordcloud_url, add_wordcloud_image
+from startup_profiler import profiled_block
+from figure_snapshots import figure_snapshot
 
 from dataframes import (
-    counts_df,
-    artist_mean_df,
-    genre_sentiment_counts_df, artist_sentiment_counts_df,
-    top_20_filtered_words_genre_df, top_20_filtered_words_artist_df,
+    datasets,
     meta_columns, topics, genres, artists,
     word_cols, count_cols,
-    tsne_df
 )
 
 # ---------------------------------------------------------------------------- #
@@ -25,19 +23,24 @@ from dataframes import (
 to_corr = ['Year', 'Month', 'Day', 'Pageviews', *meta_columns, *topics]
 pio.templates.default = "plotly_white"
 
-corr = counts_df[to_corr].corr()
+def build_corr_fig():
+    corr = datasets.counts[to_corr].corr()
 
-corr_map = graph_objects.Heatmap(
-    z = corr,
-    x=corr.columns,
-    y=corr.columns,
-    colorscale=px.colors.diverging.RdBu,
-    zmin=-1,
-    zmax=1
-)
+    corr_map = graph_objects.Heatmap(
+        z = corr,
+        x=corr.columns,
+        y=corr.columns,
+        colorscale=px.colors.diverging.RdBu,
+        zmin=-1,
+        zmax=1
+    )
+
+    corr_fig = graph_objects.Figure()
+    corr_fig.add_trace(corr_map)
+    return corr_fig
 
-corr_fig = graph_objects.Figure()
-corr_fig.add_trace(corr_map)
+with profiled_block('static_graphs: correlation matrix'):
+    corr_fig = figure_snapshot('corr', ['counts'], build_corr_fig)
 
 
 corr_container = dbc.Container([
@@ -52,39 +55,44 @@ corr_container = dbc.Container([
 # ---------------------------------------------------------------------------- #
 
 #artist_mean_df
-topic_cols = [col for col in list(artist_mean_df.columns) if col.endswith('percent')]
-topic_cols_no_gendered = [col for col in topic_cols if not 'gendered' in col]
-
-gender_grouped = artist_mean_df[['gender', *topic_cols]].groupby(['gender']).mean()
-female_row = gender_grouped.loc['female', :]
-female_row = female_row * -1
-
-male_row = gender_grouped.loc['male', :]
-
-topic_spine_fig = graph_objects.Figure(
-    data = [
-        graph_objects.Bar(name='male',
-                          y = topic_cols_no_gendered,
-                          x = male_row.tolist(),
-                          orientation='h',
-                          marker=dict(color='#DD5555',
-                                     line=dict(
-                                     color='rgba(0,0,0,1.0)', width=0.5)),
-                          hoverinfo='none'
-                         ),
-        graph_objects.Bar(name='female',
-                  y = topic_cols_no_gendered,
-                  x = female_row.tolist(),
-                  orientation='h',
-                  marker=dict(color='#5555DD',
-                             line=dict(
-                             color='rgba(0,0,0,1.0)', width=0.5)),
-                  hoverinfo='none'
-                 ),
+def build_topic_spine_fig():
+    artist_mean_df = datasets.artist_mean
+    topic_cols = [col for col in list(artist_mean_df.columns) if col.endswith('percent')]
+    topic_cols_no_gendered = [col for col in topic_cols if not 'gendered' in col]
+
+    gender_grouped = artist_mean_df[['gender', *topic_cols]].groupby(['gender']).mean()
+    female_row = gender_grouped.loc['female', :]
+    female_row = female_row * -1
+
+    male_row = gender_grouped.loc['male', :]
+
+    topic_spine_fig = graph_objects.Figure(
+        data = [
+            graph_objects.Bar(name='male',
+                              y = topic_cols_no_gendered,
+                              x = male_row.tolist(),
+                              orientation='h',
+                              marker=dict(color='#DD5555',
+                                         line=dict(
+                                         color='rgba(0,0,0,1.0)', width=0.5)),
+                              hoverinfo='none'
+                             ),
+            graph_objects.Bar(name='female',
+                      y = topic_cols_no_gendered,
+                      x = female_row.tolist(),
+                      orientation='h',
+                      marker=dict(color='#5555DD',
+                                 line=dict(
+                                 color='rgba(0,0,0,1.0)', width=0.5)),
+                      hoverinfo='none'
+                     ),
         
-    ],
-)
-topic_spine_fig.update_layout(barmode='relative')
+        ],
+    )
+    topic_spine_fig.update_layout(barmode='relative')
+    return topic_spine_fig
+
+topic_spine_fig = figure_snapshot('topic_spine', ['artist_mean'], build_topic_spine_fig)
 
 topic_spine_container = dbc.Container([
     html.H3(children = 'Topic mentions comparison between male and female artist', style={'textAlign': 'center'}),
@@ -97,54 +105,60 @@ topic_spine_container = dbc.Container([
 # ---------------------------------------------------------------------------- #
 #       static spine graph for positive / negative genre and artist split      #
 # ---------------------------------------------------------------------------- #
-genre_positives = list(genre_sentiment_counts_df['positive'])
-genre_negatives = list(genre_sentiment_counts_df['negative'])
-genre_negatives = [-1 * neg for neg in genre_negatives]
-genre_neutrals_negative = [-1 * neutral/2 for neutral in genre_sentiment_counts_df['neutral']]
-genre_neutrals_positive = [neutral/2 for neutral in genre_sentiment_counts_df['neutral']]
-
-genre_sentiment_spine_fig = graph_objects.Figure(
-    data = [
-        graph_objects.Bar(name='Neutral',
-                          y=genres,
-                          x = genre_neutrals_positive,
-                          orientation='h',
-                          marker=dict(color='#DDDD55',
-                                     line=dict(
-                                     color='rgba(0,0,0,1.0)', width=0.5)),
-                          hoverinfo='none'
-                         ),
-        graph_objects.Bar(showlegend=False,
-                          y=genres,
-                          x = genre_neutrals_negative,
-                          orientation='h',
-                          marker=dict(color='#DDDD55',
-                                     line=dict(
-                                     color='rgba(0,0,0,1.0)', width=0.5)),
-                          hoverinfo='none'
-                         ),
-        graph_objects.Bar(name='Positive',
-                          y=genres,
-                          x = genre_positives,
-                          orientation='h',
-                          marker=dict(color='#DD5555',
-                                     line=dict(
-                                     color='rgba(0,0,0,1.0)', width=0.5)),
-                          hoverinfo='none'
-                         ),
-        graph_objects.Bar(name='Negative',
-                  y=genres,
-                  x = genre_negatives,
-                  orientation='h',
-                  marker=dict(color='#5555DD',
-                             line=dict(
-                             color='rgba(0,0,0,1.0)', width=0.5)),
-                  hoverinfo='none'
-                 ),
+def build_genre_sentiment_spine_fig():
+    genre_sentiment_counts_df = datasets.genre_sentiment_counts
+    genre_positives = list(genre_sentiment_counts_df['positive'])
+    genre_negatives = list(genre_sentiment_counts_df['negative'])
+    genre_negatives = [-1 * neg for neg in genre_negatives]
+    genre_neutrals_negative = [-1 * neutral/2 for neutral in genre_sentiment_counts_df['neutral']]
+    genre_neutrals_positive = [neutral/2 for neutral in genre_sentiment_counts_df['neutral']]
+
+    genre_sentiment_spine_fig = graph_objects.Figure(
+        data = [
+            graph_objects.Bar(name='Neutral',
+                              y=genres,
+                              x = genre_neutrals_positive,
+                              orientation='h',
+                              marker=dict(color='#DDDD55',
+                                         line=dict(
+                                         color='rgba(0,0,0,1.0)', width=0.5)),
+                              hoverinfo='none'
+                             ),
+            graph_objects.Bar(showlegend=False,
+                              y=genres,
+                              x = genre_neutrals_negative,
+                              orientation='h',
+                              marker=dict(color='#DDDD55',
+                                         line=dict(
+                                         color='rgba(0,0,0,1.0)', width=0.5)),
+                              hoverinfo='none'
+                             ),
+            graph_objects.Bar(name='Positive',
+                              y=genres,
+                              x = genre_positives,
+                              orientation='h',
+                              marker=dict(color='#DD5555',
+                                         line=dict(
+                                         color='rgba(0,0,0,1.0)', width=0.5)),
+                              hoverinfo='none'
+                             ),
+            graph_objects.Bar(name='Negative',
+                      y=genres,
+                      x = genre_negatives,
+                      orientation='h',
+                      marker=dict(color='#5555DD',
+                                 line=dict(
+                                 color='rgba(0,0,0,1.0)', width=0.5)),
+                      hoverinfo='none'
+                     ),
         
-    ],
-)
-genre_sentiment_spine_fig.update_layout(barmode='relative')
+        ],
+    )
+    genre_sentiment_spine_fig.update_layout(barmode='relative')
+    return genre_sentiment_spine_fig
+
+genre_sentiment_spine_fig = figure_snapshot(
+    'genre_sentiment_spine', ['genre_sentiment_counts', 'artist_info'], build_genre_sentiment_spine_fig)
 
 genre_sentiment_spine_container = dbc.Container([
     html.H3(children = 'Sentiment split between genres', style={'textAlign': 'center'}),
@@ -156,54 +170,60 @@ genre_sentiment_spine_container = dbc.Container([
 # ---------------------------------------------------------------------------- #
 #                            artist sentiment spine                            #
 # ---------------------------------------------------------------------------- #
-artist_positives = list(artist_sentiment_counts_df['positive'])
-artist_negatives = list(artist_sentiment_counts_df['negative'])
-artist_negatives = [-1 * neg for neg in artist_negatives]
-artist_neutrals_negative = [-1 * neutral/2 for neutral in artist_sentiment_counts_df['neutral']]
-artist_neutrals_positive = [neutral/2 for neutral in artist_sentiment_counts_df['neutral']]
-
-artist_sentiment_spine_fig = graph_objects.Figure(
-    data = [
-        graph_objects.Bar(name='Neutral',
-                          y=artists,
-                          x = artist_neutrals_positive,
-                          orientation='h',
-                          marker=dict(color='#DDDD55',
-                                     line=dict(
-                                     color='rgba(0,0,0,1.0)', width=0.5)),
-                          hoverinfo='none'
-                         ),
-        graph_objects.Bar(showlegend=False,
-                          y=artists,
-                          x = artist_neutrals_negative,
-                          orientation='h',
-                          marker=dict(color='#DDDD55',
-                                     line=dict(
-                                     color='rgba(0,0,0,1.0)', width=0.5)),
-                          hoverinfo='none'
-                         ),
-        graph_objects.Bar(name='Positive',
-                          y=artists,
-                          x = artist_positives,
-                          orientation='h',
-                          marker=dict(color='#DD5555',
-                                     line=dict(
-                                     color='rgba(0,0,0,1.0)', width=0.5)),
-                          hoverinfo='none'
-                         ),
-        graph_objects.Bar(name='Negative',
-                  y=artists,
-                  x = artist_negatives,
-                  orientation='h',
-                  marker=dict(color='#5555DD',
-                             line=dict(
-                             color='rgba(0,0,0,1.0)', width=0.5)),
-                  hoverinfo='none'
-                 ),
+def build_artist_sentiment_spine_fig():
+    artist_sentiment_counts_df = datasets.artist_sentiment_counts
+    artist_positives = list(artist_sentiment_counts_df['positive'])
+    artist_negatives = list(artist_sentiment_counts_df['negative'])
+    artist_negatives = [-1 * neg for neg in artist_negatives]
+    artist_neutrals_negative = [-1 * neutral/2 for neutral in artist_sentiment_counts_df['neutral']]
+    artist_neutrals_positive = [neutral/2 for neutral in artist_sentiment_counts_df['neutral']]
+
+    artist_sentiment_spine_fig = graph_objects.Figure(
+        data = [
+            graph_objects.Bar(name='Neutral',
+                              y=artists,
+                              x = artist_neutrals_positive,
+                              orientation='h',
+                              marker=dict(color='#DDDD55',
+                                         line=dict(
+                                         color='rgba(0,0,0,1.0)', width=0.5)),
+                              hoverinfo='none'
+                             ),
+            graph_objects.Bar(showlegend=False,
+                              y=artists,
+                              x = artist_neutrals_negative,
+                              orientation='h',
+                              marker=dict(color='#DDDD55',
+                                         line=dict(
+                                         color='rgba(0,0,0,1.0)', width=0.5)),
+                              hoverinfo='none'
+                             ),
+            graph_objects.Bar(name='Positive',
+                              y=artists,
+                              x = artist_positives,
+                              orientation='h',
+                              marker=dict(color='#DD5555',
+                                         line=dict(
+                                         color='rgba(0,0,0,1.0)', width=0.5)),
+                              hoverinfo='none'
+                             ),
+            graph_objects.Bar(name='Negative',
+                      y=artists,
+                      x = artist_negatives,
+                      orientation='h',
+                      marker=dict(color='#5555DD',
+                                 line=dict(
+                                 color='rgba(0,0,0,1.0)', width=0.5)),
+                      hoverinfo='none'
+                     ),
         
-    ],
-)
-artist_sentiment_spine_fig.update_layout(barmode='relative')
+        ],
+    )
+    artist_sentiment_spine_fig.update_layout(barmode='relative')
+    return artist_sentiment_spine_fig
+
+artist_sentiment_spine_fig = figure_snapshot(
+    'artist_sentiment_spine', ['artist_sentiment_counts', 'artist_info'], build_artist_sentiment_spine_fig)
 
 artist_sentiment_spine_container = dbc.Container([
     html.H3(children = 'Artist sentiment split', style={'textAlign': 'center'}),
@@ -218,20 +238,26 @@ artist_sentiment_spine_container = dbc.Container([
 emotions = ['sadness', 'anger', 'joy', 'fear', 'love', 'surprise']
 colors = ['#5555DD', '#DD5555', '#DDDD55', '#55DD55', '#FF55DD', '#EEAA55']
 
-genre_emotion_fig = graph_objects.Figure()
-
-for index, emotion in enumerate(emotions):
-    genre_emotion_fig.add_trace(graph_objects.Bar(
-        y = genres,
-        x = genre_sentiment_counts_df[emotion],
-        name = emotion,
-        orientation = 'h',
-        marker = dict(
-            color = colors[index],
-            line = dict(color = colors[index], width=1)
-        )
-    ))
-genre_emotion_fig.update_layout(barmode='stack')
+def build_genre_emotion_fig():
+    genre_sentiment_counts_df = datasets.genre_sentiment_counts
+    genre_emotion_fig = graph_objects.Figure()
+
+    for index, emotion in enumerate(emotions):
+        genre_emotion_fig.add_trace(graph_objects.Bar(
+            y = genres,
+            x = genre_sentiment_counts_df[emotion],
+            name = emotion,
+            orientation = 'h',
+            marker = dict(
+                color = colors[index],
+                line = dict(color = colors[index], width=1)
+            )
+        ))
+    genre_emotion_fig.update_layout(barmode='stack')
+    return genre_emotion_fig
+
+genre_emotion_fig = figure_snapshot(
+    'genre_emotion', ['genre_sentiment_counts', 'artist_info'], build_genre_emotion_fig)
 
 genre_emotion_spine_container = dbc.Container([
     html.H3(children = 'Emotional split for genres', style={'textAlign': 'center'}),
@@ -244,42 +270,42 @@ genre_emotion_spine_container = dbc.Container([
 #                         static genre wordclouds graph                        #
 # ---------------------------------------------------------------------------- #
 
-top_20_filtered_words_genre_df.rename(columns={'Unnamed: 0' : 'genre'}, inplace=True)
-genres = top_20_filtered_words_genre_df['genre'].unique()
+def build_genre_wordclouds_fig():
+    top_20_filtered_words_genre_df = datasets.top_20_filtered_words_genre.rename(columns={'Unnamed: 0' : 'genre'})
+    genres = top_20_filtered_words_genre_df['genre'].unique()
 
-genre_wordclouds = []
-genre_bars = []
+    genre_wordclouds = []
+    genre_bars = []
 
-for genre in genres:
-    genre_df = top_20_filtered_words_genre_df[top_20_filtered_words_genre_df['genre'] == genre]
-    genre_words = [genre_df[word].values[0] for word in word_cols]
-    genre_counts = [genre_df[count].values[0] for count in count_cols]
+    for genre in genres:
+        genre_df = top_20_filtered_words_genre_df[top_20_filtered_words_genre_df['genre'] == genre]
+        genre_words = [genre_df[word].values[0] for word in word_cols]
+        genre_counts = [genre_df[count].values[0] for count in count_cols]
 
-    genre_item = {
-        'genre': genre,
-        'words': genre_words,
-        'counts': genre_counts
-    }
+        genre_item = {
+            'genre': genre,
+            'words': genre_words,
+            'counts': genre_counts
+        }
 
-    genre_bars.append(genre_item)
-    
-    d = {}
-    for word, count in zip(genre_words, genre_counts):
-        d[word] = count
+        genre_bars.append(genre_item)
 
-    wordcloud = WordCloud(background_color = "white", width=800, height=400)
-    wordcloud.generate_from_frequencies(frequencies=d)
-    genre_wordclouds.append(wordcloud)
+        genre_wordclouds.append(wordcloud_url('genre', genre, genre_words, genre_counts))
 
-# subplot wordcloud graph titles
-genre_titles = ['pop', 'pop', 'rock', 'rock', 'rap', 'rap', 'soul', 'soul']
+    # subplot wordcloud graph titles
+    genre_titles = ['pop', 'pop', 'rock', 'rock', 'rap', 'rap', 'soul', 'soul']
 
-genre_wordclouds_fig = make_subplots(rows=4, cols=2, subplot_titles = genre_titles)
+    genre_wordclouds_fig = make_subplots(rows=4, cols=2, subplot_titles = genre_titles)
 
-for i, genre in enumerate(genres):
-    genre_wordclouds_fig.add_trace(graph_objects.Image(z=genre_wordclouds[i]), row = i+1, col = 1)
-    genre_wordclouds_fig.add_trace(graph_objects.Bar(x=genre_bars[i]['words'], y=genre_bars[i]['counts'], showlegend = False), row=i+1, col=2,)
-genre_wordclouds_fig.update_layout(height = 4 * 400)
+    for i, genre in enumerate(genres):
+        add_wordcloud_image(genre_wordclouds_fig, genre_wordclouds[i], row = i+1, col = 1)
+        genre_wordclouds_fig.add_trace(graph_objects.Bar(x=genre_bars[i]['words'], y=genre_bars[i]['counts'], showlegend = False), row=i+1, col=2,)
+    genre_wordclouds_fig.update_layout(height = 4 * 400)
+    return genre_wordclouds_fig
+
+with profiled_block('static_graphs: genre wordclouds'):
+    genre_wordclouds_fig = figure_snapshot(
+        'genre_wordclouds', ['top_20_filtered_words_genre'], build_genre_wordclouds_fig)
 
 # ======= container ========
 genre_wordcloud_container = dbc.Container([
@@ -311,7 +337,10 @@ sentiment_md_1 = dcc.Markdown(
 )
 
 
-tsne_fig = px.scatter(tsne_df, x='x', y='y', color='genre', hover_data=['Artist'])
+def build_tsne_fig():
+    return px.scatter(datasets.tsne, x='x', y='y', color='genre', hover_data=['Artist'])
+
+tsne_fig = figure_snapshot('tsne', ['tsne'], build_tsne_fig)
 
 tsne_container = dbc.Container([
     html.H3(children = 't-SNE artist lyrics embeddings similarity', style={'textAlign': 'center'}),
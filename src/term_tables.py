@@ -0,0 +1,114 @@
+"""
+Top words and n-grams of each artist as long tables
+
+top_20_filtered_words_by_artist.csv and artist_ngrams.csv have one wide
+row per artist (word0 .. word19_count, ngram_2_0 .. count_4_19), so
+showing an artist meant a boolean scan of the table and one .values[0]
+per column - 40 or 120 of them per request. TermTable turns them into a
+single long table of (entity, n, rank, gram, count) rows sorted by the
+entity's category code, n and rank, so the terms of an entity (and of
+one n) are a contiguous slice of plain arrays found by two lookups.
+The top words are the n = 1 rows.
+
+The same table can be made from the long output of ngrams.top_ngrams.
+"""
+import numpy as np
+import pandas as pd
+
+from dataframes import datasets
+
+N_TERMS = 20
+NGRAM_LENS = [2, 3, 4]
+
+
+def word_columns(n_terms=N_TERMS):
+    """(n, rank, gram column, count column) of the top words tables"""
+    return [(1, rank, f'word{rank}', f'word{rank}_count') for rank in range(n_terms)]
+
+
+def ngram_columns(lens=NGRAM_LENS, n_terms=N_TERMS):
+    """(n, rank, gram column, count column) of artist_ngrams.csv"""
+    return [(n, rank, f'ngram_{n}_{rank}', f'count_{n}_{rank}')
+            for n in lens for rank in range(n_terms)]
+
+
+class TermTable:
+    """
+    terms - DataFrame of entity (category), n (int8), rank (int16), gram
+            (string), count (as in the source - the top words counts are
+            relative to the first), sorted by entity code, n and rank
+    info - other columns of each entity (e.g. genre), indexed by entity
+    """
+    def __init__(self, terms, info):
+        self.terms = terms
+        self.info = info
+        entities = terms['entity'].cat.categories
+        self.entity_codes = {entity: code for code, entity in enumerate(entities)}
+        self.bounds = np.searchsorted(terms['entity'].cat.codes.to_numpy(),
+                                      np.arange(len(entities) + 1))
+        # the columns as arrays, slicing them skips pandas indexing altogether
+        self.n = terms['n'].to_numpy()
+        self.grams = terms['gram'].to_numpy(dtype=object)
+        self.counts = terms['count'].to_numpy()
+
+    @classmethod
+    def from_long(cls, long, entity_column, info=None, gram_column='gram'):
+        """
+        From a table with an entity_column and n, rank, gram, count columns,
+        e.g. ngrams.top_ngrams(...) with gram_column='ngram'
+        """
+        entity = pd.Categorical(long[entity_column])
+        codes = entity.codes
+        order = np.lexsort((long['rank'].to_numpy(), long['n'].to_numpy(), codes))
+        terms = pd.DataFrame({
+            'entity': entity[order],
+            'n': long['n'].to_numpy()[order].astype(np.int8),
+            'rank': long['rank'].to_numpy()[order].astype(np.int16),
+            'gram': pd.array(long[gram_column].to_numpy()[order].astype(str), dtype='string'),
+            'count': long['count'].to_numpy()[order],
+        })
+        if info is None:
+            info = pd.DataFrame(index=pd.Index(entity.categories, name=entity_column))
+        return cls(terms, info)
+
+    @classmethod
+    def from_wide(cls, wide, entity_column, columns):
+        """
+        From a table with one row per entity and the gram / count columns of
+        each (n, rank, gram column, count column). The columns left are the info
+        """
+        ns, ranks, gram_columns, count_columns = map(list, zip(*columns))
+        n_entities = len(wide)
+        long = pd.DataFrame({
+            entity_column: np.repeat(wide[entity_column].to_numpy(), len(columns)),
+            'n': np.tile(ns, n_entities),
+            'rank': np.tile(ranks, n_entities),
+            'gram': wide[gram_columns].to_numpy().ravel(),
+            'count': wide[count_columns].to_numpy().ravel(),
+        })
+        info_columns = [column for column in wide.columns
+                        if column != entity_column and not column.startswith(('word', 'ngram_',
+                                                                              'count_'))]
+        info = wide.drop_duplicates(entity_column).set_index(entity_column)[info_columns]
+        return cls.from_long(long, entity_column, info)
+
+    def entities(self, **filters):
+        """Entities whose info columns have the given values, in table order"""
+        info = self.info
+        for column, value in filters.items():
+            info = info[info[column] == value]
+        return list(info.index)
+
+    def fetch(self, entity, n=None):
+        """(grams, counts) of an entity, of one n only if given - views, not copies"""
+        code = self.entity_codes[entity]
+        start, end = self.bounds[code], self.bounds[code + 1]
+        if n is not None:
+            start, end = start + np.searchsorted(self.n[start:end], [n, n + 1])
+        return self.grams[start:end], self.counts[start:end]
+
+
+datasets.register('artist_top_words', lambda: TermTable.from_wide(
+    datasets.top_20_filtered_words_artist, 'Artist', word_columns()))
+datasets.register('artist_ngram_terms', lambda: TermTable.from_wide(
+    datasets.artist_ngrams, 'Artist', ngram_columns()))
@@ -0,0 +1,226 @@
+"""
+Topic mention counts of song lyrics, computed from topic lexicons
+
+The manual_{topic}_count and manual_{topic}_word_percent columns of the
+song tables (with their unique_words / total_words) were computed offline.
+TopicCounter recomputes them for any lexicons - {topic: [words]}, e.g. the
+'love' words listed in the topics intro. The lyrics of a chunk of songs are
+tokenized once into integer word ids, and every topic of every song is
+counted by one sparse product of the song x word count matrix with a
+word x topic membership matrix. Songs are streamed chunk by chunk, each
+with its own vocabulary (a pd.factorize of the chunk's words), so memory
+doesn't grow with the number of songs.
+
+Words are matched as whole tokens of the (lowercased, punctuation-free)
+lyrics, a word may belong to several topics. table_agreement() compares
+recounted columns with the table's, percent_agreement() checks the percent
+rounding against the table's own counts.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from data_cache import CACHE_DIR
+from dataframes import datasets, topics, decade_topics
+from lyrics_corpus import count_matrix
+from lyrics_store import stores
+
+TOPIC_COUNTS_DIR = os.path.join(CACHE_DIR, 'topic_counts')
+
+# songs counted per chunk
+CHUNK_SIZE = 5000
+# decimals of the manual_{topic}_word_percent columns in combined_count.csv
+PERCENT_DECIMALS = 3
+
+# topic count columns of each song-level table, and whether it has the percent columns too
+TOPIC_TABLES = {
+    'counts': (topics, True),
+    'decade_counts': (decade_topics, False),
+}
+
+# the words of the 'love' topic listed in the topics intro
+EXAMPLE_LEXICONS = {
+    'love': ['love', 'lover', 'honey', 'baby', 'heart', 'sweetheart', 'loverboy', 'babygirl'],
+}
+
+
+def count_column(topic):
+    return f'manual_{topic}_count'
+
+
+def percent_column(topic):
+    return f'manual_{topic}_word_percent'
+
+
+def column_topic(column):
+    """'manual_love_count' -> 'love'"""
+    return column[len('manual_'):-len('_count')]
+
+
+def load_lexicons(path):
+    """Lexicons from a json file of {topic: [words]}"""
+    with open(path) as lexicons_file:
+        lexicons = json.load(lexicons_file)
+    return {topic: [word.lower() for word in words] for topic, words in lexicons.items()}
+
+
+class TopicCounter:
+    """
+    Counts of the words of each topic lexicon in songs
+
+    topics - the topics counted, in column order (by default all the lexicons)
+    percent - add the manual_{topic}_word_percent columns
+    """
+    def __init__(self, lexicons, topics=None, percent=True):
+        self.topics = list(lexicons) if topics is None else list(topics)
+        missing = [topic for topic in self.topics if topic not in lexicons]
+        if missing:
+            raise ValueError(f'no lexicon for topics: {missing}')
+        self.percent = percent
+
+        # lexicon word x topic membership
+        self.lexicon_vocab = {}
+        word_ids = []
+        topic_ids = []
+        for topic_id, topic in enumerate(self.topics):
+            for word in dict.fromkeys(lexicons[topic]):
+                word_ids.append(self.lexicon_vocab.setdefault(word, len(self.lexicon_vocab)))
+                topic_ids.append(topic_id)
+        self.membership = sparse.csr_matrix(
+            (np.ones(len(word_ids), dtype=np.int64), (word_ids, topic_ids)),
+            shape=(len(self.lexicon_vocab), len(self.topics)))
+        self.lexicon_words = pd.Index(list(self.lexicon_vocab))
+
+    @property
+    def columns(self):
+        columns = ['unique_words', 'total_words', *map(count_column, self.topics)]
+        if self.percent:
+            columns.extend(map(percent_column, self.topics))
+        return columns
+
+    def vocab_membership(self, vocab):
+        """Word x topic membership of the words of a vocabulary (array of words, by id)"""
+        vocab_ids = pd.Index(vocab).get_indexer(self.lexicon_words)
+        known = vocab_ids >= 0
+        lexicon_to_vocab = sparse.csr_matrix(
+            (np.ones(known.sum(), dtype=np.int64), (vocab_ids[known], np.flatnonzero(known))),
+            shape=(len(vocab), len(self.lexicon_words)))
+        return (lexicon_to_vocab @ self.membership).tocsr()
+
+    def count_tokens(self, token_ids, offsets, vocab):
+        """(songs x topics counts, total words, unique words) of tokenized songs"""
+        counts = count_matrix(token_ids, offsets, len(vocab))
+        topic_counts = (counts @ self.vocab_membership(vocab)).toarray()
+        return topic_counts, np.diff(offsets), np.diff(counts.indptr)
+
+    def frame(self, topic_counts, total_words, unique_words, index=None):
+        """The count columns, as in the song tables"""
+        data = {'unique_words': unique_words, 'total_words': total_words}
+        for topic_id, topic in enumerate(self.topics):
+            data[count_column(topic)] = topic_counts[:, topic_id]
+        if self.percent:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                percents = np.round(topic_counts / total_words[:, None] * 100, PERCENT_DECIMALS)
+            percents[total_words == 0] = 0
+            for topic_id, topic in enumerate(self.topics):
+                data[percent_column(topic)] = percents[:, topic_id]
+        return pd.DataFrame(data, index=index)
+
+    def count_texts(self, texts, index=None):
+        """Count columns of the given lyrics"""
+        token_ids, offsets, vocab = tokenize(texts)
+        return self.frame(*self.count_tokens(token_ids, offsets, vocab), index=index)
+
+    def count_corpus(self, corpus):
+        """Count columns of every song of a LyricsCorpus, from its already built count matrix"""
+        topic_counts = (corpus.counts @ self.vocab_membership(corpus.vocab)).toarray()
+        return self.frame(topic_counts, np.diff(corpus.offsets), np.diff(corpus.counts.indptr),
+                          index=corpus.meta.index)
+
+    def stream(self, chunks):
+        """Count columns of each (lyrics, index) chunk, one DataFrame per chunk"""
+        for texts, index in chunks:
+            yield self.count_texts(texts, index)
+
+
+def tokenize(texts):
+    """
+    (token ids, start offsets of each text, vocabulary) of the given texts,
+    the words numbered in a single pd.factorize
+    """
+    words = []
+    offsets = [0]
+    for text in texts:
+        if isinstance(text, str):
+            words.extend(text.split())
+        offsets.append(len(words))
+    token_ids, vocab = pd.factorize(np.array(words, dtype=object))
+    return token_ids.astype(np.int32), np.array(offsets, dtype=np.int64), vocab
+
+
+def table_chunks(dataset, chunk_size=CHUNK_SIZE):
+    """(lyrics, song ids) of a song-level table, chunk by chunk, from its lyrics store"""
+    store = stores[dataset]
+    song_ids = store.song_ids()
+    for start in range(0, len(song_ids), chunk_size):
+        chunk_ids = song_ids[start:start + chunk_size]
+        yield store.get_many(chunk_ids), pd.Index(chunk_ids)
+
+
+def table_counter(dataset, lexicons):
+    """Counter of the topic columns a song-level table has"""
+    table_topics, percent = TOPIC_TABLES[dataset]
+    return TopicCounter(lexicons, [column_topic(column) for column in table_topics], percent)
+
+
+def table_agreement(dataset, recounted):
+    """
+    Share of the songs of the table whose value equals the recounted one,
+    for each column of recounted (indexed by song id)
+    """
+    columns = list(recounted.columns)
+    datasets.require(dataset, columns)
+    table = datasets[dataset][columns]
+    recounted = recounted.reindex(table.index)
+    return pd.Series({column: np.isclose(table[column].to_numpy(dtype=np.float64),
+                                         recounted[column].to_numpy(dtype=np.float64),
+                                         rtol=0, atol=1e-9).mean()
+                      for column in columns})
+
+
+def percent_agreement(dataset):
+    """
+    table_agreement of the manual_{topic}_word_percent columns recomputed from
+    the table's own count columns - the percent rounding, whatever the lexicons
+    """
+    table_topics, percent = TOPIC_TABLES[dataset]
+    if not percent:
+        return pd.Series(dtype=np.float64)
+    topic_names = [column_topic(column) for column in table_topics]
+    counter = TopicCounter({topic: [] for topic in topic_names}, topic_names, percent)
+    datasets.require(dataset, ['total_words', *table_topics])
+    table = datasets[dataset].dropna(subset=['total_words', *table_topics])
+    recounted = counter.frame(table[table_topics].to_numpy(dtype=np.float64),
+                              table['total_words'].to_numpy(dtype=np.float64),
+                              np.zeros(len(table)), index=table.index)
+    return table_agreement(dataset, recounted[list(map(percent_column, topic_names))])
+
+
+def write_table_counts(dataset, lexicons, path=None, chunk_size=CHUNK_SIZE):
+    """
+    Count the topics of every song of a table into a csv, chunk by chunk.
+    Returns (path, number of songs)
+    """
+    if path is None:
+        path = os.path.join(TOPIC_COUNTS_DIR, f'{dataset}.csv')
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    counter = table_counter(dataset, lexicons)
+    n_songs = 0
+    with open(path, 'w', newline='') as counts_file:
+        for chunk in counter.stream(table_chunks(dataset, chunk_size)):
+            chunk.to_csv(counts_file, header=n_songs == 0)
+            n_songs += len(chunk)
+    return path, n_songs
@@ -1,17 +1,42 @@
 """
 Topic counts from selected artists by year
 """
-from dash import Dash, html, dcc, callback, Output, Input
+from dash import Dash, html, dcc, callback, Output, Input, ctx, no_update
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import plotly.graph_objects as graph_objects
 
-from dataframes import (counts_df, genre_sum_df,
-                            artist_sum_df, topics, genres, artists)
+from dataframes import datasets, topics, genres, artists
+# registers the counts_groups dataset
+import group_index
+from histograms import histogram_figure
+from topic_index import parse_words
 
 # ---------------------------------------------------------------------------- #
 #                  Topic counts from selected artists by year                 #
 # ---------------------------------------------------------------------------- #
+def topic_artist_options(genres):
+    """Artists of the selected genres, as dropdown options"""
+    options = dict()
+    for artist in datasets.counts_groups.child_values('genre', 'Artist', list(genres)):
+        options[artist] = artist
+    return options
+
+def topic_figure(genres, artists, topic):
+    counts_df = datasets.counts
+    # in case there is only one artist selected
+    artists_list = [artist for artist in artists]
+    artists_df = datasets.counts_groups.take(counts_df, genre=list(genres), Artist=artists_list)
+
+    fig = px.bar(artists_df, x='Year', y=topic, color='genre',
+                hover_data = ['Artist'])
+    return fig
+
+# initial state, rendered with the layout rather than by callbacks on load
+initial_topic_genres = ['soul']
+initial_topic_artist_options = topic_artist_options(initial_topic_genres)
+initial_topic_artists = list(initial_topic_artist_options)
+
 # controls
 topic_controls = dbc.Card(
     [
@@ -20,7 +45,7 @@ topic_controls = dbc.Card(
             dbc.Label("Genre"),
             dcc.Dropdown(
                 id='topic-genre-selection',
-                value = ['soul'],
+                value = initial_topic_genres,
                 options = genres,
                 multi = True
             )
@@ -30,7 +55,8 @@ topic_controls = dbc.Card(
             dbc.Label("Artist"),
             dcc.Dropdown(
                 id='topic-artist-selection-dynamic',
-                value=['Al Green'],
+                options = initial_topic_artist_options,
+                value = initial_topic_artists,
                 multi = True
             )
             ]),
@@ -51,7 +77,9 @@ topic_container = dbc.Container([
     dbc.Row(
         [
             dbc.Col(topic_controls, md=4),
-            dbc.Col(dcc.Graph(id='topic-graph-content'), md=8),
+            dbc.Col(dcc.Graph(id='topic-graph-content',
+                              figure=topic_figure(initial_topic_genres, initial_topic_artists,
+                                                  'manual_love_count')), md=8),
         ],
         align="center",
     ),
@@ -60,52 +88,27 @@ topic_container = dbc.Container([
 # callbacks
 def get_topic_callbacks(app):
     # ======== graph ==========
+    # one callback for the whole genre -> artist options -> artists -> graph chain,
+    # a genre change selects all the genre's artists and redraws in the same round trip
     @app.callback(
         [
+            Output('topic-artist-selection-dynamic', 'options'),
+            Output('topic-artist-selection-dynamic', 'value'),
             Output('topic-graph-content', 'figure'),
         ],
         [
             Input('topic-genre-selection', 'value'),
             Input('topic-artist-selection-dynamic', 'value'),
             Input('topic-selection', 'value'),
-        ]
+        ],
+        prevent_initial_call=True
     )
     def update_topic_graph(genres, artists, topic):
-        genre_df = counts_df[counts_df['genre'].isin(genres)]
-        # in case there is only one artist selected
-        artists_list = [artist for artist in artists]
-        artists_df = genre_df[genre_df['Artist'].isin(artists_list)]
-
-        fig = px.bar(artists_df, x='Year', y=topic, color='genre',
-                    hover_data = ['Artist'])
-        
-        return [fig,]
-
-    # ========= set available artist options based on chosen genre =========
-    @app.callback(
-        Output('topic-artist-selection-dynamic', 'options'),
-        Input('topic-genre-selection', 'value')
-    )
-    def set_dynamic_artist_options(genres):
-        options = dict()
-        for genre in genres:
-            genre_artists = list(counts_df[counts_df['genre'] == genre]['Artist'].unique())
-            for artist in genre_artists:
-                options[artist] = artist
-        return options
-
-    # ======= choose from available dynamic options =========
-    # has to be done manually due to dynamicity
-    # also this is how to return multiple options
-    # in case of one you'd have to take [0] of value from options
-    @app.callback(
-        Output('topic-artist-selection-dynamic', 'value'),
-        Input('topic-artist-selection-dynamic', 'options')
-    )
-    def set_dynamic_artist_value(options):
-        # output = [option for option in options]
-        # return output
-        return options
+        if ctx.triggered_id == 'topic-genre-selection':
+            options = topic_artist_options(genres)
+            artists = list(options)
+            return [options, artists, topic_figure(genres, artists, topic)]
+        return [no_update, no_update, topic_figure(genres, artists, topic)]
 
 
 # ---------------------------------------------------------------------------- #
@@ -151,6 +154,7 @@ def get_topic_bar_callbacks(app):
         ]
     )
     def update_bar_topic_graph(topics):
+        genre_sum_df = datasets.genre_sum
         bar_fig = graph_objects.Figure()
         # in case there is only one selected topic - turn input into a list:
         topics_list = [topic for topic in topics]
@@ -211,6 +215,7 @@ def get_artist_bar_topic_callbacks(app):
         ]
     )
     def update_artist_bar_topic_graph(topics, genre):
+        artist_sum_df = datasets.artist_sum
         bar_fig = graph_objects.Figure()
         genre_df = artist_sum_df[artist_sum_df['genre'] == genre]
         genre_artists = list(genre_df['Artist'].unique())
@@ -280,8 +285,8 @@ def get_genre_hist_topic_callbacks(app):
         ]
     )
     def update_hist_topic_graph(topic, genre, nbins):
-        genre_df = counts_df[counts_df['genre'] == genre]
-        hist_fig = px.histogram(genre_df, x=topic, nbins=nbins)
+        edges, counts = datasets.counts_histograms.histogram(topic, genre, nbins)
+        hist_fig = histogram_figure(edges, counts)
         return [hist_fig,]
 
 # ---------------------------------------------------------------------------- #
@@ -339,12 +344,95 @@ def get_topic_scatter_callbacks(app):
         ]
     )
     def update_artist_bar_topic_graph(topic_X, topic_Y, colorby):
-        scatter_fig = px.scatter(artist_sum_df, x=topic_X, y=topic_Y,
+        scatter_fig = px.scatter(datasets.artist_sum, x=topic_X, y=topic_Y,
                                     color=colorby)
         # return scatter_fig, f'topic_X: {topic_X}, topic_Y: {topic_Y}, colorby: {colorby}'
         return [scatter_fig,]
 
 
+# ---------------------------------------------------------------------------- #
+#            Custom topic - mentions of typed words by genre / artist          #
+# ---------------------------------------------------------------------------- #
+
+# artists with the most mentions shown, of the ~100
+CUSTOM_TOPIC_TOP_ARTISTS = 30
+
+custom_topic_controls = dbc.Card(
+    [
+        html.Div(
+            [
+            dbc.Label("Topic words (separated by commas or spaces)"),
+            dbc.Input(value='cars, truck, drive',
+                      id='custom-topic-words',
+                      debounce=True)
+            ]),
+        html.Div(
+            [
+            dbc.Label("Count by"),
+            dcc.RadioItems(options = [{'label': ' genre', 'value': 'genre'},
+                                      {'label': ' artist', 'value': 'Artist'},
+                                      {'label': ' decade (rap)', 'value': 'decade'}],
+                           value = 'genre',
+                           id='custom-topic-group-selection'),
+            ]),
+        html.Div(
+            [
+            dbc.Label("Metric"),
+            dcc.RadioItems(options = [{'label': ' total mentions', 'value': 'count'},
+                                      {'label': ' mentions per 1000 words', 'value': 'per_1000'}],
+                           value = 'count',
+                           id='custom-topic-metric-selection'),
+            ]),
+    ],
+    body=True,
+)
+
+custom_topic_container = dbc.Container([
+    html.H3(children = 'Mentions of your own topic',
+             style={'textAlign': 'center'}),
+    html.P(id='custom-topic-missing'),
+    dbc.Row(
+        [
+            dbc.Col(custom_topic_controls, md=4),
+            dbc.Col(dcc.Graph(id='custom-topic-graph-content'), md=8),
+        ],
+        align="center",
+    ),
+], fluid=True)
+
+def get_custom_topic_callbacks(app):
+    @app.callback(
+        [
+            Output('custom-topic-graph-content', 'figure'),
+            Output('custom-topic-missing', 'children'),
+        ],
+        [
+            Input('custom-topic-words', 'value'),
+            Input('custom-topic-group-selection', 'value'),
+            Input('custom-topic-metric-selection', 'value'),
+        ]
+    )
+    def update_custom_topic_graph(text, by, metric):
+        words = parse_words(text)
+        counts = datasets.topic_index.query(words, by)
+        mentions = counts[words]
+        if metric == 'per_1000':
+            mentions = mentions.div(counts['total_words'], axis=0) * 1000
+        if by == 'Artist':
+            mentions = mentions.loc[mentions.sum(axis=1).nlargest(CUSTOM_TOPIC_TOP_ARTISTS).index]
+
+        custom_topic_fig = graph_objects.Figure()
+        # one stacked bar per word, so the bars add up to the whole topic
+        for word in words:
+            custom_topic_fig.add_trace(graph_objects.Bar(x=mentions.index.astype(str),
+                                                         y=mentions[word].values, name=word))
+        custom_topic_fig.update_layout(barmode='stack')
+
+        missing = [word for word in words if not counts[word].any()]
+        missing_text = f'Not used in any lyrics: {", ".join(missing)}' if missing else ''
+        return [custom_topic_fig, missing_text]
+
+
 topic_md_1 = dcc.Markdown(
 '''
     The initial goal of the whole analysis project, was to explore the data and look for potential
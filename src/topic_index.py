@@ -0,0 +1,122 @@
+"""
+Inverted index of the lyrics corpus, for counting any list of words
+
+Besides the precomputed manual_*_count topics, users can type a topic of
+their own (a list of words). The lyrics corpus is turned once into a
+word -> (songs, counts) posting list index (the csc transpose of its count
+matrix), so counting a topic only reads the postings of its words, which
+are then summed per genre / artist / decade with a bincount of the songs'
+group codes - the cost depends on how often the words are used, not on
+the size of the corpus.
+
+The postings are saved next to the corpus, in data/cache/corpus/postings.npz
+"""
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from dataframes import datasets
+# also registers the lyrics_corpus dataset
+from lyrics_corpus import CORPUS_DIR, corpus_is_fresh
+
+# song metadata columns a topic can be counted by
+GROUP_COLUMNS = ['genre', 'Artist', 'decade']
+
+
+def parse_words(text):
+    """Words of a typed list like 'cars, truck drive', lowercased and without repeats"""
+    return list(dict.fromkeys(re.findall(r"[^\s,;]+", (text or '').lower())))
+
+
+class TopicIndex:
+    """
+    vocab - words, by id
+    indptr, songs, counts - posting lists, the songs using word i (and how many
+                            times) are songs[indptr[i]:indptr[i + 1]]
+    meta - song metadata, with the GROUP_COLUMNS as categories
+    song_words - total words of each song
+    """
+    def __init__(self, vocab, indptr, songs, counts, meta, song_words):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.songs = songs
+        self.counts = counts
+        self.song_words = song_words
+        self.word_ids = {word: word_id for word_id, word in enumerate(vocab.tolist())}
+        self.groups = {column: (meta[column].cat.codes.to_numpy(), meta[column].cat.categories)
+                       for column in GROUP_COLUMNS}
+        self.group_words = {column: self.group_sum(column, np.arange(len(song_words)), song_words)
+                            for column in GROUP_COLUMNS}
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        postings = corpus.counts.tocsc()
+        postings.sort_indices()
+        return cls(corpus.vocab, postings.indptr, postings.indices, postings.data,
+                   corpus.meta, np.diff(corpus.offsets))
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.songs.nbytes + self.counts.nbytes + self.vocab.nbytes
+
+    def postings(self, word):
+        """(songs, counts) of a word, empty for words no song uses"""
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            return self.songs[:0], self.counts[:0]
+        start, end = self.indptr[word_id], self.indptr[word_id + 1]
+        return self.songs[start:end], self.counts[start:end]
+
+    def group_sum(self, column, songs, weights):
+        """Sums of weights of the given songs in each group of a column"""
+        codes, categories = self.groups[column]
+        song_codes = codes[songs]
+        grouped = song_codes >= 0
+        return np.bincount(song_codes[grouped], weights=weights[grouped],
+                           minlength=len(categories)).astype(np.int64)
+
+    def query(self, words, by='genre'):
+        """
+        Counts of each word (columns) in each group of the by column (rows),
+        with the total_words of each group. Groups without songs are left out
+        """
+        _, categories = self.groups[by]
+        data = {word: self.group_sum(by, *self.postings(word)) for word in words}
+        data['total_words'] = self.group_words[by]
+        result = pd.DataFrame(data, index=pd.Index(categories, name=by))
+        return result[result['total_words'] > 0]
+
+    def save(self, directory=CORPUS_DIR):
+        os.makedirs(directory, exist_ok=True)
+        np.savez(os.path.join(directory, 'postings.npz'), indptr=self.indptr,
+                 songs=self.songs, counts=self.counts)
+
+    @classmethod
+    def load(cls, directory=CORPUS_DIR):
+        meta = pd.read_parquet(os.path.join(directory, 'meta.parquet'))
+        tokens = np.load(os.path.join(directory, 'tokens.npz'), allow_pickle=False)
+        postings = np.load(os.path.join(directory, 'postings.npz'), allow_pickle=False)
+        return cls(tokens['vocab'], postings['indptr'], postings['songs'], postings['counts'],
+                   meta, np.diff(tokens['offsets']))
+
+
+def index_is_fresh(directory=CORPUS_DIR):
+    """True if the saved postings exist and are newer than the saved corpus"""
+    path = os.path.join(directory, 'postings.npz')
+    if not os.path.exists(path) or not corpus_is_fresh(directory):
+        return False
+    return os.path.getmtime(path) >= os.path.getmtime(os.path.join(directory, 'counts.npz'))
+
+
+def load_index():
+    """The saved index, built from the lyrics corpus first if missing or stale"""
+    if index_is_fresh():
+        return TopicIndex.load()
+    index = TopicIndex.from_corpus(datasets.lyrics_corpus)
+    index.save()
+    return index
+
+
+datasets.register('topic_index', load_index)
@@ -0,0 +1,187 @@
+"""
+Prerendered wordcloud images, served as static files from assets/
+
+Every wordcloud the app can show (per artist, genre, decade and artist
+n-gram length) is rendered once by `python build.py wordcloud-assets`
+into assets/wordclouds/, named by a hash of its content, with a
+manifest.json listing them. The graphs then only reference the image URL,
+instead of laying out the wordcloud and sending its pixels in the figure.
+
+A wordcloud in the manifest (if it's newer than the word tables) is looked
+up by its kind and entity, without building or hashing its frequencies. A
+wordcloud missing from the build is rendered on first use.
+
+The URLs come from Dash's get_asset_url, so they follow the app's
+requests_pathname_prefix / assets_external_path.
+"""
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from dash import get_asset_url
+from PIL import Image
+
+from data_cache import read_table
+from wordcloud_cache import DEFAULT_PARAMS, render_wordcloud, wordcloud_key
+
+ASSETS_DIR = os.path.join('assets', 'wordclouds')
+# ASSETS_DIR, relative to the app's assets folder
+ASSETS_PATH = 'wordclouds'
+MANIFEST_PATH = os.path.join(ASSETS_DIR, 'manifest.json')
+
+# the tables the wordclouds are made from
+ARTIST_WORDS_PATH = '../data/top_20_filtered_words_by_artist.csv'
+GENRE_WORDS_PATH = '../data/top_20_filtered_words_by_genre.csv'
+DECADE_WORDS_PATH = '../data/decade_dataframes/top_20_filtered_words_by_decade.csv'
+ARTIST_NGRAMS_PATH = '../data/artist_ngrams.csv'
+SOURCE_PATHS = [ARTIST_WORDS_PATH, GENRE_WORDS_PATH, DECADE_WORDS_PATH, ARTIST_NGRAMS_PATH]
+
+NGRAM_LENS = [2, 3, 4]
+N_WORDS = 20
+
+
+def asset_name(kind, entity, frequencies):
+    """File name of a wordcloud, which changes whenever its frequencies do"""
+    slug = re.sub(r'[^a-z0-9]+', '-', str(entity).lower()).strip('-')
+    return f'{kind}_{slug}_{wordcloud_key(frequencies, DEFAULT_PARAMS)[:16]}.png'
+
+
+def write_asset(name, frequencies):
+    image = render_wordcloud(frequencies)
+    os.makedirs(ASSETS_DIR, exist_ok=True)
+    path = os.path.join(ASSETS_DIR, name)
+    # write then rename, so the server never sends a partial file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    Image.fromarray(image).save(tmp_path, format='PNG', optimize=True)
+    os.replace(tmp_path, path)
+
+
+def asset_url(name):
+    """URL of a wordcloud image (name may be '' for the URL prefix)"""
+    try:
+        return get_asset_url(f'{ASSETS_PATH}/{name}')
+    except AttributeError:
+        # no Dash app created (the build steps), the default assets URL
+        return f'/assets/{ASSETS_PATH}/{name}'
+
+
+def asset_file(url):
+    """Local path of a wordcloud image URL, None for other URLs"""
+    prefix = asset_url('')
+    if not url.startswith(prefix):
+        return None
+    return os.path.join(ASSETS_DIR, url[len(prefix):])
+
+
+def wordcloud_url(kind, entity, words, counts):
+    """
+    URL of the wordcloud of the words and counts, from the manifest if
+    built, otherwise by its content hash, rendered first if missing
+    """
+    name = load_manifest().get(kind, {}).get(str(entity))
+    if name is None or not os.path.exists(os.path.join(ASSETS_DIR, name)):
+        frequencies = dict(zip(words, counts))
+        name = asset_name(kind, entity, frequencies)
+        if not os.path.exists(os.path.join(ASSETS_DIR, name)):
+            write_asset(name, frequencies)
+    return asset_url(name)
+
+
+def add_wordcloud_image(fig, url, row, col):
+    """Show a wordcloud image in an (empty) subplot of fig"""
+    fig.add_layout_image(source=url, xref='x domain', yref='y domain', x=0, y=1,
+                         sizex=1, sizey=1, xanchor='left', yanchor='top',
+                         sizing='contain', layer='above', row=row, col=col)
+    fig.update_xaxes(visible=False, row=row, col=col)
+    fig.update_yaxes(visible=False, row=row, col=col)
+
+
+# ---------------------------------------------------------------------------- #
+#                                     build                                    #
+# ---------------------------------------------------------------------------- #
+
+def frequencies_of(row, words, counts):
+    d = {}
+    for word, count in zip(row[words], row[counts]):
+        d[word] = count
+    return d
+
+
+def wordcloud_jobs():
+    """(kind, entity, frequencies) of every wordcloud the app shows"""
+    word_cols = [f'word{ind}' for ind in range(N_WORDS)]
+    count_cols = [f'word{ind}_count' for ind in range(N_WORDS)]
+
+    artist_df = read_table(ARTIST_WORDS_PATH)
+    for _, row in artist_df.iterrows():
+        yield 'artist', row['Artist'], frequencies_of(row, word_cols, count_cols)
+
+    genre_df = read_table(GENRE_WORDS_PATH)
+    for _, row in genre_df.iterrows():
+        yield 'genre', row['Unnamed: 0'], frequencies_of(row, word_cols, count_cols)
+
+    decade_df = read_table(DECADE_WORDS_PATH, index_col=0)
+    for decade, row in decade_df.iterrows():
+        yield 'decade', decade, frequencies_of(row, word_cols, count_cols)
+
+    ngrams_df = read_table(ARTIST_NGRAMS_PATH, index_col=0)
+    for _, row in ngrams_df.iterrows():
+        for gram_len in NGRAM_LENS:
+            gram_cols = [f'ngram_{gram_len}_{ind}' for ind in range(N_WORDS)]
+            gram_count_cols = [f'count_{gram_len}_{ind}' for ind in range(N_WORDS)]
+            yield f'ngram_{gram_len}', row['Artist'], frequencies_of(row, gram_cols, gram_count_cols)
+
+
+def build_asset(job):
+    kind, entity, frequencies = job
+    name = asset_name(kind, entity, frequencies)
+    if not os.path.exists(os.path.join(ASSETS_DIR, name)):
+        write_asset(name, frequencies)
+    return kind, str(entity), name
+
+
+def build_assets(processes=None):
+    """
+    Render every wordcloud across a process pool, write the manifest
+    ({kind: {entity: file name}}) and remove images no longer in it
+    """
+    jobs = list(wordcloud_jobs())
+    manifest = {}
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for kind, entity, name in pool.map(build_asset, jobs, chunksize=4):
+            manifest.setdefault(kind, {})[entity] = name
+
+    current = {name for names in manifest.values() for name in names.values()}
+    for file_name in os.listdir(ASSETS_DIR):
+        if file_name.endswith('.png') and file_name not in current:
+            os.remove(os.path.join(ASSETS_DIR, file_name))
+
+    tmp_path = f'{MANIFEST_PATH}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as manifest_file:
+        json.dump({'params': DEFAULT_PARAMS, 'wordclouds': manifest}, manifest_file, indent=1)
+    os.replace(tmp_path, MANIFEST_PATH)
+    _manifest.clear()
+    return manifest
+
+
+# (manifest mtime, its wordclouds), read once per process and again if rebuilt
+_manifest = {}
+
+
+def load_manifest():
+    """
+    {kind: {entity: file name}} of the last build, empty if never built, made
+    with other wordcloud parameters or older than one of the word tables
+    """
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    mtime = os.path.getmtime(MANIFEST_PATH)
+    if _manifest.get('mtime') != mtime:
+        with open(MANIFEST_PATH) as manifest_file:
+            manifest = json.load(manifest_file)
+        stale = (manifest.get('params') != DEFAULT_PARAMS
+                 or any(os.path.exists(path) and os.path.getmtime(path) > mtime
+                        for path in SOURCE_PATHS))
+        _manifest.update(mtime=mtime, wordclouds={} if stale else manifest['wordclouds'])
+    return _manifest['wordclouds']
@@ -0,0 +1,126 @@
+"""
+Cache of rendered wordclouds
+
+Laying out a WordCloud is the slow part of the wordcloud charts, and the
+same few frequency dicts get rendered over and over. Rendered images are
+kept in a bounded in-memory LRU, keyed by a hash of the frequencies and
+the render parameters, and written as PNGs to data/cache/wordclouds/ so
+other workers and later runs can skip the layout as well
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+import wordcloud as wordcloud_lib
+from wordcloud import WordCloud
+
+from data_cache import CACHE_DIR
+
+WORDCLOUD_CACHE_DIR = os.path.join(CACHE_DIR, 'wordclouds')
+
+# rendered images kept in memory, an 800x400 image is ~1MB
+WORDCLOUD_CACHE_SIZE = 64
+
+# parameters of every wordcloud in the app
+DEFAULT_PARAMS = {'background_color': 'white', 'width': 800, 'height': 400}
+
+
+def wordcloud_key(frequencies, params):
+    """
+    Hash of the frequencies (in their order, which breaks layout ties)
+    and the render parameters
+    """
+    content = json.dumps({
+        'frequencies': [[str(word), float(count)] for word, count in frequencies.items()],
+        'params': params,
+        'version': wordcloud_lib.__version__,
+    }, sort_keys=True, default=str)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+class WordcloudCache:
+    """
+    LRU of rendered wordcloud images (RGB uint8 arrays), optionally backed
+    by a directory of PNGs shared between processes
+    """
+    def __init__(self, maxsize=WORDCLOUD_CACHE_SIZE, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.png')
+
+    def _remember(self, key, image):
+        with self._lock:
+            self._images[key] = image
+            self._images.move_to_end(key)
+            while len(self._images) > self.maxsize:
+                self._images.popitem(last=False)
+
+    def _read_disk(self, key):
+        if self.directory is None or not os.path.exists(self._path(key)):
+            return None
+        try:
+            with Image.open(self._path(key)) as png:
+                return np.asarray(png.convert('RGB'))
+        except OSError:
+            # half-written or corrupt file, render again
+            return None
+
+    def _write_disk(self, key, image):
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # write then rename, so other workers never read a partial file
+        tmp_path = f'{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+        Image.fromarray(image).save(tmp_path, format='PNG')
+        os.replace(tmp_path, self._path(key))
+
+    def render(self, frequencies, **params):
+        """Wordcloud image of the frequencies, rendered only if not cached"""
+        params = {**DEFAULT_PARAMS, **params}
+        key = wordcloud_key(frequencies, params)
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return image
+
+        image = self._read_disk(key)
+        if image is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            wordcloud = WordCloud(**params)
+            wordcloud.generate_from_frequencies(frequencies=frequencies)
+            image = wordcloud.to_array()
+            self._write_disk(key, image)
+        image.setflags(write=False)
+        self._remember(key, image)
+        return image
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                'size': len(self._images)}
+
+
+wordcloud_cache = WordcloudCache(directory=WORDCLOUD_CACHE_DIR)
+
+
+def render_wordcloud(frequencies, **params):
+    """Cached wordcloud image of a {word: count} dict, see WordcloudCache.render"""
+    return wordcloud_cache.render(frequencies, **params)